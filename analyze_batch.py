@@ -0,0 +1,179 @@
+"""
+Batch analysis for CI-style submissions of many files.
+
+Files already in the analyze cache are answered straight away; the rest
+are spread over a pool of ANALYZE_WORKERS processes, so a batch uses every
+core instead of one request thread. Each file gets at most the per-file
+time limit (enforced inside the pool process with a timer signal) and the
+batch as a whole stops waiting once its time budget is spent, reporting the
+files it didn't get to.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import analyze_cache
+import analyzer
+
+ANALYZE_WORKERS = int(os.environ.get('ANALYZE_WORKERS', os.cpu_count() or 2))
+MAX_FILES = int(os.environ.get('ANALYZE_BATCH_MAX_FILES', 1000))
+FILE_TIMEOUT = float(os.environ.get('ANALYZE_FILE_TIMEOUT', 5))
+BATCH_TIMEOUT = float(os.environ.get('ANALYZE_BATCH_TIMEOUT', 60))
+
+_executor = None
+_executor_pid = None
+_stats = {"batches": 0, "files": 0, "cached": 0, "failed": 0}
+_lock = threading.Lock()
+
+
+class FileTimeout(Exception):
+    """Raised inside a pool process when one file takes too long"""
+
+
+def _alarm(signum, frame):
+    raise FileTimeout()
+
+
+def _analyze_file(lang, code, timeout):
+    """Analyze one file in a pool process, giving up after timeout seconds"""
+    timed = hasattr(signal, 'setitimer')  # Not on Windows
+    if timed:
+        previous = signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return analyzer.analyze(code, lang)
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def _get_executor():
+    """Return this process's pool (a forked web worker needs its own)"""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor_pid != os.getpid():
+            # forkserver children don't inherit the web worker's threads and locks
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+            _executor = ProcessPoolExecutor(max_workers=ANALYZE_WORKERS,
+                                            mp_context=multiprocessing.get_context(method))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor(broken):
+    global _executor_pid
+    with _lock:
+        if _executor is broken:
+            _executor_pid = None
+    broken.shutdown(wait=False)
+
+
+def validate(files):
+    """Why a batch can't run, or None"""
+    if not isinstance(files, list) or not files:
+        return "No files provided."
+    if len(files) > MAX_FILES:
+        return f"Too many files (at most {MAX_FILES})."
+    names = set()
+    for entry in files:
+        if not isinstance(entry, dict) or not isinstance(entry.get("filename"), str):
+            return "Each file needs a filename."
+        if not isinstance(entry.get("code", ""), str):
+            return f"{entry['filename']}: code must be a string."
+        if entry["filename"] in names:
+            return f"Duplicate filename: {entry['filename']}"
+        names.add(entry["filename"])
+    return None
+
+
+def _result(entry, diagnostics=None, cached=False, error=None):
+    result = {"filename": entry["filename"], "language": entry.get("language", "")}
+    if error:
+        result["error"] = error
+    else:
+        result.update(issues=analyzer.issue_list(diagnostics), diagnostics=diagnostics, cached=cached)
+    return result
+
+
+def iter_batch(files, file_timeout=FILE_TIMEOUT, budget=BATCH_TIMEOUT):
+    """
+    Analyze validated files, yielding each file's result as it is ready:
+    cached files first, the rest in completion order.
+    """
+    with _lock:
+        _stats["batches"] += 1
+        _stats["files"] += len(files)
+
+    pending = []
+    for entry in files:
+        code, lang = entry.get("code", ""), entry.get("language", "")
+        if lang not in analyzer.LANGUAGES:
+            yield _result(entry, error="Unsupported language.")
+        elif not code.strip():
+            yield _result(entry, error="No code provided.")
+        else:
+            diagnostics = analyze_cache.get(lang, code)
+            if diagnostics is None:
+                pending.append(entry)
+            else:
+                with _lock:
+                    _stats["cached"] += 1
+                yield _result(entry, diagnostics, cached=True)
+    if not pending:
+        return
+
+    executor = _get_executor()
+    futures = {executor.submit(_analyze_file, entry["language"], entry["code"], file_timeout): entry
+               for entry in pending}
+    done = set()
+    try:
+        for future in as_completed(futures, timeout=budget):
+            done.add(future)
+            entry = futures[future]
+            try:
+                diagnostics = future.result()
+            except FileTimeout:
+                yield _result(entry, error=f"Analysis timed out ({file_timeout}s limit).")
+            except BrokenProcessPool:
+                _reset_executor(executor)
+                yield _result(entry, error="Analysis failed: the analyzer process died.")
+            except Exception as e:
+                yield _result(entry, error=f"Analysis failed: {str(e)}")
+            else:
+                analyze_cache.put(entry["language"], entry["code"], diagnostics)
+                yield _result(entry, diagnostics)
+    except TimeoutError:
+        for future, entry in futures.items():
+            if future not in done:
+                done.add(future)
+                yield _result(entry, error=f"Batch time limit of {budget}s exceeded.")
+    finally:
+        # Also reached when the consumer stops early; running files end at their own limit
+        for future in futures:
+            if future not in done:
+                future.cancel()
+
+
+def summarize(results, started):
+    """Counts for a finished batch"""
+    failed = sum(1 for r in results if "error" in r)
+    with _lock:
+        _stats["failed"] += failed
+    return {
+        "files": len(results),
+        "analyzed": len(results) - failed,
+        "cached": sum(1 for r in results if r.get("cached")),
+        "failed": failed,
+        "time": round(time.monotonic() - started, 4),
+    }
+
+
+def get_stats():
+    """Return batch counters for this worker process"""
+    with _lock:
+        return dict(_stats, workers=ANALYZE_WORKERS)
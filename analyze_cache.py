@@ -0,0 +1,173 @@
+"""
+Result cache for /analyze.
+
+The editor sends the same code to /analyze over and over, so diagnostics
+are cached under the SHA-256 of the language, analyzer.ANALYZER_VERSION and
+the code. Each worker process keeps a bounded LRU of recent results. With
+ANALYZE_CACHE_SHARED=1 results are also written to a SQLite database that
+every gunicorn worker on the host shares, so one worker's result serves the
+others. Entries in both expire after ANALYZE_CACHE_TTL seconds.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import analyzer
+
+ANALYZE_CACHE_DB = os.environ.get(
+    'ANALYZE_CACHE_DB',
+    os.path.join(tempfile.gettempdir(), 'ai_tester_analyze_cache.db')
+)
+SHARED = os.environ.get('ANALYZE_CACHE_SHARED', '0') == '1'
+CACHE_SIZE = int(os.environ.get('ANALYZE_CACHE_SIZE', 512))  # Entries per worker
+SHARED_SIZE = int(os.environ.get('ANALYZE_CACHE_SHARED_SIZE', 8192))
+TTL = float(os.environ.get('ANALYZE_CACHE_TTL', 3600))
+PRUNE_EVERY = 100  # Shared writes between removals of expired and excess rows
+
+_local = threading.local()
+_entries = OrderedDict()  # key -> (expires_at, diagnostics)
+_stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+_writes = 0
+_lock = threading.Lock()
+
+
+def cache_key(lang, code):
+    """Build the cache key for analyzing code"""
+    digest = hashlib.sha256()
+    for part in (lang, str(analyzer.ANALYZER_VERSION), code):
+        digest.update(part.encode('utf-8', errors='surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _get_connection():
+    """Return this thread's shared cache connection, creating the schema once"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == ANALYZE_CACHE_DB:
+        return conn
+    conn = sqlite3.connect(ANALYZE_CACHE_DB, timeout=5, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            diagnostics TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_results_expires_at ON results (expires_at)')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.path = ANALYZE_CACHE_DB
+    return conn
+
+
+def _shared_get(key):
+    try:
+        row = _get_connection().execute(
+            'SELECT diagnostics FROM results WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Analyze cache read failed: {e}")
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def _shared_put(key, diagnostics):
+    global _writes
+    try:
+        conn = _get_connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO results (key, diagnostics, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(diagnostics), time.time() + TTL)
+        )
+        with _lock:
+            _writes += 1
+            prune = _writes % PRUNE_EVERY == 0
+        if prune:
+            conn.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),))
+            # Rows expiring soonest were written longest ago
+            conn.execute('''
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (SHARED_SIZE,))
+    except sqlite3.Error as e:
+        print(f"Analyze cache write failed: {e}")
+
+
+def _local_put(key, diagnostics):
+    with _lock:
+        _entries[key] = (time.monotonic() + TTL, diagnostics)
+        _entries.move_to_end(key)
+        while len(_entries) > CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def get(lang, code):
+    """
+    Return the cached diagnostics for code, or None (counted as a miss).
+
+    Cached diagnostics are shared between requests and must not be modified.
+    """
+    key = cache_key(lang, code)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[1]
+
+    if SHARED:
+        diagnostics = _shared_get(key)
+        if diagnostics is not None:
+            _local_put(key, diagnostics)
+            with _lock:
+                _stats["shared_hits"] += 1
+            return diagnostics
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def put(lang, code, diagnostics):
+    """Cache the diagnostics analyzer.analyze() found in code"""
+    key = cache_key(lang, code)
+    _local_put(key, diagnostics)
+    if SHARED:
+        _shared_put(key, diagnostics)
+
+
+def get_or_analyze(lang, code):
+    """Return (diagnostics, cached) for code, running analyzer.analyze() on a miss"""
+    diagnostics = get(lang, code)
+    if diagnostics is not None:
+        return diagnostics, True
+    diagnostics = analyzer.analyze(code, lang)
+    put(lang, code, diagnostics)
+    return diagnostics, False
+
+
+def clear():
+    """Drop this worker's entries (the shared database is left alone)"""
+    with _lock:
+        _entries.clear()
+
+
+def get_stats():
+    """Return cache counters for this worker process"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+    stats["shared"] = SHARED
+    return stats
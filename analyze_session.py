@@ -0,0 +1,255 @@
+"""
+Incremental analysis sessions for as-you-type checking.
+
+A session holds one document: the client sends the full text once, then
+only edits (a line/column range and its replacement). For JavaScript, Java
+and C++ the session keeps the document's tokens and local-rule diagnostics
+line by line. After an edit it re-tokenizes from the edited line until the
+token stream lines up with the old one again, re-runs the local rules on
+just those lines and re-runs the (cheap, whole-file) remaining rules.
+Python's checks need the whole module, so Python sessions are re-parsed in
+full, which is still one ast parse.
+
+Sessions live in the memory of the worker that created them. A request
+that reaches another worker, or comes after the session expired, gets a
+404 and the client starts a new session with the full text.
+"""
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import analyzer
+
+SESSION_TTL = int(os.environ.get('ANALYZE_SESSION_TTL', 600))
+MAX_SESSIONS = int(os.environ.get('ANALYZE_MAX_SESSIONS', 256))
+
+_sessions = OrderedDict()  # session ID -> Session, least recently used first
+_stats = {"created": 0, "edits": 0, "expired": 0}
+_lock = threading.Lock()
+
+
+class VersionConflict(Exception):
+    """Raised when edits are based on a different version than the session's"""
+
+
+def _line_starts(text, offset=0):
+    starts = []
+    index = text.find('\n')
+    while index != -1:
+        starts.append(offset + index + 1)
+        index = text.find('\n', index + 1)
+    return starts
+
+
+class Session:
+    """One document under analysis; callers serialize access with .lock"""
+
+    def __init__(self, lang, code, owner):
+        self.lang = lang
+        self.owner = owner
+        self.version = 1
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.text = code
+        self.line_starts = [0] + _line_starts(code)
+        # Per line: tokens starting on it, whether it starts inside an earlier
+        # line's token, and local-rule diagnostics (their line numbers go stale
+        # as lines shift; diagnostics() renumbers them)
+        self.tokens = []
+        self.covered = []
+        self.local = []
+        self.file_diagnostics = []
+        if lang == "python":
+            self.file_diagnostics = analyzer.analyze(code, lang)
+        else:
+            self._relex(0, len(self.line_starts), 0)
+            self.file_diagnostics = self._file_rules()
+
+    def diagnostics(self, start=0, end=None):
+        """Whole-file diagnostics plus those on lines [start, end) (0-based)"""
+        end = len(self.line_starts) if end is None else end
+        found = [d for d in self.file_diagnostics if d["line"] is None or start < d["line"] <= end]
+        for index in range(start, min(end, len(self.local))):
+            for d in self.local[index]:
+                found.append(dict(d, line=index + 1) if d["line"] != index + 1 else d)
+        found.sort(key=lambda d: (d["line"] or 0, d["column"] or 0))
+        return found
+
+    def _offset(self, position):
+        """Offset of a {line, column} position (1-based)"""
+        line, column = int(position["line"]), int(position["column"])
+        if not 1 <= line <= len(self.line_starts):
+            raise ValueError(f"Line {line} is outside the document.")
+        start = self.line_starts[line - 1]
+        end = self.line_starts[line] - 1 if line < len(self.line_starts) else len(self.text)
+        if not 1 <= column <= end - start + 1:
+            raise ValueError(f"Column {column} is outside line {line}.")
+        return start + column - 1
+
+    def apply(self, edit):
+        """
+        Apply one edit and re-analyze what it touched.
+
+        Returns (start, end, old_end): lines [start, old_end) of the previous
+        version became lines [start, end) of this one (0-based).
+        """
+        first = int(edit["start"]["line"]) - 1
+        last = int(edit["end"]["line"]) - 1
+        a, b = self._offset(edit["start"]), self._offset(edit["end"])
+        if b < a:
+            raise ValueError("Edit range ends before it starts.")
+        replacement = edit.get("text") or ""
+        shift = len(replacement) - (b - a)
+        self.text = self.text[:a] + replacement + self.text[b:]
+        self.line_starts[first + 1:] = _line_starts(replacement, a) + \
+            [start + shift for start in self.line_starts[last + 1:]]
+        changed_end = first + replacement.count('\n') + 1
+        delta = changed_end - (last + 1)
+
+        if self.lang == "python":
+            self.file_diagnostics = analyzer.analyze(self.text, self.lang)
+            return 0, len(self.line_starts), len(self.line_starts) - delta
+        start, end, old_end = self._relex(first, changed_end, delta)
+        if analyzer.rules_for(self.lang, local=False):
+            self.file_diagnostics = self._file_rules()
+        return start, end, old_end
+
+    def _last_token(self, lines, before):
+        """The last token (other than an indent) on lines before index before"""
+        for index in range(before - 1, -1, -1):
+            for token in reversed(lines[index]):
+                if token.kind != 'indent':
+                    return token
+        return None
+
+    def _relex(self, start, changed_end, delta):
+        """
+        Re-tokenize from line start, which is unchanged up to the edit, and
+        replace the lines' tokens and local diagnostics. Lines from changed_end
+        on are old lines moved by delta; scanning stops at the first of them
+        that starts in the same state as before.
+        """
+        while start > 0 and self.covered[start]:
+            start -= 1
+        old_count = len(self.tokens)
+        previous = self._last_token(self.tokens, start)
+        tokens, covered = [[]], [False]
+        old_end = old_count
+        for token in analyzer.scan(self.text, self.lang, self.line_starts[start], start + 1, previous):
+            if token.kind == 'newline':
+                index = start + len(tokens)  # The line this newline starts
+                old = index - delta
+                if index >= changed_end and old < old_count and not self.covered[old]:
+                    # A JavaScript line's scan also depends on the token before it
+                    old_previous = self._last_token(self.tokens, old)
+                    if analyzer.scan_state(self.lang, previous) == \
+                            analyzer.scan_state(self.lang, old_previous):
+                        old_end = old
+                        break
+                tokens.append([])
+                covered.append(False)
+                continue
+            if token.kind != 'indent':
+                previous = token
+            tokens[-1].append(token)
+            # Only strings and comments span lines
+            for _ in range(token.text.count('\n')):
+                tokens.append([])
+                covered.append(True)
+
+        end = start + len(tokens)
+        source = analyzer.Source(self.text, self.lang, list(itertools.chain.from_iterable(tokens)),
+                                 None, None)
+        local = [[] for _ in tokens]
+        for d in analyzer.run_rules(source, local=True):
+            local[d["line"] - 1 - start].append(d)
+        self.tokens[start:old_end] = tokens
+        self.covered[start:old_end] = covered
+        self.local[start:old_end] = local
+        return start, end, old_end
+
+    def _file_rules(self):
+        source = analyzer.Source(self.text, self.lang, list(itertools.chain.from_iterable(self.tokens)),
+                                 None, None)
+        return analyzer.run_rules(source, local=False)
+
+
+def _expire():
+    now = time.monotonic()
+    while _sessions:
+        session_id, session = next(iter(_sessions.items()))
+        if now - session.last_used < SESSION_TTL and len(_sessions) <= MAX_SESSIONS:
+            break
+        del _sessions[session_id]
+        _stats["expired"] += 1
+
+
+def create(lang, code, owner):
+    """Start a session for a document; returns (session ID, session)"""
+    session = Session(lang, code, owner)
+    session_id = uuid.uuid4().hex
+    with _lock:
+        _sessions[session_id] = session
+        _stats["created"] += 1
+        _expire()
+    return session_id, session
+
+
+def get(session_id, owner):
+    """The session with this ID if owner started it, else None"""
+    with _lock:
+        _expire()
+        session = _sessions.get(session_id)
+        if session is None or session.owner != owner:
+            return None
+        session.last_used = time.monotonic()
+        _sessions.move_to_end(session_id)
+        return session
+
+
+def edit(session, version, edits):
+    """
+    Apply edits (in order) made to the given version of the session's document.
+
+    Returns the changed region as {"start", "end", "oldEnd"} (1-based lines,
+    end exclusive; oldEnd in the previous version's numbering) and the
+    diagnostics now in it. Raises VersionConflict or ValueError, in which
+    case the session is unusable and should be discarded.
+    """
+    if version != session.version:
+        raise VersionConflict(f"Session is at version {session.version}, not {version}.")
+    region = None
+    for change in edits:
+        start, end, old_end = session.apply(change)
+        if region is None:
+            region = (start, end, old_end)
+            continue
+        # Merge with the earlier edits' region: lines from common on (in the
+        # numbering between the two edits) are untouched by both
+        first, last, first_old_end = region
+        common = max(old_end, last)
+        region = (min(first, start), common + end - old_end, common - last + first_old_end)
+    session.version += 1
+    with _lock:
+        _stats["edits"] += len(edits)
+    start, end, old_end = region or (0, 0, 0)
+    # Whole-file findings are resent with every edit
+    return {"start": start + 1, "end": end + 1, "oldEnd": old_end + 1}, session.diagnostics(start, end)
+
+
+def discard(session_id, owner):
+    with _lock:
+        session = _sessions.get(session_id)
+        if session is None or session.owner != owner:
+            return False
+        del _sessions[session_id]
+        return True
+
+
+def get_stats():
+    """Return session counters for this worker process"""
+    with _lock:
+        return dict(_stats, active=len(_sessions))
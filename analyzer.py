@@ -0,0 +1,520 @@
+"""
+Static analysis behind /analyze.
+
+Source code is split into tokens in a single pass by a per-language
+tokenizer that understands strings and comments, so checks never trip over
+a quote in a comment or an operator in a string. Python is parsed once with
+ast and tokenize instead, and the resulting tree is shared with the
+debugger.
+
+Checks are rules registered with @rule for the languages they apply to;
+every rule reads the same parsed Source, and each reports findings with a
+line and column.
+"""
+import ast
+import builtins
+import functools
+import io
+import re
+import tokenize as py_tokenize
+from collections import namedtuple
+
+# Bump whenever rules or their messages change; cached results are keyed on it
+ANALYZER_VERSION = 3
+
+Token = namedtuple('Token', 'kind text line column')
+# tree is only set for Python that compiles; error is why it didn't otherwise
+Source = namedtuple('Source', 'code lang tokens tree error')
+
+# Alternatives shared by every language, tried after its strings and comments
+_NUMBER = r'(?:0[xXbBoO][0-9a-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)[A-Za-z]*'
+_OPERATOR = (r'>>>=|===|!==|\*\*=|\.\.\.|<<=|>>=|>>>|//=|->|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.'
+             r'|\+\+|--|::|:=|<<|>>|\*\*|//|[-+*/%&|^]=|.')
+_COMMON = [
+    ('newline', r'\n'),
+    ('space', r'[ \t\r\f\v]+'),
+]
+_TAIL = [
+    ('number', _NUMBER),
+    ('name', r'[A-Za-z_$][\w$]*'),
+    ('op', _OPERATOR),
+]
+_C_COMMENTS = [
+    ('comment', r'//[^\n]*|/\*[\s\S]*?\*/'),
+    ('unterminated_comment', r'/\*[\s\S]*'),
+]
+_C_STRINGS = [
+    ('string', r'"(?:[^"\\\n]|\\[\s\S])*"|\'(?:[^\'\\\n]|\\[\s\S])*\''),
+    ('unterminated_string', r'"(?:[^"\\\n]|\\[\s\S])*|\'(?:[^\'\\\n]|\\[\s\S])*'),
+]
+
+_LANGUAGE_TOKENS = {
+    "javascript": _C_COMMENTS + [
+        ('string', r'`(?:[^`\\]|\\[\s\S])*`'),
+        ('unterminated_string', r'`(?:[^`\\]|\\[\s\S])*'),
+    ] + _C_STRINGS,
+    "java": _C_COMMENTS + [
+        ('string', r'"""[\s\S]*?"""'),
+    ] + _C_STRINGS,
+    "cpp": _C_COMMENTS + [
+        ('string', r'R"([^(\s]*)\([\s\S]*?\)\1"'),
+    ] + _C_STRINGS,
+}
+
+LANGUAGES = ("python",) + tuple(_LANGUAGE_TOKENS)
+
+_PATTERNS = {
+    lang: re.compile('|'.join(f'(?P<{kind}{i}>{regex})'
+                              for i, (kind, regex) in enumerate(_COMMON + tokens + _TAIL)))
+    for lang, tokens in _LANGUAGE_TOKENS.items()
+}
+# Token kinds that may span lines
+_MULTILINE = {'string', 'comment', 'unterminated_string', 'unterminated_comment'}
+
+# A '/' in JavaScript starts a regular expression unless it follows an operand
+_JS_REGEX = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                      'void', 'throw', 'instanceof', 'yield', 'await'}
+
+
+def _starts_js_regex(previous):
+    if previous is None:
+        return True
+    if previous.kind == 'op':
+        return previous.text not in (')', ']', '}', '++', '--')
+    return previous.kind == 'name' and previous.text in _JS_REGEX_KEYWORDS
+
+
+_PYTHON_KINDS = {
+    py_tokenize.NAME: 'name',
+    py_tokenize.NUMBER: 'number',
+    py_tokenize.STRING: 'string',
+    py_tokenize.COMMENT: 'comment',
+    py_tokenize.OP: 'op',
+    py_tokenize.INDENT: 'indent',
+    py_tokenize.ERRORTOKEN: 'op',
+}
+
+
+def _tokenize_python(code):
+    tokens = []
+    try:
+        for token in py_tokenize.generate_tokens(io.StringIO(code).readline):
+            kind = _PYTHON_KINDS.get(token.type)
+            if kind:
+                line, column = token.start
+                tokens.append(Token(kind, token.string, line, column + 1))
+    except (py_tokenize.TokenError, SyntaxError):
+        pass  # Keep what came before; the parser reports the error
+    return tokens
+
+
+def scan_state(lang, previous):
+    """What scan() needs to know about the token before its starting point"""
+    return _starts_js_regex(previous) if lang == "javascript" else None
+
+
+def tokenize(code, lang):
+    """
+    Split code into Tokens in one pass.
+
+    Spaces and newlines are dropped, except that the whitespace starting an
+    indented line is kept as an 'indent' token (for Python, only where the
+    indentation grows). JavaScript regular expression literals are 'regex'
+    tokens.
+    """
+    if lang == "python":
+        return _tokenize_python(code)
+    return [token for token in scan(code, lang) if token.kind != 'newline']
+
+
+def scan(code, lang, pos=0, line=1, previous=None):
+    """
+    Yield the Tokens of code from pos, which must be the start of line, with
+    a 'newline' token at the end of every line.
+
+    previous is the last token before pos (other than an indent); JavaScript
+    needs it to tell a regular expression from a division. Not for Python.
+    """
+    match = _PATTERNS[lang].match
+    line_start = pos
+    end = len(code)
+    while pos < end:
+        m = match(code, pos)
+        kind = m.lastgroup.rstrip('0123456789')
+        if lang == "javascript" and m.group() in ('/', '/=') and _starts_js_regex(previous):
+            regex = _JS_REGEX.match(code, pos)
+            if regex:
+                m, kind = regex, 'regex'
+        text = m.group()
+        if kind == 'newline':
+            yield Token(kind, text, line, pos - line_start + 1)
+            line += 1
+            line_start = m.end()
+        elif kind == 'space':
+            # Blank lines have no indentation to speak of
+            if pos == line_start and code[m.end():m.end() + 1] not in ('\n', ''):
+                yield Token('indent', text, line, 1)
+        else:
+            previous = Token(kind, text, line, pos - line_start + 1)
+            yield previous
+            if kind in _MULTILINE:
+                newlines = text.count('\n')
+                if newlines:
+                    line += newlines
+                    line_start = pos + text.rfind('\n') + 1
+        pos = m.end()
+
+
+# ===== RULE REGISTRY =====
+
+RULES = []  # Registered rules, in reporting order
+
+
+def rule(name, languages, severity='warning', local=False):
+    """
+    Register a check for the given languages.
+
+    The check is called with the parsed Source and yields (line, column,
+    message) findings; line and column are None for findings about the
+    file as a whole. A local rule judges each token on its own, so it can
+    be re-run on just the tokens of edited lines.
+    """
+    def register(check):
+        RULES.append({"name": name, "languages": set(languages), "severity": severity,
+                      "local": local, "check": check})
+        return check
+    return register
+
+
+def rules_for(lang, local=None):
+    """Rules enabled for lang, optionally only the local (or non-local) ones"""
+    return [r for r in RULES if lang in r["languages"] and local in (None, r["local"])]
+
+
+def run_rules(source, local=None):
+    """Run the rules for source's language over it; returns diagnostics in source order"""
+    diagnostics = []
+    for r in rules_for(source.lang, local):
+        for line, column, message in r["check"](source):
+            diagnostics.append({
+                "rule": r["name"],
+                "severity": r["severity"],
+                "line": line,
+                "column": column,
+                "message": message,
+            })
+    # Findings about the whole file first, then in source order
+    diagnostics.sort(key=lambda d: (d["line"] or 0, d["column"] or 0))
+    return diagnostics
+
+
+@functools.lru_cache(maxsize=16)
+def parse(code, lang):
+    """
+    Tokenize code, and for Python also parse it, once.
+
+    Memoized so /analyze and /debug on the same code share the work; the
+    returned Source must not be modified. Deeply nested code that the
+    parser or compiler can't handle is reported as the error.
+    """
+    tree = error = None
+    if lang == "python":
+        try:
+            tree = ast.parse(code)
+            # Only the compiler reports errors such as 'return' outside a function
+            compile(tree, '<string>', 'exec')
+        except (SyntaxError, ValueError, RecursionError, MemoryError) as e:
+            tree, error = None, e
+    return Source(code, lang, tokenize(code, lang), tree, error)
+
+
+def analyze(code, lang):
+    """Run every rule enabled for lang over the parsed code; returns diagnostics"""
+    return run_rules(parse(code, lang))
+
+
+def format_issue(diagnostic):
+    """A diagnostic as the one-line text /analyze has always returned"""
+    if diagnostic["line"] is None:
+        return diagnostic["message"]
+    return f"Line {diagnostic['line']}, column {diagnostic['column']}: {diagnostic['message']}"
+
+
+def issue_list(diagnostics):
+    """The issues strings of an /analyze response"""
+    return [format_issue(d) for d in diagnostics] or ["✅ No major issues found!"]
+
+
+def _follows(tokens, *texts):
+    """Whether the texts appear as consecutive tokens"""
+    size = len(texts)
+    return any(tuple(token.text for token in tokens[i:i + size]) == texts
+               for i, token in enumerate(tokens) if token.text == texts[0])
+
+
+# ===== RULES =====
+
+
+@rule('unterminated-string', ('javascript', 'java', 'cpp'), severity='error', local=True)
+def _unterminated_string(source):
+    for token in source.tokens:
+        if token.kind == 'unterminated_string':
+            yield token.line, token.column, "Unterminated string literal"
+
+
+@rule('unterminated-comment', ('javascript', 'java', 'cpp'), severity='error', local=True)
+def _unterminated_comment(source):
+    for token in source.tokens:
+        if token.kind == 'unterminated_comment':
+            yield token.line, token.column, "Unterminated block comment"
+
+
+@rule('strict-equality', ('javascript',), local=True)
+def _strict_equality(source):
+    for token in source.tokens:
+        if token.kind == 'op' and token.text in ('==', '!='):
+            yield token.line, token.column, f"Use {token.text}= instead of {token.text} for strict equality."
+
+
+@rule('no-var', ('javascript',), local=True)
+def _no_var(source):
+    for token in source.tokens:
+        if token.kind == 'name' and token.text == 'var':
+            yield token.line, token.column, "Consider using 'let' or 'const' instead of 'var'."
+
+
+@rule('class-declaration', ('java',))
+def _class_declaration(source):
+    tokens = source.tokens
+    if not any(token.text == 'class' and i + 1 < len(tokens) and tokens[i + 1].kind == 'name'
+               for i, token in enumerate(tokens) if token.kind == 'name'):
+        yield None, None, "No class declaration found."
+
+
+@rule('print-statement', ('java',), severity='info')
+def _print_statement(source):
+    if not _follows(source.tokens, 'System', '.', 'out', '.', 'println'):
+        yield None, None, "No print statement found (System.out.println)."
+
+
+@rule('main-function', ('cpp',))
+def _main_function(source):
+    if not _follows(source.tokens, 'int', 'main', '('):
+        yield None, None, "No main() function found."
+
+
+@rule('include-directive', ('cpp',), severity='info')
+def _include_directive(source):
+    if not _follows(source.tokens, '#', 'include'):
+        yield None, None, "No #include directives found."
+
+
+# ===== PYTHON RULES =====
+# These read the tree from parse(); apart from syntax-error they report
+# nothing for code that doesn't compile.
+
+_BUILTIN_NAMES = {name for name in dir(builtins) if not name.startswith('_')}
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+_SCOPE_NODES = _FUNCTION_NODES + (ast.ClassDef,)
+_TERMINAL_NODES = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+
+
+@rule('syntax-error', ('python',), severity='error')
+def _python_syntax(source):
+    error = source.error
+    if isinstance(error, SyntaxError):
+        yield error.lineno, error.offset, f"Syntax error: {error.msg}"
+    elif isinstance(error, (RecursionError, MemoryError)):
+        yield None, None, "Code is nested too deeply to analyze."
+    elif error is not None:
+        yield None, None, f"Error: {str(error)}"
+
+
+@rule('mixed-indentation', ('python',))
+def _mixed_indentation(source):
+    style = None
+    for token in source.tokens:
+        if token.kind != 'indent':
+            continue
+        current = 'tabs' if token.text[0] == '\t' else 'spaces'
+        if style is None:
+            style = current
+        elif current != style or ('\t' in token.text and ' ' in token.text):
+            yield token.line, 1, "Mixing tabs and spaces for indentation is discouraged."
+            return
+
+
+@rule('unreachable-code', ('python',))
+def _unreachable_code(source):
+    if source.tree is None:
+        return
+    for node in ast.walk(source.tree):
+        for field in ('body', 'orelse', 'finalbody'):
+            block = getattr(node, field, None)
+            if not isinstance(block, list):
+                continue
+            for statement, following in zip(block, block[1:]):
+                if isinstance(statement, _TERMINAL_NODES):
+                    yield following.lineno, following.col_offset + 1, \
+                        f"Unreachable code after '{type(statement).__name__.lower()}'."
+                    break
+
+
+def _bindings(node):
+    """(name, node) pairs for the names a statement or argument list binds in its own scope"""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        yield node.name, node
+    elif isinstance(node, (ast.Import, ast.ImportFrom)):
+        for alias in node.names:
+            if alias.name != '*':
+                yield (alias.asname or alias.name).split('.')[0], node
+    elif isinstance(node, ast.arg):
+        yield node.arg, node
+    elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+        yield node.id, node
+
+
+class _Scope:
+    def __init__(self, node):
+        self.node = node
+        self.stores = {}  # name -> first binding node
+        self.loads = set()
+        self.declared = set()  # global and nonlocal names
+        self.imports = set()
+
+
+class _ScopeVisitor:
+    """
+    Collects the names bound and used in each scope, in one walk of the tree.
+
+    The walk runs off a work list instead of recursing, so a long chain like
+    1+1+...+1 (one nested BinOp per term) can't exhaust the Python stack.
+    Each visit_* method returns the (step, item) pairs to run next, in order.
+    """
+
+    def __init__(self):
+        self.scopes = []
+        self.stack = []
+
+    def visit(self, tree):
+        work = [(self._visit_node, tree)]
+        while work:
+            step, item = work.pop()
+            work.extend(reversed(step(item) or ()))
+
+    def _visit_node(self, node):
+        return getattr(self, 'visit_' + type(node).__name__, self.generic_visit)(node)
+
+    def generic_visit(self, node):
+        return [(self._visit_node, child) for child in ast.iter_child_nodes(node)]
+
+    def visit_scope(self, node):
+        scope = _Scope(node)
+        self.scopes.append(scope)
+        self.stack.append(scope)
+        return self.generic_visit(node) + [(self._leave_scope, scope)]
+
+    def _leave_scope(self, scope):
+        self.stack.pop()
+        if self.stack:
+            # Names a nested scope uses (or declares nonlocal) may be the enclosing scope's
+            local = set(scope.stores) - scope.declared
+            self.stack[-1].loads |= (scope.loads - local) | scope.declared
+
+    def _bind(self, node):
+        scope = self.stack[-1]
+        for name, binding in _bindings(node):
+            scope.stores.setdefault(name, binding)
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                scope.imports.add(name)
+
+    def visit_Module(self, node):
+        return self.visit_scope(node)
+
+    def _visit_definition(self, node):
+        # The name, decorators and defaults belong to the enclosing scope
+        self._bind(node)
+        return [(self._visit_node, decorator) for decorator in node.decorator_list] + \
+            [(self.visit_scope, node)]
+
+    def visit_FunctionDef(self, node):
+        return self._visit_definition(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        return self.visit_scope(node)
+
+    def visit_arg(self, node):
+        self._bind(node)
+        return self.generic_visit(node)
+
+    def visit_Import(self, node):
+        self._bind(node)
+
+    visit_ImportFrom = visit_Import
+
+    def visit_Global(self, node):
+        self.stack[-1].declared.update(node.names)
+
+    visit_Nonlocal = visit_Global
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Name):
+            self.stack[-1].loads.add(node.target.id)
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self._bind(node)
+        else:
+            self.stack[-1].loads.add(node.id)
+
+
+def _exported_names(tree):
+    """Strings listed in a module-level __all__"""
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == '__all__'
+                                                for t in node.targets):
+            if isinstance(node.value, (ast.List, ast.Tuple)):
+                return {e.value for e in node.value.elts
+                        if isinstance(e, ast.Constant) and isinstance(e.value, str)}
+    return set()
+
+
+@rule('unused-name', ('python',))
+def _unused_name(source):
+    if source.tree is None:
+        return
+    visitor = _ScopeVisitor()
+    visitor.visit(source.tree)
+    exported = _exported_names(source.tree)
+    for scope in visitor.scopes:
+        if isinstance(scope.node, ast.ClassDef):
+            continue  # Class attributes are used through the class
+        for name, binding in scope.stores.items():
+            if name in scope.loads or name in scope.declared or name.startswith('_'):
+                continue
+            position = binding.lineno, binding.col_offset + 1
+            if name in scope.imports:
+                # Module-level imports listed in __all__ are re-exported
+                if not (isinstance(scope.node, ast.Module) and name in exported):
+                    yield position + (f"'{name}' is imported but never used.",)
+            elif isinstance(scope.node, ast.Module):
+                continue  # Other module-level names may be used by importers
+            elif isinstance(binding, ast.Name):
+                yield position + (f"Local variable '{name}' is assigned but never used.",)
+
+
+@rule('shadowed-builtin', ('python',), severity='info')
+def _shadowed_builtin(source):
+    if source.tree is None:
+        return
+    reported = set()
+    for node in ast.walk(source.tree):
+        for name, binding in _bindings(node):
+            if name in _BUILTIN_NAMES and name not in reported:
+                reported.add(name)
+                yield binding.lineno, binding.col_offset + 1, f"'{name}' shadows the built-in of the same name."
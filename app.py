@@ -1,15 +1,28 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, Response, stream_with_context
 import subprocess
-import tempfile
 import os
+import json
 import re
 import shutil
-import ast
-import sys
-import traceback
-from io import StringIO
+import codecs
+import functools
+import time
 from datetime import datetime
 import database
+import compile_cache
+import worker_pool
+import job_queue
+import process_io
+import scheduler
+import sandbox
+import suite_runner
+import suite_store
+import analyzer
+import analyze_cache
+import analyze_session
+import analyze_batch
+import debugger
+import comparator
 import oauth_config
 
 app = Flask(__name__)
@@ -98,6 +111,34 @@ def get_current_user():
     user_id = session.get('user_id')
     return database.get_user_by_id(user_id)
 
+# ===== EXECUTION SCHEDULING =====
+
+def scheduler_key():
+    """Identify the caller for fair-share scheduling"""
+    return session.get('user_id') or request.remote_addr
+
+def scheduled(lane=scheduler.NORMAL):
+    """Run the decorated view while holding a scheduler slot"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with scheduler.slot(scheduler_key(), lane):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def run_scheduled(user_key, fn, *args):
+    """Job body for async executions: wait for a slot, then run"""
+    with scheduler.slot(user_key):
+        return fn(*args)
+
+@app.errorhandler(scheduler.Overloaded)
+def handle_overloaded(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
 # ===== HISTORY API ENDPOINTS =====
 
 @app.route("/api/history", methods=["GET"])
@@ -109,16 +150,28 @@ def get_history():
     
     type_filter = request.args.get('type')
     lang_filter = request.args.get('language')
-    limit = int(request.args.get('limit', 50))
+    limit = request.args.get('limit', 50, type=int)
+    before = None
+    if request.args.get('before'):
+        # "<created_at>,<id>" of the last entry of the previous page
+        created_at, _, history_id = request.args['before'].rpartition(',')
+        if not created_at or not history_id.isdigit():
+            return jsonify({"error": "Invalid cursor"}), 400
+        before = (created_at, int(history_id))
     
     history = database.get_user_history(
         user['id'],
         limit=limit,
         type_filter=type_filter,
-        lang_filter=lang_filter
+        lang_filter=lang_filter,
+        before=before,
+        search=request.args.get('search', '').strip() or None
     )
     
-    return jsonify({"history": history})
+    next_before = None
+    if history and len(history) == min(max(limit, 1), database.HISTORY_MAX_PAGE):
+        next_before = f"{history[-1]['created_at']},{history[-1]['id']}"
+    return jsonify({"history": history, "nextBefore": next_before})
 
 @app.route("/api/history", methods=["POST"])
 def add_history_item():
@@ -142,6 +195,18 @@ def add_history_item():
     
     return jsonify({"success": True, "id": history_id})
 
+@app.route("/api/history/<int:history_id>", methods=["GET"])
+def get_history_item(history_id):
+    """Get one history item with its full code, output and results"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    item = database.get_history_item(history_id, user['id'])
+    if not item:
+        return jsonify({"error": "History item not found"}), 404
+    return jsonify(item)
+
 @app.route("/api/history/<int:history_id>", methods=["DELETE"])
 def delete_history(history_id):
     """Delete a history item"""
@@ -162,6 +227,123 @@ def clear_history():
     deleted = database.clear_user_history(user['id'])
     return jsonify({"success": True, "deleted": deleted})
 
+# ===== TEST SUITE API ENDPOINTS =====
+
+def suite_view(suite):
+    """A stored suite as returned by the API (inputs kept on disk are only described)"""
+    cases = []
+    for case in suite["cases"]:
+        view = {"name": case["name"], "expected": case["expected"]}
+        if "input_file" in case:
+            view["input"] = None
+            view["inputBytes"] = os.path.getsize(case["input_file"]) if os.path.exists(case["input_file"]) else 0
+        else:
+            view["input"] = case["input"]
+        cases.append(view)
+    return dict(suite, cases=cases)
+
+@app.route("/api/suites", methods=["GET"])
+def list_test_suites():
+    """List the user's stored test suites"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    return jsonify({"suites": suite_store.list_suites(user['id'])})
+
+@app.route("/api/suites", methods=["POST"])
+@app.route("/api/suites/<int:suite_id>", methods=["PUT"])
+def save_test_suite(suite_id=None):
+    """Store a test suite, or replace the cases of an existing one"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    data = request.get_json(force=True)
+    try:
+        saved = suite_store.save(
+            user['id'],
+            data.get('name') or 'Untitled suite',
+            data.get('language'),
+            data.get('testCases', []),
+            suite_id=suite_id
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if saved is None:
+        return jsonify({"error": "Test suite not found"}), 404
+    
+    return jsonify(dict(saved, success=True))
+
+@app.route("/api/suites/<int:suite_id>", methods=["GET"])
+def get_test_suite(suite_id):
+    """Get a stored test suite with its cases"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    suite = suite_store.get(suite_id, user['id'])
+    if not suite:
+        return jsonify({"error": "Test suite not found"}), 404
+    
+    return jsonify(suite_view(suite))
+
+@app.route("/api/suites/<int:suite_id>", methods=["DELETE"])
+def delete_test_suite(suite_id):
+    """Delete a stored test suite"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    success = suite_store.delete(suite_id, user['id'])
+    return jsonify({"success": success})
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """Execution subsystem counters for this worker process"""
+    return jsonify({
+        "compile_cache": compile_cache.get_stats(),
+        "worker_pool": worker_pool.get_stats(),
+        "suite_cache": suite_store.get_stats(),
+        "analyze_cache": analyze_cache.get_stats(),
+        "analyze_sessions": analyze_session.get_stats(),
+        "analyze_batch": analyze_batch.get_stats(),
+        "debugger": debugger.get_stats(),
+        "jobs": job_queue.get_stats(),
+        "scheduler": scheduler.get_stats()
+    })
+
+# ===== ASYNC JOB ENDPOINTS =====
+
+def submit_job(type, fn, *args):
+    """Queue an execution and answer 202 with its job ID"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    key = scheduler_key()
+    scheduler.check_admission(key)
+    try:
+        job_id = job_queue.submit(user['id'], type, run_scheduled, key, fn, *args)
+    except job_queue.QueueFull:
+        return jsonify({"error": "Too many jobs in progress, try again shortly."}), 503
+
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Get a job's status and result, optionally long-polling with ?wait=<seconds>"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    wait = request.args.get('wait', 0, type=float)
+    job = job_queue.get(job_id, user['id'], wait=wait)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job)
+
 @app.route("/api/settings", methods=["GET"])
 def get_settings():
     """Get user settings"""
@@ -273,7 +455,18 @@ def update_profile():
                                  avatar_url=data.get('avatar_url'))
     return jsonify({"success": True})
 
+@app.route("/api/user/stats", methods=["GET"])
+def get_user_stats():
+    """Get counts of the current user's history for the profile page"""
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "Not authenticated"}), 401
+    
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    return jsonify(database.get_user_stats(user['id'], days))
+
 @app.route("/analyze", methods=["POST"])
+@scheduled(scheduler.SHORT)
 def analyze_code():
     print("Analyze endpoint called!")  # Debug log
     data = request.get_json(force=True)
@@ -289,128 +482,274 @@ def analyze_code():
     if lang not in SUPPORTED_LANGUAGES:
         return jsonify({"issues": ["Unsupported language."]})
 
-    # --- Improved Analysis logic ---
-    if lang == "javascript":
-        # Basic syntax checks for JavaScript
-        lines = code.splitlines()
-        for i, line in enumerate(lines):
-            # Check for mismatched quotes (basic)
-            stripped = line.strip()
-            if stripped and not stripped.startswith('//'):
-                # Count unescaped quotes
-                single_quotes = stripped.count("'") - stripped.count("\\'")
-                double_quotes = stripped.count('"') - stripped.count('\\"')
-                if single_quotes % 2 != 0:
-                    issues.append(f"Line {i+1}: Mismatched single quotes")
-                if double_quotes % 2 != 0:
-                    issues.append(f"Line {i+1}: Mismatched double quotes")
-            
-            # Check for == not ===, ignoring comments and strings
-            if "==" in line and "===" not in line and not line.strip().startswith("//"):
-                issues.append(f"Line {i+1}: Use === instead of == for strict equality.")
-            if "var " in line and not line.strip().startswith("//"):
-                issues.append(f"Line {i+1}: Consider using 'let' or 'const' instead of 'var'.")
-    elif lang == "python":
-        # Check for syntax errors by trying to compile
+    diagnostics, cached = analyze_cache.get_or_analyze(lang, code)
+    issues = analyzer.issue_list(diagnostics)
+
+    return jsonify({"issues": issues, "diagnostics": diagnostics, "cached": cached})
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch_files():
+    """Analyze many files ({filename, language, code}) in one request"""
+    data = request.get_json(force=True)
+    files = data.get("files")
+    error = analyze_batch.validate(files)
+    if error:
+        return jsonify({"error": error}), 400
+
+    started = time.monotonic()
+    with scheduler.slot(scheduler_key()):
+        results = list(analyze_batch.iter_batch(files, **batch_options(data)))
+    return jsonify({
+        "results": {result["filename"]: result for result in results},
+        "summary": analyze_batch.summarize(results, started)
+    })
+
+@app.route("/analyze/batch/stream", methods=["POST"])
+def analyze_batch_stream():
+    """Analyze many files, streaming each file's result as a Server-Sent Event"""
+    data = request.get_json(force=True)
+    files = data.get("files")
+    options = batch_options(data)
+
+    def generate():
+        error = analyze_batch.validate(files)
+        if error:
+            yield sse_event("error", {"message": error})
+            return
+
+        started = time.monotonic()
+        results = []
+        pending = analyze_batch.iter_batch(files, **options)
         try:
-            compile(code, '<string>', 'exec')
-        except SyntaxError as e:
-            issues.append(f"Syntax Error on line {e.lineno}: {e.msg}")
-        except Exception as e:
-            issues.append(f"Error: {str(e)}")
-        
-        # Check for indentation errors (basic)
-        lines = code.splitlines()
-        for i, line in enumerate(lines):
-            if re.match(r"^\s*def\s+\w+\(", line):
-                # Next non-empty line should be indented
-                j = i + 1
-                while j < len(lines) and lines[j].strip() == "":
-                    j += 1
-                if j < len(lines) and re.match(r"^\S", lines[j]):
-                    issues.append(f"Indentation error after function definition at line {j+1}.")
-        # Check for tabs mixed with spaces
-        if "\t" in code and "    " in code:
-            issues.append("Mixing tabs and spaces for indentation is discouraged.")
-    elif lang == "java":
-        if not re.search(r"class\s+\w+", code):
-            issues.append("No class declaration found.")
-        # Print statement is optional, so just a suggestion
-        if "System.out.println" not in code:
-            issues.append("No print statement found (System.out.println).")
-    elif lang == "cpp":
-        if "int main(" not in code:
-            issues.append("No main() function found.")
-        if "#include" not in code:
-            issues.append("No #include directives found.")
-
-    if not issues:
-        issues.append("✅ No major issues found!")
-
-    return jsonify({"issues": issues})
+            for result in pending:
+                results.append(result)
+                yield sse_event("result", result)
+        finally:
+            pending.close()
+        yield sse_event("summary", analyze_batch.summarize(results, started))
+
+    ticket_id = scheduler.acquire(scheduler_key())
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: scheduler.release(ticket_id))
+    return response
+
+def batch_options(data):
+    """fileTimeout and timeBudget (seconds) of a batch request, capped at the server's limits"""
+    options = {"file_timeout": analyze_batch.FILE_TIMEOUT, "budget": analyze_batch.BATCH_TIMEOUT}
+    try:
+        if data.get("fileTimeout"):
+            options["file_timeout"] = min(max(float(data["fileTimeout"]), 0.1), analyze_batch.FILE_TIMEOUT)
+        if data.get("timeBudget"):
+            options["budget"] = min(max(float(data["timeBudget"]), 0.1), analyze_batch.BATCH_TIMEOUT)
+    except (TypeError, ValueError):
+        pass
+    return options
+
+@app.route("/analyze/session", methods=["POST"])
+@scheduled(scheduler.SHORT)
+def start_analyze_session():
+    """Analyze a document and keep it for incremental updates"""
+    data = request.get_json(force=True)
+    code = data.get("code", "")
+    lang = data.get("language", "")
+
+    if lang not in SUPPORTED_LANGUAGES:
+        return jsonify({"error": "Unsupported language."}), 400
+
+    session_id, session = analyze_session.create(lang, code, scheduler_key())
+    return jsonify({
+        "sessionId": session_id,
+        "version": session.version,
+        "diagnostics": session.diagnostics()
+    })
+
+@app.route("/analyze/session/<session_id>", methods=["POST"])
+@scheduled(scheduler.SHORT)
+def edit_analyze_session(session_id):
+    """
+    Apply edits ({start: {line, column}, end: {line, column}, text}) to a
+    session's document and return the diagnostics of the lines they changed
+    """
+    data = request.get_json(force=True)
+    session = analyze_session.get(session_id, scheduler_key())
+    if not session:
+        return jsonify({"error": "Analysis session not found", "resync": True}), 404
+
+    with session.lock:
+        try:
+            changed, diagnostics = analyze_session.edit(session, data.get("version"), data.get("edits") or [])
+        except analyze_session.VersionConflict as e:
+            return jsonify({"error": str(e), "resync": True}), 409
+        except (ValueError, KeyError, TypeError) as e:
+            # Earlier edits of the batch may have been applied already
+            analyze_session.discard(session_id, scheduler_key())
+            return jsonify({"error": f"Invalid edit: {e}", "resync": True}), 400
+
+        return jsonify({"version": session.version, "changed": changed, "diagnostics": diagnostics})
+
+@app.route("/analyze/session/<session_id>", methods=["DELETE"])
+def end_analyze_session(session_id):
+    """Drop an analysis session"""
+    return jsonify({"success": analyze_session.discard(session_id, scheduler_key())})
 
 @app.route("/run", methods=["POST"])
 def run_code():
     data = request.get_json(force=True)
     code = data.get("code", "")
     lang = data.get("language", "")
+    limits = user_limits()
+
+    if data.get("async"):
+        return submit_job("run", execute_code, code, lang, limits)
+    with scheduler.slot(scheduler_key()):
+        return jsonify(execute_code(code, lang, limits))
+
+def user_limits():
+    """Resource limits for the current user's runs, based on their timeout setting"""
+    user = get_current_user()
+    settings = database.get_user_settings(user['id']) if user else None
+    return sandbox.limits_for(settings['timeout'] if settings else None)
 
+def execute_code(code, lang, limits=None):
+    """Run a program and return the /run response"""
     if not code.strip():
-        return jsonify({"output": "No code to run."})
+        return {"output": "No code to run."}
 
     if lang not in SUPPORTED_LANGUAGES:
-        return jsonify({"output": "Unsupported language."})
+        return {"output": "Unsupported language."}
 
-    filepath = None
-    output = ""
+    limits = limits or sandbox.limits_for()
+    proc = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=get_file_extension(lang)) as tmp:
-            tmp.write(code.encode("utf-8"))
-            tmp.flush()
-            filepath = tmp.name
+        proc, build = start_program(code, lang, limits=limits)
+        if proc is None:
+            return {"output": build["output"]}
+        compile_time = build["compile_time"] if build else 0.0
 
-        if lang == "python":
-            cmd = ["python", filepath]
-        elif lang == "javascript":
-            cmd = ["node", filepath]
-        elif lang == "java":
-            base = os.path.dirname(filepath)
-            filename = os.path.basename(filepath)
-            classname = filename.replace(".java", "")
-            compile_cmd = ["javac", filepath]
-            compile_proc = subprocess.run(compile_cmd, capture_output=True, text=True)
-            if compile_proc.returncode != 0:
-                output = compile_proc.stderr
-                return jsonify({"output": output})
-            cmd = ["java", "-cp", base, classname]
-        elif lang == "cpp":
-            exe_file = filepath.replace(".cpp", "")
-            compile_proc = subprocess.run(["g++", filepath, "-o", exe_file], capture_output=True, text=True)
-            if compile_proc.returncode != 0:
-                output = compile_proc.stderr
-                return jsonify({"output": output})
-            cmd = [exe_file]
-
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        output = result.stdout or result.stderr
-
-        return jsonify({"output": output})
-    except subprocess.TimeoutExpired:
-        return jsonify({"output": "Execution timed out (10s limit)."})
+        started = time.monotonic()
+        stdout = stderr = None
+        try:
+            stdout, stderr = process_io.collect(proc, timeout=limits["wall"])
+            sandbox.wait(proc, max(limits["wall"] - (time.monotonic() - started), 0))
+            limit_message = sandbox.describe_exit(proc.returncode, limits)
+        except subprocess.TimeoutExpired as e:
+            sandbox.kill(proc)
+            # Whatever the program printed before the deadline is still shown
+            if stdout is None:
+                stdout, stderr = e.output, e.stderr
+            limit_message = f"Execution timed out ({limits['wall']}s limit)."
+
+        # Large outputs come back as a head/tail preview plus their real size
+        output = stdout.text() or stderr.text()
+        if limit_message:
+            output = f"{output}\n{limit_message}" if output else limit_message
+
+        return {
+            "output": output,
+            "truncated": stdout.truncated or stderr.truncated,
+            "output_bytes": {"stdout": stdout.total, "stderr": stderr.total},
+            "usage": sandbox.usage(proc, time.monotonic() - started, compile_time)
+        }
     except Exception as e:
-        return jsonify({"output": f"Error: {str(e)}"})
-    finally:
-        if filepath and os.path.exists(filepath):
-            os.remove(filepath)
-        # Clean up compiled files for Java and C++
-        if lang == "java":
-            class_file = filepath.replace(".java", ".class")
-            if os.path.exists(class_file):
-                os.remove(class_file)
-        if lang == "cpp":
-            exe_file = filepath.replace(".cpp", "")
-            if os.path.exists(exe_file):
-                os.remove(exe_file)
+        if proc is not None:
+            sandbox.kill(proc)
+        return {"output": f"Error: {str(e)}"}
+
+def start_program(code, lang, line_buffered=False, limits=None):
+    """
+    Start a program with piped stdio and return (proc, build).
+
+    build is the compile cache result for compiled languages and None
+    otherwise; proc is None when compilation failed.
+    """
+    if lang in worker_pool.POOLED_LANGUAGES:
+        return worker_pool.spawn(lang, code, line_buffered=line_buffered, limits=limits), None
+
+    build = compile_cache.get_or_compile(lang, code)
+    if not build["ok"]:
+        return None, build
+    cmd = build["cmd"]
+    if line_buffered and shutil.which("stdbuf"):
+        # C stdio (and iostreams synced with it) fully buffers pipes otherwise
+        cmd = ["stdbuf", "-oL", "-eL"] + cmd
+    # Limits are set in the child before exec, so the program never runs without them
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            preexec_fn=lambda: sandbox.apply_limits(limits))
+    return proc, build
+
+def sse_event(event, payload):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route("/run/stream", methods=["POST"])
+def run_code_stream():
+    """Run code and stream its output as Server-Sent Events"""
+    data = request.get_json(force=True)
+    code = data.get("code", "")
+    lang = data.get("language", "")
+    limits = user_limits()
+
+    def generate():
+        if not code.strip():
+            yield sse_event("error", {"message": "No code to run."})
+            return
+
+        if lang not in SUPPORTED_LANGUAGES:
+            yield sse_event("error", {"message": "Unsupported language."})
+            return
+
+        try:
+            proc, build = start_program(code, lang, line_buffered=True, limits=limits)
+        except Exception as e:
+            yield sse_event("error", {"message": f"Error: {str(e)}"})
+            return
+
+        if proc is None:
+            yield sse_event("stderr", {"text": build["output"]})
+            yield sse_event("exit", {"returncode": None, "timed_out": False, "compile_failed": True})
+            return
+
+        compile_time = build["compile_time"] if build else 0.0
+        timed_out = False
+        started = time.monotonic()
+        # Only the head window is streamed live; the tail is sent once the program exits
+        collectors = {"stdout": process_io.OutputCollector(), "stderr": process_io.OutputCollector()}
+        decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in collectors}
+        try:
+            proc.stdin.close()
+            for stream, data in process_io.iter_output(proc, timeout=limits["wall"]):
+                text = decoders[stream].decode(collectors[stream].write(data))
+                if text:
+                    yield sse_event(stream, {"text": text})
+            sandbox.wait(proc, max(limits["wall"] - (time.monotonic() - started), 0))
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            yield sse_event("stderr", {"text": f"Execution timed out ({limits['wall']}s limit)."})
+        finally:
+            # Also reached when the client disconnects mid-stream
+            sandbox.kill(proc)
+
+        for stream, collector in collectors.items():
+            if collector.truncated:
+                yield sse_event(stream, {"text": collector.omission_notice() + collector.tail_text()})
+        limit_message = sandbox.describe_exit(proc.returncode, limits)
+        if limit_message:
+            yield sse_event("stderr", {"text": limit_message})
+        yield sse_event("exit", {
+            "returncode": proc.returncode,
+            "timed_out": timed_out,
+            "output_bytes": {name: collector.total for name, collector in collectors.items()},
+            "usage": sandbox.usage(proc, time.monotonic() - started, compile_time)
+        })
+
+    # The slot is held until the stream is closed, not just until this view returns
+    ticket_id = scheduler.acquire(scheduler_key())
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: scheduler.release(ticket_id))
+    return response
 
 @app.route("/debug", methods=["POST"])
 def debug_code():
@@ -418,12 +757,22 @@ def debug_code():
     code = data.get("code", "")
     lang = data.get("language", "")
     breakpoints = data.get("breakpoints", [])
+    record = bool(data.get("record"))
+    limits = user_limits()
+    owner = scheduler_key()
 
+    if data.get("async"):
+        return submit_job("debug", execute_debug, code, lang, breakpoints, limits, owner, record)
+    with scheduler.slot(owner):
+        return jsonify(execute_debug(code, lang, breakpoints, limits, owner, record))
+
+def execute_debug(code, lang, breakpoints, limits=None, owner=None, record=False):
+    """Debug a program (or record its every line) and return the /debug response"""
     if not code.strip():
-        return jsonify({"error": "No code provided."})
+        return {"error": "No code provided."}
 
     if lang not in SUPPORTED_LANGUAGES:
-        return jsonify({"error": "Unsupported language."})
+        return {"error": "Unsupported language."}
 
     debug_info = {
         "variables": [],
@@ -434,7 +783,9 @@ def debug_code():
 
     try:
         if lang == "python":
-            debug_info = debug_python_code(code, breakpoints)
+            debug_info = debugger.debug_python(code, breakpoints, limits, owner, record)
+        elif lang == "javascript" and record:
+            debug_info = debugger.record_javascript(code, limits, owner)
         elif lang == "javascript":
             debug_info = debug_javascript_code(code, breakpoints)
         else:
@@ -442,78 +793,46 @@ def debug_code():
     except Exception as e:
         debug_info["errors"].append(f"Debug error: {str(e)}")
 
-    return jsonify(debug_info)
+    return debug_info
 
-def debug_python_code(code, breakpoints):
-    """Debug Python code and extract variables, call stack, and output"""
-    debug_info = {
-        "variables": [],
-        "callStack": [],
-        "output": "",
-        "errors": []
-    }
+@app.route("/debug/sessions/<session_id>/expand", methods=["POST"])
+@scheduled(scheduler.SHORT)
+def expand_debug_value(session_id):
+    """Fetch a page of the children of a snapshot value's handle"""
+    data = request.get_json(force=True)
+    session = debugger.get(session_id, scheduler_key())
+    if not session:
+        return jsonify({"error": "Debug session not found"}), 404
 
     try:
-        # Parse the code to extract variable assignments
-        tree = ast.parse(code)
-        
-        # Extract variable names
-        variables = set()
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        variables.add(target.id)
-            elif isinstance(node, ast.FunctionDef):
-                debug_info["callStack"].append(f"Function: {node.name} (line {node.lineno})")
-        
-        # Execute code and capture output
-        old_stdout = sys.stdout
-        sys.stdout = captured_output = StringIO()
-        
-        # Create execution namespace
-        exec_globals = {}
-        exec_locals = {}
-        
-        try:
-            exec(code, exec_globals, exec_locals)
-            debug_info["output"] = captured_output.getvalue()
-            
-            # Extract variable values
-            for var_name in variables:
-                if var_name in exec_locals:
-                    value = exec_locals[var_name]
-                    debug_info["variables"].append({
-                        "name": var_name,
-                        "value": repr(value),
-                        "type": type(value).__name__
-                    })
-            
-            # Add global variables that were created
-            for key, value in exec_locals.items():
-                if key not in variables and not key.startswith('__'):
-                    debug_info["variables"].append({
-                        "name": key,
-                        "value": repr(value),
-                        "type": type(value).__name__
-                    })
-                    
-        except Exception as e:
-            debug_info["errors"].append(f"Runtime error: {str(e)}")
-            debug_info["errors"].append(traceback.format_exc())
-        finally:
-            sys.stdout = old_stdout
-            
-        # Add call stack info
-        if not debug_info["callStack"]:
-            debug_info["callStack"].append("main (line 1)")
-            
-    except SyntaxError as e:
-        debug_info["errors"].append(f"Syntax error on line {e.lineno}: {e.msg}")
-    except Exception as e:
-        debug_info["errors"].append(f"Parse error: {str(e)}")
-    
-    return debug_info
+        return jsonify(debugger.expand(session_id, session, data.get("handle"),
+                                       data.get("start", 0), data.get("count", debugger.MAX_ITEMS)))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/debug/sessions/<session_id>/trace", methods=["POST"])
+@scheduled(scheduler.SHORT)
+def debug_trace_page(session_id):
+    """Fetch a page of a recorded run's steps"""
+    data = request.get_json(force=True)
+    session = debugger.get(session_id, scheduler_key())
+    if not session:
+        return jsonify({"error": "Debug session not found"}), 404
+
+    try:
+        return jsonify(debugger.trace_page(session_id, session, data.get("start", 0),
+                                           data.get("count", debugger.TRACE_PAGE)))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/debug/sessions/<session_id>", methods=["DELETE"])
+def end_debug_session(session_id):
+    """Stop a debug session's process"""
+    return jsonify({"success": debugger.discard(session_id, scheduler_key())})
 
 def debug_javascript_code(code, breakpoints):
     """Debug JavaScript code (basic analysis)"""
@@ -550,18 +869,8 @@ def debug_javascript_code(code, breakpoints):
         
         # Try to run with Node.js if available
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.js', mode='w') as tmp:
-                tmp.write(code)
-                tmp.flush()
-                filepath = tmp.name
-            
-            result = subprocess.run(['node', filepath], 
-                                  capture_output=True, 
-                                  text=True, 
-                                  timeout=5)
+            result = worker_pool.run("javascript", code, timeout=5)
             debug_info["output"] = result.stdout or result.stderr
-            
-            os.remove(filepath)
         except FileNotFoundError:
             debug_info["output"] = "Node.js not installed - cannot execute JavaScript"
         except Exception as e:
@@ -576,128 +885,120 @@ def debug_javascript_code(code, breakpoints):
 def run_tests():
     data = request.get_json(force=True)
     code = data.get("code", "")
-    lang = data.get("language", "")
-    test_cases = data.get("testCases", [])
-
+    suite = stored_suite(data)
+    if suite is False:
+        return jsonify({"error": "Test suite not found"}), 404
+    lang = data.get("language") or (suite or {}).get("language") or ""
+    test_cases = suite["cases"] if suite else data.get("testCases", [])
+    limits = user_limits()
+    options = suite_options(data)
+
+    if data.get("async"):
+        return submit_job("tests", execute_tests, code, lang, test_cases, limits, options)
+    with scheduler.slot(scheduler_key()):
+        return jsonify(execute_tests(code, lang, test_cases, limits, options))
+
+def stored_suite(data):
+    """The stored suite named by suiteId, None without one, or False if it isn't the user's"""
+    if data.get("suiteId") is None:
+        return None
+    user = get_current_user()
+    try:
+        suite = suite_store.get(int(data["suiteId"]), user['id']) if user else None
+    except (TypeError, ValueError):
+        suite = None
+    return suite or False
+
+def suite_options(data):
+    """
+    Options of a test suite request: failFast, maxFailures and timeBudget
+    (seconds) stop it early; compareMode and tolerance choose how outputs
+    are compared.
+    """
+    options = {
+        "max_failures": None,
+        "budget": None,
+        "compare": {"mode": data.get("compareMode") or comparator.EXACT}
+    }
+    try:
+        if data.get("failFast"):
+            options["max_failures"] = 1
+        elif data.get("maxFailures"):
+            options["max_failures"] = max(int(data["maxFailures"]), 1)
+        if data.get("timeBudget"):
+            options["budget"] = max(float(data["timeBudget"]), 0.1)
+        if data.get("tolerance") is not None:
+            options["compare"]["tolerance"] = abs(float(data["tolerance"]))
+    except (TypeError, ValueError):
+        pass
+    return options
+
+def suite_error(code, lang, options):
+    """Why a test suite request can't run, or None"""
     if not code.strip():
-        return jsonify({"error": "No code provided."})
-
+        return "No code provided."
     if lang not in SUPPORTED_LANGUAGES:
-        return jsonify({"error": "Unsupported language."})
-
-    results = []
-    
-    try:
-        if lang == "python":
-            results = run_python_tests(code, test_cases)
-        elif lang == "javascript":
-            results = run_javascript_tests(code, test_cases)
-        else:
-            return jsonify({"error": f"Test execution not yet implemented for {lang}"})
-    except Exception as e:
-        return jsonify({"error": f"Test error: {str(e)}"})
-
-    return jsonify({"results": results})
+        return "Unsupported language."
+    if options["compare"]["mode"] not in comparator.MODES:
+        return f"Unknown compareMode (expected one of: {', '.join(comparator.MODES)})."
+    return None
+
+@app.route("/run-tests/stream", methods=["POST"])
+def run_tests_stream():
+    """Run a test suite and stream each case's result as a Server-Sent Event"""
+    data = request.get_json(force=True)
+    code = data.get("code", "")
+    suite = stored_suite(data)
+    lang = data.get("language") or (suite or {}).get("language") or ""
+    test_cases = suite["cases"] if suite else data.get("testCases", [])
+    limits = user_limits()
+    options = suite_options(data)
+
+    def generate():
+        error = "Test suite not found." if suite is False else suite_error(code, lang, options)
+        if error:
+            yield sse_event("error", {"message": error})
+            return
 
-def run_python_tests(code, test_cases):
-    """Run Python test cases"""
-    results = []
-    
-    for i, test in enumerate(test_cases):
-        test_name = test.get("name", f"Test {i+1}")
-        input_data = test.get("input", "")
-        expected_output = test.get("expected", "").strip()
-        
-        result = {
-            "name": test_name,
-            "passed": False,
-            "actual": "",
-            "expected": expected_output,
-            "error": None
-        }
-        
         try:
-            # Capture output
-            old_stdout = sys.stdout
-            sys.stdout = captured_output = StringIO()
-            
-            # Create execution namespace
-            exec_globals = {}
-            exec_locals = {}
-            
-            # Execute code
-            exec(code, exec_globals, exec_locals)
-            
-            # Get output
-            actual_output = captured_output.getvalue().strip()
-            result["actual"] = actual_output
-            
-            # Compare output
-            if actual_output == expected_output:
-                result["passed"] = True
-            
-            sys.stdout = old_stdout
-            
+            program = suite_runner.prepare(lang, code)
         except Exception as e:
-            result["error"] = str(e)
-            sys.stdout = old_stdout
-        
-        results.append(result)
-    
-    return results
+            yield sse_event("error", {"message": f"Test error: {str(e)}"})
+            return
 
-def run_javascript_tests(code, test_cases):
-    """Run JavaScript test cases"""
-    results = []
-    
-    for i, test in enumerate(test_cases):
-        test_name = test.get("name", f"Test {i+1}")
-        input_data = test.get("input", "")
-        expected_output = test.get("expected", "").strip()
-        
-        result = {
-            "name": test_name,
-            "passed": False,
-            "actual": "",
-            "expected": expected_output,
-            "error": None
-        }
-        
+        if not program["ok"]:
+            yield sse_event("error", {"message": program["output"]})
+            return
+
+        started = time.monotonic()
+        results = []
+        pending = suite_runner.iter_results(program, test_cases, limits, **options)
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.js', mode='w') as tmp:
-                tmp.write(code)
-                tmp.flush()
-                filepath = tmp.name
-            
-            proc_result = subprocess.run(['node', filepath], 
-                                  capture_output=True, 
-                                  text=True, 
-                                  timeout=5)
-            
-            actual_output = proc_result.stdout.strip()
-            result["actual"] = actual_output
-            
-            if actual_output == expected_output:
-                result["passed"] = True
-            
-            os.remove(filepath)
-            
-        except FileNotFoundError:
-            result["error"] = "Node.js not installed"
-        except Exception as e:
-            result["error"] = str(e)
-        
-        results.append(result)
-    
-    return results
-
-def get_file_extension(lang):
-    return {
-        "python": ".py",
-        "javascript": ".js",
-        "java": ".java",
-        "cpp": ".cpp"
-    }.get(lang, ".txt")
+            for result in pending:
+                results.append(result)
+                yield sse_event("result", result)
+        finally:
+            # Stops cases that haven't started if the client disconnects
+            pending.close()
+        yield sse_event("summary", suite_runner.summarize(results, program, started))
+
+    ticket_id = scheduler.acquire(scheduler_key())
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: scheduler.release(ticket_id))
+    return response
+
+def execute_tests(code, lang, test_cases, limits=None, options=None):
+    """Run a test suite and return the /run-tests response"""
+    options = options or suite_options({})
+    error = suite_error(code, lang, options)
+    if error:
+        return {"error": error}
+
+    try:
+        return suite_runner.run_suite(lang, code, test_cases, limits, **options)
+    except Exception as e:
+        return {"error": f"Test error: {str(e)}"}
 
 def main():
     """Main entry point for the application"""
@@ -0,0 +1,220 @@
+"""
+Streaming comparison of program output against expected output.
+
+Actual output is consumed chunk by chunk (bytes or text), normalized for
+the chosen mode, and compared against the expected text until the first
+mismatch. Neither side is ever held in full, and a mismatch is reported as
+a small window of text around it.
+
+Modes:
+    exact       identical after stripping leading/trailing whitespace
+    whitespace  trailing whitespace on each line and trailing blank lines ignored
+    tokens      identical sequence of whitespace-separated tokens
+    float       like tokens, but numbers may differ by the given tolerance
+"""
+import codecs
+import math
+import re
+
+EXACT = 'exact'
+WHITESPACE = 'whitespace'
+TOKENS = 'tokens'
+FLOAT = 'float'
+MODES = (EXACT, WHITESPACE, TOKENS, FLOAT)
+
+DEFAULT_TOLERANCE = 1e-6
+DIFF_WINDOW = 200  # Characters shown on each side of a mismatch
+PREVIEW_LIMIT = 4096  # Characters of expected/actual echoed back in results
+
+_LINE_END_SPACE = re.compile(r'[^\S\n]+(?=\n)')
+_SPACE_RUN = re.compile(r'\s+')
+
+
+def _decode(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _normalize(pieces, mode):
+    """
+    Yield the text of pieces with whitespace normalized for mode.
+
+    Whitespace at the end of a piece is held back until the next piece
+    shows whether it is trailing, so runs split across chunks work too.
+    """
+    pending = ''
+    started = False
+    for piece in pieces:
+        text = pending + piece
+        body = text.rstrip()
+        pending = text[len(body):]
+        if not body:
+            continue
+        if not started and mode != WHITESPACE:
+            body = body.lstrip()
+        started = True
+        if mode == WHITESPACE:
+            body = _LINE_END_SPACE.sub('', body)
+        elif mode == TOKENS:
+            body = _SPACE_RUN.sub(' ', body)
+        yield body
+    # Trailing whitespace is dropped in every mode
+
+
+class _Stream:
+    """A normalized text stream with a look-behind window for diffs"""
+
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+        self.buffer = ''
+        self.pos = 0
+        self.offset = 0
+        self.line = 1
+        self.behind = ''
+
+    def _read(self):
+        try:
+            piece = next(self._pieces)
+        except StopIteration:
+            return False
+        self.buffer = self.buffer[self.pos:] + piece
+        self.pos = 0
+        return True
+
+    def available(self):
+        return len(self.buffer) - self.pos
+
+    def fill(self, size=1):
+        """Buffer up to size characters; False once nothing is left"""
+        while self.available() < size and self._read():
+            pass
+        return self.available() > 0
+
+    def peek(self, size):
+        return self.buffer[self.pos:self.pos + size]
+
+    def take(self, size):
+        text = self.peek(size)
+        self.pos += len(text)
+        self.offset += len(text)
+        self.line += text.count('\n')
+        self.behind = (self.behind + text[-DIFF_WINDOW:])[-DIFF_WINDOW:]
+
+    def token_size(self):
+        """Buffer the next token and return its length, or None at the end"""
+        # Token-mode streams separate tokens with exactly one space
+        while True:
+            end = self.buffer.find(' ', self.pos)
+            if end != -1:
+                return end - self.pos
+            if not self._read():
+                return self.available() or None
+
+    def window(self):
+        self.fill(DIFF_WINDOW)
+        return self.behind, self.peek(DIFF_WINDOW)
+
+
+def _mismatch(expected, actual, mode):
+    before, expected_after = expected.window()
+    _, actual_after = actual.window()
+    diff = {
+        "offset": actual.offset,
+        "expected": before + expected_after,
+        "actual": before + actual_after,
+        "column": len(before),
+    }
+    if mode in (EXACT, WHITESPACE):
+        diff["line"] = actual.line
+    return diff
+
+
+def _numbers_close(expected, actual, tolerance):
+    try:
+        a, b = float(expected), float(actual)
+    except ValueError:
+        return False
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=tolerance, abs_tol=tolerance)
+
+
+def _first_difference(left, right):
+    if left == right:
+        return len(left)
+    return next(i for i in range(min(len(left), len(right))) if left[i] != right[i])
+
+
+def _compare_text(expected, actual, mode):
+    while True:
+        has_expected, has_actual = expected.fill(), actual.fill()
+        if not has_expected and not has_actual:
+            return None
+        if not has_expected or not has_actual:
+            return _mismatch(expected, actual, mode)
+        size = min(expected.available(), actual.available())
+        same = _first_difference(expected.peek(size), actual.peek(size))
+        expected.take(same)
+        actual.take(same)
+        if same < size:
+            return _mismatch(expected, actual, mode)
+
+
+def _compare_tokens(expected, actual, tolerance):
+    while True:
+        expected.fill()
+        actual.fill()
+        size = min(expected.available(), actual.available())
+        left = expected.peek(size)
+        same = _first_difference(left, actual.peek(size))
+        # Identical text is skipped in bulk, up to the start of the token it ends in
+        start = left.rfind(' ', 0, same) + 1
+        if start:
+            expected.take(start)
+            actual.take(start)
+            continue
+        # Both streams are now at the start of a token that differs or spans the buffers
+        left_size, right_size = expected.token_size(), actual.token_size()
+        if left_size is None and right_size is None:
+            return None
+        if left_size is None or right_size is None:
+            return _mismatch(expected, actual, FLOAT)
+        left, right = expected.peek(left_size), actual.peek(right_size)
+        if left != right and not _numbers_close(left, right, tolerance):
+            return _mismatch(expected, actual, FLOAT)
+        # The token and the space after it
+        expected.take(left_size + 1)
+        actual.take(right_size + 1)
+
+
+def compare(expected, actual_chunks, mode=EXACT, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare expected text with actual output given as an iterable of chunks.
+
+    Returns None when they match under mode, otherwise a diff dict with the
+    offset of the mismatch in the normalized actual output (plus its line in
+    exact and whitespace modes) and up to DIFF_WINDOW characters of each
+    side around it.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown comparison mode: {mode}")
+    normalize_mode = TOKENS if mode == FLOAT else mode
+    expected_stream = _Stream(_normalize([expected], normalize_mode))
+    actual_stream = _Stream(_normalize(_decode(actual_chunks), normalize_mode))
+    if mode == FLOAT:
+        return _compare_tokens(expected_stream, actual_stream, tolerance)
+    return _compare_text(expected_stream, actual_stream, mode)
+
+
+def preview(text, limit=PREVIEW_LIMIT):
+    """Shorten text to its first and last limit / 2 characters"""
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return f"{text[:half]}\n... [{len(text) - limit} characters omitted] ...\n{text[-half:]}"
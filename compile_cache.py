@@ -0,0 +1,264 @@
+"""
+Content-addressed compile cache for C++ and Java programs.
+
+Each successful (or failed) compilation is stored under CACHE_DIR in a
+directory named after the SHA-256 of the language, compiler version, flags
+and source. Resubmitting identical code reuses the stored artifact instead
+of invoking the compiler again. The cache directory is shared by every
+worker process; total size is bounded by evicting least recently used
+entries. The total is kept in a counter file next to the entries, so a
+miss only scans the cache when the limit is exceeded. Entries used in the
+last COMPILE_CACHE_MIN_AGE seconds are never evicted, since a worker may be
+about to run them (or be running Java classes out of them), and an evicted
+entry is renamed away before it is deleted so no lookup sees it half gone.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+CACHE_DIR = os.environ.get(
+    'COMPILE_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'ai_tester_compile_cache')
+)
+CACHE_MAX_BYTES = int(os.environ.get('COMPILE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+MIN_AGE = int(os.environ.get('COMPILE_CACHE_MIN_AGE', 300))  # Seconds since last use before eviction
+
+COMPILERS = {
+    "cpp": {"compiler": "g++", "version_flag": "--version", "flags": []},
+    "java": {"compiler": "javac", "version_flag": "-version", "flags": []},
+}
+
+COMPILED_LANGUAGES = set(COMPILERS)
+
+ENTRY_FILE = 'entry.json'
+BUILD_PREFIX = '.build-'
+EVICT_PREFIX = '.evict-'
+SIZE_FILE = '.size'  # Bytes used by published entries, shared by all workers
+
+_compiler_versions = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def get_compiler_version(lang):
+    """Return the compiler version string for a language (memoized)"""
+    if lang not in _compiler_versions:
+        spec = COMPILERS[lang]
+        proc = subprocess.run([spec["compiler"], spec["version_flag"]],
+                              capture_output=True, text=True)
+        # javac prints its version on stderr for older JDKs
+        version = (proc.stdout or proc.stderr).strip().splitlines()
+        _compiler_versions[lang] = version[0] if version else spec["compiler"]
+    return _compiler_versions[lang]
+
+
+def java_main_class(code):
+    """Guess the class name javac expects the source file to be named after"""
+    match = re.search(r'public\s+(?:(?:final|abstract)\s+)*class\s+(\w+)', code)
+    if not match:
+        match = re.search(r'class\s+(\w+)', code)
+    return match.group(1) if match else 'Main'
+
+
+def cache_key(lang, code):
+    """Build the content address for a compilation"""
+    spec = COMPILERS[lang]
+    digest = hashlib.sha256()
+    for part in (lang, get_compiler_version(lang), ' '.join(spec["flags"]), code):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _source_name(lang, code):
+    if lang == "java":
+        return java_main_class(code) + '.java'
+    return 'main.cpp'
+
+
+def _run_command(lang, entry_dir, entry):
+    if lang == "java":
+        return ["java", "-cp", entry_dir, entry["main_class"]]
+    return [os.path.join(entry_dir, 'main')]
+
+
+def _compile(lang, code, build_dir):
+    """Compile code inside build_dir and return the entry metadata"""
+    spec = COMPILERS[lang]
+    source = _source_name(lang, code)
+    with open(os.path.join(build_dir, source), 'w', encoding='utf-8') as f:
+        f.write(code)
+
+    # Compile with relative paths so cached diagnostics don't leak build dirs
+    if lang == "java":
+        cmd = [spec["compiler"]] + spec["flags"] + ["-d", ".", source]
+    else:
+        cmd = [spec["compiler"]] + spec["flags"] + [source, "-o", "main"]
+
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=build_dir)
+    entry = {
+        "ok": proc.returncode == 0,
+        "stderr": proc.stderr,
+        "compile_time": time.perf_counter() - started,
+    }
+    if lang == "java":
+        entry["main_class"] = java_main_class(code)
+    return entry
+
+
+def get_or_compile(lang, code):
+    """
+    Return a build for code, compiling it only on a cache miss.
+
+    The result dict has ``ok``, ``cmd`` (the command to run the program),
+    ``output`` (compiler diagnostics), ``cached`` and ``compile_time``.
+    """
+    key = cache_key(lang, code)
+    entry_dir = os.path.join(CACHE_DIR, key)
+    entry_path = os.path.join(entry_dir, ENTRY_FILE)
+
+    try:
+        with open(entry_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        os.utime(entry_dir)  # Mark as recently used for LRU eviction
+        _count("hits")
+        return _build_result(lang, entry_dir, entry, cached=True)
+    except (OSError, ValueError):
+        pass
+
+    _count("misses")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=BUILD_PREFIX, dir=CACHE_DIR)
+    try:
+        entry = _compile(lang, code, build_dir)
+        with open(os.path.join(build_dir, ENTRY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        size = _dir_size(build_dir)
+        try:
+            os.rename(build_dir, entry_dir)
+        except OSError:
+            # Another worker published the same entry first; use theirs
+            shutil.rmtree(build_dir, ignore_errors=True)
+            size = 0
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    if _update_size(size) > CACHE_MAX_BYTES:
+        evict(keep=key)
+    return _build_result(lang, entry_dir, entry, cached=False)
+
+
+def _build_result(lang, entry_dir, entry, cached):
+    return {
+        "ok": entry["ok"],
+        "cmd": _run_command(lang, entry_dir, entry) if entry["ok"] else None,
+        "output": entry["stderr"],
+        "cached": cached,
+        "compile_time": 0.0 if cached else entry["compile_time"],
+    }
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _entry_names():
+    try:
+        # Builds, evicted entries and the size file start with a dot
+        return [name for name in os.listdir(CACHE_DIR) if not name.startswith('.')]
+    except OSError:
+        return []
+
+
+def _list_entries():
+    """Return (mtime, size, key) for every published cache entry"""
+    entries = []
+    for name in _entry_names():
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        entries.append((mtime, _dir_size(path), name))
+    return entries
+
+
+def _update_size(delta=0, total=None):
+    """
+    Add delta to the shared size counter, or set it to total; returns the
+    new size. A missing counter is rebuilt by scanning the cache once.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, SIZE_FILE), 'a+', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        text = f.read().strip()
+        if total is None:
+            if text.isdigit():
+                total = max(int(text) + delta, 0)
+            else:
+                # The scan already includes an entry just published
+                total = sum(size for _, size, _ in _list_entries())
+        f.seek(0)
+        f.truncate()
+        f.write(str(total))
+    return total
+
+
+def evict(keep=None):
+    """Remove least recently used entries until the cache fits CACHE_MAX_BYTES"""
+    entries = _list_entries()
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    evicted = 0
+    for mtime, size, name in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        if name == keep or now - mtime < MIN_AGE:
+            continue
+        # Renamed first: a lookup finds either the whole entry or none of it
+        doomed = os.path.join(CACHE_DIR, f"{EVICT_PREFIX}{name}-{os.getpid()}")
+        try:
+            os.rename(os.path.join(CACHE_DIR, name), doomed)
+        except OSError:
+            continue  # Another worker evicted it
+        shutil.rmtree(doomed, ignore_errors=True)
+        total -= size
+        evicted += 1
+    _update_size(total=total)
+    if evicted:
+        _count("evictions", evicted)
+    return evicted
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def get_stats():
+    """Return hit/miss counters for this process plus current cache size"""
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["entries"] = len(_entry_names())
+    stats["bytes"] = _update_size()
+    stats["max_bytes"] = CACHE_MAX_BYTES
+    return stats
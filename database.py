@@ -4,8 +4,18 @@ from datetime import datetime
 import os
 import hashlib
 import secrets
+import threading
 
 DATABASE_PATH = 'ai_tester.db'
+BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_KB', 8192))
+MMAP_SIZE_MB = int(os.environ.get('DB_MMAP_MB', 64))
+STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+HISTORY_MAX_PAGE = int(os.environ.get('HISTORY_MAX_PAGE', 100))
+HISTORY_PREVIEW_CHARS = 200  # Code and output shown per entry in history listings
+
+_local = threading.local()
+_inherited = []  # Connections opened before a fork; the child must not use or close them
 
 def hash_password(password):
     """Hash a password using SHA-256"""
@@ -19,10 +29,41 @@ def generate_token():
     """Generate a secure random token"""
     return secrets.token_urlsafe(32)
 
+class ThreadConnection(sqlite3.Connection):
+    """A connection kept open for its thread; close() only ends the current transaction"""
+
+    def close(self):
+        # Uncommitted changes are dropped, as they were when closing really closed
+        self.rollback()
+
 def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    """
+    Return this thread's database connection, opening it on first use.
+
+    Each thread of each worker process keeps one connection, so requests
+    don't pay for connecting and the statements prepared on it stay cached.
+    The database runs in WAL mode, so readers don't block the writer.
+    A transaction left open by a caller that failed before commit() or
+    close() is rolled back here rather than carried into the next request.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == DATABASE_PATH:
+        if conn.in_transaction:
+            conn.rollback()
+        return conn
+    if conn is not None and _local.pid != os.getpid():
+        _inherited.append(conn)
+    conn = sqlite3.connect(DATABASE_PATH, timeout=BUSY_TIMEOUT_MS / 1000, factory=ThreadConnection,
+                           cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size={-CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE_MB * 1024 * 1024}')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.path = DATABASE_PATH
     return conn
 
 def init_db():
@@ -64,6 +105,10 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
+    # Newest-first listing, alone or filtered by type or language; id breaks created_at ties
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_user_created ON history (user_id, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_user_type ON history (user_id, type, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_user_language ON history (user_id, language, created_at, id)')
     
     # Settings table
     cursor.execute('''
@@ -86,6 +131,53 @@ def init_db():
         )
     ''')
     
+    # Async execution jobs (see job_queue.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)')
+    
+    # Stored test suites (see suite_store.py); version is bumped on every change
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS test_suites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            language TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_suites_user ON test_suites (user_id)')
+    
+    # Large inputs are kept on disk and referenced by input_file
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS test_cases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            suite_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            input TEXT,
+            input_file TEXT,
+            expected TEXT,
+            FOREIGN KEY (suite_id) REFERENCES test_suites (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_test_cases_suite ON test_cases (suite_id, position)')
+    
     conn.commit()
     conn.close()
     print("Database initialized successfully!")
@@ -261,13 +353,33 @@ def add_history(user_id, type, language, title, code, output=None, issues=None,
     conn.close()
     return history_id
 
-def get_user_history(user_id, limit=50, type_filter=None, lang_filter=None):
-    """Get user's history with optional filters"""
+def get_user_history(user_id, limit=50, type_filter=None, lang_filter=None, before=None, search=None):
+    """
+    Get user's history with optional filters, newest first, at most
+    HISTORY_MAX_PAGE entries. before is a (created_at, id) cursor: only
+    entries older than it are returned. search matches the title or
+    anywhere in the code.
+
+    Entries are summaries: the start of the code and output, their sizes,
+    the number of issues, the variable names and test counts.
+    get_history_item() loads a full entry.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    query = 'SELECT * FROM history WHERE user_id = ?'
-    params = [user_id]
+    query = '''
+        SELECT id, type, language, title, created_at,
+               substr(code, 1, ?) AS preview, length(code) AS code_size,
+               substr(output, 1, ?) AS output_preview, length(output) AS output_size,
+               json_array_length(issues) AS issue_count,
+               substr((SELECT group_concat(CASE type WHEN 'object' THEN json_extract(value, '$.name')
+                                                     ELSE value END, ', ')
+                       FROM json_each(variables)), 1, ?) AS variable_names,
+               json_extract(test_results, '$.passed') AS tests_passed,
+               json_extract(test_results, '$.failed') AS tests_failed
+        FROM history WHERE user_id = ?
+    '''
+    params = [HISTORY_PREVIEW_CHARS, HISTORY_PREVIEW_CHARS, HISTORY_PREVIEW_CHARS, user_id]
     
     if type_filter:
         query += ' AND type = ?'
@@ -277,26 +389,86 @@ def get_user_history(user_id, limit=50, type_filter=None, lang_filter=None):
         query += ' AND language = ?'
         params.append(lang_filter)
     
-    query += ' ORDER BY created_at DESC LIMIT ?'
-    params.append(limit)
+    if before:
+        query += ' AND (created_at, id) < (?, ?)'
+        params.extend(before)
+    
+    if search:
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query += " AND (title LIKE ? ESCAPE '\\' OR code LIKE ? ESCAPE '\\')"
+        params.extend([pattern, pattern])
+    
+    query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+    params.append(min(max(limit, 1), HISTORY_MAX_PAGE))
     
     cursor.execute(query, params)
-    rows = cursor.fetchall()
+    history = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return history
+
+def get_history_item(history_id, user_id):
+    """Get a full history entry owned by user_id"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM history WHERE id = ? AND user_id = ?', (history_id, user_id))
+    row = cursor.fetchone()
     conn.close()
+    if not row:
+        return None
+    
+    item = dict(row)
+    # Parse JSON fields
+    if item['issues']:
+        item['issues'] = json.loads(item['issues'])
+    if item['variables']:
+        item['variables'] = json.loads(item['variables'])
+    if item['test_results']:
+        item['test_results'] = json.loads(item['test_results'])
+    return item
+
+def get_user_stats(user_id, days=30):
+    """
+    Aggregate a user's history: totals by type and language, entries per
+    day over the last days days, and passed/failed counts from test runs.
+    The counts by type, language and day are answered from the history
+    indexes alone; the test totals also read the test rows' results.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    history = []
-    for row in rows:
-        item = dict(row)
-        # Parse JSON fields
-        if item['issues']:
-            item['issues'] = json.loads(item['issues'])
-        if item['variables']:
-            item['variables'] = json.loads(item['variables'])
-        if item['test_results']:
-            item['test_results'] = json.loads(item['test_results'])
-        history.append(item)
+    cursor.execute('SELECT type, COUNT(*) AS count FROM history WHERE user_id = ? GROUP BY type', (user_id,))
+    by_type = {row['type']: row['count'] for row in cursor.fetchall()}
     
-    return history
+    cursor.execute('SELECT language, COUNT(*) AS count FROM history WHERE user_id = ? GROUP BY language', (user_id,))
+    by_language = {row['language']: row['count'] for row in cursor.fetchall()}
+    
+    cursor.execute('''
+        SELECT date(created_at) AS day, COUNT(*) AS count FROM history
+        WHERE user_id = ? AND created_at >= date('now', ?)
+        GROUP BY day ORDER BY day
+    ''', (user_id, f'-{int(days) - 1} days'))
+    activity = [{"date": row['day'], "count": row['count']} for row in cursor.fetchall()]
+    
+    # Test entries store their run's summary ({"passed", "failed", ...}) in test_results
+    cursor.execute('''
+        SELECT COUNT(*) AS runs,
+               COALESCE(SUM(json_extract(test_results, '$.passed')), 0) AS passed,
+               COALESCE(SUM(json_extract(test_results, '$.failed')), 0) AS failed
+        FROM history
+        WHERE user_id = ? AND type = 'test' AND json_type(test_results, '$.passed') = 'integer'
+    ''', (user_id,))
+    tests = dict(cursor.fetchone())
+    conn.close()
+    
+    checked = tests['passed'] + tests['failed']
+    tests['pass_rate'] = round(tests['passed'] / checked, 4) if checked else None
+    return {
+        "total": sum(by_type.values()),
+        "by_type": by_type,
+        "by_language": by_language,
+        "activity": activity,
+        "tests": tests,
+    }
 
 def delete_history_item(history_id, user_id):
     """Delete a history item"""
@@ -348,6 +520,178 @@ def update_user_settings(user_id, settings_dict):
     
     conn.close()
 
+def create_job(job_id, user_id, type):
+    """Record a newly submitted job"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO jobs (id, user_id, type) VALUES (?, ?, ?)',
+        (job_id, user_id, type)
+    )
+    conn.commit()
+    conn.close()
+
+def update_job(job_id, status, result=None, error=None):
+    """Move a job to a new status, storing its result when finished"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if status == 'running':
+        cursor.execute(
+            'UPDATE jobs SET status = ?, started_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (status, job_id)
+        )
+    else:
+        cursor.execute('''
+            UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, json.dumps(result) if result is not None else None, error, job_id))
+    conn.commit()
+    conn.close()
+
+def get_job(job_id, user_id):
+    """Get a job owned by user_id"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM jobs WHERE id = ? AND user_id = ?', (job_id, user_id))
+    job = cursor.fetchone()
+    conn.close()
+    if not job:
+        return None
+    job = dict(job)
+    if job['result']:
+        job['result'] = json.loads(job['result'])
+    return job
+
+def fail_stale_jobs(max_age_seconds, error):
+    """Mark jobs still queued or running after max_age_seconds as failed"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP
+        WHERE status IN ('queued', 'running') AND created_at < datetime('now', ?)
+    ''', (error, f'-{int(max_age_seconds)} seconds'))
+    failed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return failed
+
+def delete_expired_jobs(max_age_seconds):
+    """Delete jobs older than max_age_seconds"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM jobs WHERE created_at < datetime('now', ?)",
+        (f'-{int(max_age_seconds)} seconds',)
+    )
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+def _insert_test_cases(cursor, suite_id, cases):
+    cursor.executemany('''
+        INSERT INTO test_cases (suite_id, position, name, input, input_file, expected)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (suite_id, position, case.get('name'), case.get('input'), case.get('input_file'), case.get('expected'))
+        for position, case in enumerate(cases)
+    ])
+
+def create_test_suite(user_id, name, language, cases):
+    """Store a test suite and its cases, returning the suite ID"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO test_suites (user_id, name, language) VALUES (?, ?, ?)',
+        (user_id, name, language)
+    )
+    suite_id = cursor.lastrowid
+    _insert_test_cases(cursor, suite_id, cases)
+    conn.commit()
+    conn.close()
+    return suite_id
+
+def update_test_suite(suite_id, user_id, name, language, cases):
+    """Replace a suite's cases and bump its version; returns the new version, or None if not found"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE test_suites SET name = ?, language = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND user_id = ?
+    ''', (name, language, suite_id, user_id))
+    if cursor.rowcount == 0:
+        conn.close()
+        return None
+    cursor.execute('DELETE FROM test_cases WHERE suite_id = ?', (suite_id,))
+    _insert_test_cases(cursor, suite_id, cases)
+    cursor.execute('SELECT version FROM test_suites WHERE id = ?', (suite_id,))
+    version = cursor.fetchone()['version']
+    conn.commit()
+    conn.close()
+    return version
+
+def get_test_suite_version(suite_id, user_id):
+    """Get the current version of a suite owned by user_id"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM test_suites WHERE id = ? AND user_id = ?', (suite_id, user_id))
+    row = cursor.fetchone()
+    conn.close()
+    return row['version'] if row else None
+
+def get_test_suite(suite_id, user_id):
+    """Get a suite owned by user_id, with its cases in order"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM test_suites WHERE id = ? AND user_id = ?', (suite_id, user_id))
+    suite = cursor.fetchone()
+    if not suite:
+        conn.close()
+        return None
+    suite = dict(suite)
+    cursor.execute(
+        'SELECT name, input, input_file, expected FROM test_cases WHERE suite_id = ? ORDER BY position',
+        (suite_id,)
+    )
+    suite['cases'] = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return suite
+
+def get_test_suites(user_id):
+    """List a user's suites with their case counts"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT s.id, s.name, s.language, s.version, s.created_at, s.updated_at,
+               (SELECT COUNT(*) FROM test_cases c WHERE c.suite_id = s.id) AS case_count
+        FROM test_suites s WHERE s.user_id = ?
+        ORDER BY s.updated_at DESC
+    ''', (user_id,))
+    suites = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return suites
+
+def delete_test_suite(suite_id, user_id):
+    """Delete a suite and its cases"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM test_suites WHERE id = ? AND user_id = ?', (suite_id, user_id))
+    deleted = cursor.rowcount
+    if deleted:
+        cursor.execute('DELETE FROM test_cases WHERE suite_id = ?', (suite_id,))
+    conn.commit()
+    conn.close()
+    return deleted > 0
+
+def is_test_input_file_used(input_file):
+    """Whether any stored test case still reads its input from input_file"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM test_cases WHERE input_file = ? LIMIT 1', (input_file,))
+    used = cursor.fetchone() is not None
+    conn.close()
+    return used
+
 if __name__ == '__main__':
     # Initialize database when run directly
     init_db()
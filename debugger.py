@@ -0,0 +1,1185 @@
+"""
+Out-of-process Python debugger for /debug.
+
+The program runs in its own interpreter, started for the request, so user
+code never executes inside (or swaps the sys.stdout of) a web worker. The
+child traces only code objects that contain a breakpoint line. On Python
+3.12+ it uses sys.monitoring, which switches off LINE events for every
+other line after their first hit. Older versions use sys.settrace, whose
+local tracer is only installed on those frames. Each breakpoint hit records
+a snapshot of the frame's variables and call stack, up to
+DEBUG_MAX_SNAPSHOTS. After DEBUG_MAX_STEPS hits the debugger detaches and
+lets the program finish untraced.
+
+Snapshots are bounded: values are short previews, containers show their
+first DEBUG_MAX_ITEMS children down to DEBUG_MAX_DEPTH levels, and the whole
+report stops inlining children after DEBUG_RESPONSE_KB. Every container
+gets a handle. While the child is alive (a debug session, up to
+DEBUG_SESSION_TTL seconds after the program ends) expand() fetches any
+handle's children a page at a time. Children are read when they are
+expanded, so a container changed after its snapshot shows its later
+contents.
+
+In record mode every executed line of the program's main thread is kept
+instead (see trace_recorder), with the variables whose previews changed and
+how much output came before it, up to DEBUG_MAX_TRACE_STEPS steps or
+DEBUG_MAX_TRACE_MB. The session then pages through the trace. JavaScript is
+recorded the same way by NODE_RECORDER in a Node process the child starts.
+The child checks the time limit as it records and then reports the steps
+it has so far. A Python program still blocked inside one call when the
+limit passes is killed by the parent instead, and its steps are lost.
+
+The child reports over a socket inherited next to its stdio, which keeps
+the debugger's messages apart from the program's own output. A child kept
+as a session then listens on a Unix socket in DEBUG_SESSION_DIR, listed in
+a SQLite registry there, so whichever gunicorn worker gets a later expand or
+trace request can connect to it. The worker that started a child reaps it
+once its session is gone.
+"""
+import ast
+import dis
+import itertools
+import json
+import os
+import signal
+import socket
+import subprocess
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import analyzer
+import process_io
+import sandbox
+import worker_pool
+
+MAX_SNAPSHOTS = int(os.environ.get('DEBUG_MAX_SNAPSHOTS', 100))
+MAX_STEPS = int(os.environ.get('DEBUG_MAX_STEPS', 10000))
+MAX_DEPTH = int(os.environ.get('DEBUG_MAX_DEPTH', 1))
+MAX_ITEMS = int(os.environ.get('DEBUG_MAX_ITEMS', 20))
+MAX_VALUE_CHARS = int(os.environ.get('DEBUG_MAX_VALUE_CHARS', 200))
+RESPONSE_BUDGET = int(os.environ.get('DEBUG_RESPONSE_KB', 256)) * 1024
+MAX_HANDLES = 100000
+MAX_TRACE_STEPS = int(os.environ.get('DEBUG_MAX_TRACE_STEPS', 1000000))
+MAX_TRACE_BYTES = int(os.environ.get('DEBUG_MAX_TRACE_MB', 64)) * 1024 * 1024
+TRACE_PAGE = 100  # Steps sent with a recording's /debug response
+MAX_TRACE_PAGE = 1000
+SESSION_TTL = int(os.environ.get('DEBUG_SESSION_TTL', 300))
+MAX_SESSIONS = int(os.environ.get('DEBUG_MAX_SESSIONS', 32))
+# Session sockets and the registry every gunicorn worker on the host reads
+SESSION_DIR = os.environ.get(
+    'DEBUG_SESSION_DIR',
+    os.path.join(tempfile.gettempdir(), 'ai_tester_debug_sessions')
+)
+REQUEST_TIMEOUT = 5  # Seconds an expand request may take
+FILENAME = "main.py"
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TRACER_BOOTSTRAP = (
+    "import sys; sys.path.insert(0, {!r}); import debugger; debugger.tracer_main()"
+).format(_APP_DIR)
+
+_local = threading.local()
+_children = {}  # session ID -> tracer child this worker started (and must reap)
+_stats = {"runs": 0, "sessions": 0, "expands": 0, "trace_pages": 0, "expired": 0}
+_lock = threading.Lock()
+
+
+class Session:
+    """A finished tracer child that answers requests on its Unix socket"""
+
+    def __init__(self, session_id, path, owner):
+        self.id = session_id
+        self.path = path
+        self.owner = owner
+
+    def request(self, message, timeout=REQUEST_TIMEOUT):
+        """Send one request on a new connection; the reply, or None if the child hung up"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(self.path)
+            conn.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            with conn.makefile('rb') as file:
+                line = file.readline()
+        return json.loads(line) if line else None
+
+
+def breakpoint_lines(breakpoints):
+    """The valid line numbers in a request's breakpoints, sorted"""
+    lines = set()
+    for line in breakpoints or []:
+        try:
+            line = int(line)
+        except (TypeError, ValueError):
+            continue
+        if line > 0:
+            lines.add(line)
+    return sorted(lines)
+
+
+def _debug_info():
+    return {
+        "variables": [],
+        "callStack": [],
+        "output": "",
+        "errors": [],
+        "snapshots": [],
+        "hits": {},
+    }
+
+
+def debug_python(code, breakpoints, limits=None, owner=None, record=False):
+    """
+    Run code under the tracer and return the /debug response.
+
+    With record, every executed line is recorded instead of stopping at
+    breakpoints. With an owner, a child whose snapshots hold handles (or
+    that recorded a trace) is kept as a debug session and the response
+    carries its sessionId.
+    """
+    debug_info = _debug_info()
+
+    # Shares the parse with /analyze on the same code
+    source = analyzer.parse(code, "python")
+    if isinstance(source.error, SyntaxError):
+        debug_info["errors"].append(f"Syntax error on line {source.error.lineno}: {source.error.msg}")
+        return debug_info
+    if source.error:
+        debug_info["errors"].append(f"Error: {str(source.error) or type(source.error).__name__}")
+        return debug_info
+
+    job = {
+        "lang": "python",
+        "breakpoints": breakpoint_lines(breakpoints),
+        "record": bool(record),
+    }
+    debug_info = _run(code, job, limits, owner, debug_info)
+    if not debug_info["callStack"]:
+        debug_info["callStack"] = [
+            f"Function: {node.name} (line {node.lineno})"
+            for node in ast.walk(source.tree) if isinstance(node, ast.FunctionDef)
+        ] or ["main (line 1)"]
+    return debug_info
+
+
+def record_javascript(code, limits=None, owner=None):
+    """Run JavaScript with every executed line recorded; returns the /debug response"""
+    job = {"lang": "javascript", "breakpoints": [], "record": True}
+    return _run(code, job, limits, owner, _debug_info())
+
+
+def _run(code, job, limits, owner, debug_info):
+    """Start a tracer child for job, collect its output and report"""
+    limits = limits or sandbox.limits_for()
+    session_id = session_path = None
+    if owner is not None:
+        # The child listens here if there is anything left to fetch after the report
+        session_id = uuid.uuid4().hex
+        os.makedirs(SESSION_DIR, mode=0o700, exist_ok=True)
+        session_path = os.path.join(SESSION_DIR, session_id + '.sock')
+    conn, child_conn = socket.socketpair()
+    payload = code.encode('utf-8')
+    header = json.dumps(dict(
+        job,
+        max_snapshots=MAX_SNAPSHOTS,
+        max_steps=MAX_STEPS,
+        max_trace_steps=MAX_TRACE_STEPS,
+        max_trace_bytes=MAX_TRACE_BYTES,
+        limits=limits,
+        channel_fd=child_conn.fileno(),
+        session_path=session_path,
+        size=len(payload),
+    )).encode('utf-8') + b'\n'
+    try:
+        # Its own process group, so a JavaScript recorder's Node process dies with it
+        proc = subprocess.Popen([worker_pool.PYTHON_EXECUTABLE, '-c', TRACER_BOOTSTRAP], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                pass_fds=(child_conn.fileno(),), start_new_session=True)
+    except Exception:
+        conn.close()
+        raise
+    finally:
+        child_conn.close()
+    with _lock:
+        _stats["runs"] += 1
+
+    started = time.monotonic()
+    try:
+        # The child closes its stdio when the program ends, then reports
+        stdout, stderr = process_io.collect(proc, header + payload, timeout=limits["wall"])
+        conn.settimeout(max(limits["wall"] - (time.monotonic() - started), 0.1))
+        with conn.makefile('rb') as file:
+            line = file.readline()
+        report = json.loads(line) if line else None
+    except (subprocess.TimeoutExpired, socket.timeout):
+        _kill(proc)
+        debug_info["errors"].append(f"Execution timed out ({limits['wall']}s limit).")
+        if job["record"]:
+            debug_info["errors"].append("The program was killed inside a long-running call, "
+                                        "so no trace could be reported.")
+        return debug_info
+    except Exception:
+        _kill(proc)
+        raise
+    finally:
+        conn.close()
+
+    debug_info["output"] = stdout.text() or stderr.text()
+    if report is None:
+        try:
+            sandbox.wait(proc, 1)
+        except subprocess.TimeoutExpired:
+            pass
+        _kill(proc)
+        limit_message = sandbox.describe_exit(proc.returncode, limits)
+        debug_info["errors"].append(limit_message or "Debugger exited before reporting results.")
+        return debug_info
+
+    report.pop("handles", None)
+    if report.pop("session", False):
+        _register(session_id, owner, session_path, proc)
+        debug_info["sessionId"] = session_id
+    else:
+        _kill(proc)
+
+    debug_info.update(report)
+    # The panels show where the program first stopped, or its final state
+    if debug_info["snapshots"]:
+        first = debug_info["snapshots"][0]
+        debug_info["variables"] = first["variables"]
+        debug_info["callStack"] = first["callStack"]
+    return debug_info
+
+
+def _get_connection():
+    """Return this thread's session registry connection, creating the schema once"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+    os.makedirs(SESSION_DIR, mode=0o700, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(SESSION_DIR, 'sessions.db'), timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            path TEXT NOT NULL,
+            last_used REAL NOT NULL
+        )
+    ''')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+@contextmanager
+def _transaction():
+    conn = _get_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _expire(conn):
+    """Drop idle and excess sessions from the registry; returns their (id, path) rows"""
+    cutoff = time.time() - SESSION_TTL
+    dropped = conn.execute('SELECT id, path FROM sessions WHERE last_used < ?', (cutoff,)).fetchall()
+    dropped += conn.execute(
+        'SELECT id, path FROM sessions WHERE last_used >= ? ORDER BY last_used DESC LIMIT -1 OFFSET ?',
+        (cutoff, MAX_SESSIONS)
+    ).fetchall()
+    conn.executemany('DELETE FROM sessions WHERE id = ?', [(row[0],) for row in dropped])
+    if dropped:
+        _count("expired", len(dropped))
+    return dropped
+
+
+def _stop(rows):
+    """Ask the children of dropped sessions to exit, then reap any of ours"""
+    for session_id, path in rows:
+        try:
+            Session(session_id, path, None).request({"op": "close"}, timeout=1)
+        except (OSError, ValueError):
+            pass  # Already gone, or busy: it still exits once idle for SESSION_TTL
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    _reap()
+
+
+def _kill(proc):
+    """Kill a tracer child (and a JavaScript recorder's Node process) and reap it"""
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    sandbox.kill(proc)
+
+
+def _reap():
+    """Kill and reap the children this worker started whose sessions are gone"""
+    with _lock:
+        children = list(_children.items())
+    if not children:
+        return
+    ids = [session_id for session_id, _ in children]
+    live = {row[0] for row in _get_connection().execute(
+        f"SELECT id FROM sessions WHERE id IN ({','.join('?' * len(ids))})", ids)}
+    for session_id, proc in children:
+        if session_id not in live or proc.poll() is not None:
+            _kill(proc)
+            with _lock:
+                _children.pop(session_id, None)
+
+
+def _register(session_id, owner, path, proc):
+    owner = str(owner)
+    with _lock:
+        _children[session_id] = proc
+        _stats["sessions"] += 1
+    with _transaction() as conn:
+        # The debugger page only shows its latest run
+        dropped = conn.execute('SELECT id, path FROM sessions WHERE owner = ?', (owner,)).fetchall()
+        conn.execute('DELETE FROM sessions WHERE owner = ?', (owner,))
+        conn.execute('INSERT INTO sessions (id, owner, path, last_used) VALUES (?, ?, ?, ?)',
+                     (session_id, owner, path, time.time()))
+        dropped += _expire(conn)
+    _stop(dropped)
+
+
+def get(session_id, owner):
+    """The debug session with this ID if owner started it, else None"""
+    with _transaction() as conn:
+        dropped = _expire(conn)
+        row = conn.execute('SELECT path FROM sessions WHERE id = ? AND owner = ?',
+                           (session_id, str(owner))).fetchone()
+        if row:
+            conn.execute('UPDATE sessions SET last_used = ? WHERE id = ?', (time.time(), session_id))
+    _stop(dropped)
+    return Session(session_id, row[0], owner) if row else None
+
+
+def discard(session_id, owner):
+    with _transaction() as conn:
+        row = conn.execute('SELECT path FROM sessions WHERE id = ? AND owner = ?',
+                           (session_id, str(owner))).fetchone()
+        if row:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+    if row is None:
+        return False
+    _stop([(session_id, row[0])])
+    return True
+
+
+def expand(session_id, session, handle, start=0, count=MAX_ITEMS):
+    """
+    Children [start, start + count) of a snapshot value's handle, as
+    {"handle", "start", "length", "children"}. Raises ValueError for a bad
+    request; a session that stops answering is discarded (LookupError).
+    """
+    count = min(max(int(count), 1), MAX_ITEMS * 10)
+    message = {"op": "expand", "handle": int(handle), "start": max(int(start), 0), "count": count}
+    _count("expands")
+    return _ask(session_id, session, message)
+
+
+def trace_page(session_id, session, start=0, count=TRACE_PAGE):
+    """
+    Recorded steps [start, start + count) of a session's trace and the
+    variables at start, as {"start", "total", "state", "steps"}; errors as
+    for expand().
+    """
+    count = min(max(int(count), 1), MAX_TRACE_PAGE)
+    message = {"op": "trace", "start": max(int(start), 0), "count": count}
+    _count("trace_pages")
+    return _ask(session_id, session, message)
+
+
+def _ask(session_id, session, message):
+    try:
+        reply = session.request(message)
+    except (OSError, ValueError):
+        reply = None
+    if reply is None:
+        discard(session_id, session.owner)
+        raise LookupError("Debug session has ended.")
+    if "error" in reply:
+        raise ValueError(reply["error"])
+    return reply
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def get_stats():
+    """Return debugger counters for this worker process, and the host's live sessions"""
+    with _lock:
+        stats = dict(_stats)
+    stats["active"] = _get_connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+    return stats
+
+
+# ===== TRACER (runs in the child interpreter) =====
+
+# Values that are shown but never expanded
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+           types.MethodType, str, bytes, bytearray)
+
+
+class Serializer:
+    """Turns values into bounded JSON previews and remembers their handles"""
+
+    def __init__(self, max_depth=MAX_DEPTH, max_items=MAX_ITEMS, max_chars=MAX_VALUE_CHARS,
+                 budget=RESPONSE_BUDGET):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.budget = budget
+        self.objects = []  # handle -> value
+        self.handles = {}  # id(value) -> handle
+
+    def _preview(self, value, level=0):
+        """A repr of value cut short after a few items or max_chars characters"""
+        if isinstance(value, (str, bytes, bytearray)):
+            text = repr(value[:self.max_chars])
+            return text if len(value) <= self.max_chars else text + '...'
+        if isinstance(value, (dict, list, tuple, set, frozenset, deque)):
+            # Built from the first items only: repr() of a huge container is itself huge
+            text = self._preview_items(value, level)
+        else:
+            try:
+                text = repr(value)
+            except Exception as e:
+                text = f"<repr failed: {e}>"
+        return text if len(text) <= self.max_chars else text[:self.max_chars] + '...'
+
+    def _preview_items(self, value, level):
+        if not value and isinstance(value, (set, frozenset)):
+            return f"{type(value).__name__}()"
+        if isinstance(value, dict):
+            brackets = '{}'
+        elif isinstance(value, (list, deque)):
+            brackets = '[]'
+        elif isinstance(value, tuple):
+            brackets = '()'
+        else:
+            brackets = '{}'
+        if level >= 2 and value:
+            text = brackets[0] + '...' + brackets[1]
+        else:
+            parts, size = [], 0
+            for item in itertools.islice(value.items() if isinstance(value, dict) else value, 6):
+                if isinstance(value, dict):
+                    part = f"{self._preview(item[0], level + 1)}: {self._preview(item[1], level + 1)}"
+                else:
+                    part = self._preview(item, level + 1)
+                parts.append(part)
+                size += len(part)
+                if size > self.max_chars:
+                    break
+            if len(parts) < len(value):
+                parts.append('...')
+            if len(parts) == 1 and isinstance(value, tuple) and len(value) == 1:
+                parts[0] += ','
+            text = brackets[0] + ', '.join(parts) + brackets[1]
+        if type(value) in (dict, list, tuple, set):
+            return text
+        return f"{type(value).__name__}({text})"
+
+    def _children(self, value):
+        """(name, child) pairs of an expandable value, or None"""
+        if isinstance(value, _OPAQUE):
+            return None
+        if isinstance(value, dict):
+            return ((self._preview(key, 1), child) for key, child in value.items())
+        if isinstance(value, (list, tuple, set, frozenset, deque)):
+            return ((str(index), child) for index, child in enumerate(value))
+        attributes = getattr(value, '__dict__', None)
+        if isinstance(attributes, dict):
+            return iter(attributes.items())
+        return None
+
+    def _length(self, value):
+        if isinstance(value, (dict, list, tuple, set, frozenset, deque)):
+            return len(value)
+        return len(value.__dict__)
+
+    def describe(self, name, value, depth):
+        """One variable (or child) entry, with children inlined down to depth"""
+        entry = {"name": name, "value": "...", "type": type(value).__name__}
+        if self.budget > 0:
+            try:
+                entry["value"] = self._preview(value)
+            except Exception as e:
+                entry["value"] = f"<repr failed: {e}>"
+            self.budget -= len(name) + len(entry["value"]) + 40
+        children = self._children(value)
+        if children is None:
+            return entry
+        entry["length"] = self._length(value)
+        if not entry["length"]:
+            return entry
+        if id(value) in self.handles:
+            entry["handle"] = self.handles[id(value)]
+        elif len(self.objects) < MAX_HANDLES:
+            entry["handle"] = self.handles[id(value)] = len(self.objects)
+            self.objects.append(value)  # Also keeps id(value) from being reused
+        if depth > 0 and self.budget > 0:
+            entry["children"] = [self.describe(str(key), child, depth - 1)
+                                 for key, child in itertools.islice(children, self.max_items)]
+        return entry
+
+    def variables(self, namespace):
+        return [self.describe(name, value, self.max_depth)
+                for name, value in list(namespace.items()) if not name.startswith('__')]
+
+    def expand(self, handle, start, count):
+        """A page of a handle's children, for an expand request"""
+        if not 0 <= handle < len(self.objects):
+            raise ValueError(f"Unknown handle {handle}.")
+        value = self.objects[handle]
+        self.budget = RESPONSE_BUDGET
+        if isinstance(value, (list, tuple)):
+            # Sliced directly rather than skipped through one by one
+            children = enumerate(value[start:start + count], start)
+            children = ((str(index), child) for index, child in children)
+        else:
+            children = itertools.islice(self._children(value), start, start + count)
+        return {
+            "handle": handle,
+            "start": start,
+            "length": self._length(value),
+            "children": [self.describe(str(key), child, self.max_depth - 1) for key, child in children],
+        }
+
+
+def _call_stack(frame):
+    stack = []
+    while frame is not None and frame.f_code.co_filename == FILENAME:
+        stack.append(f"{frame.f_code.co_name} (line {frame.f_lineno})")
+        frame = frame.f_back
+    return stack
+
+
+def _traced_code(code, lines):
+    """The code objects in code's tree that have a line in lines"""
+    found = []
+    pending = [code]
+    while pending:
+        code = pending.pop()
+        if any(line in lines for _, line in dis.findlinestarts(code)):
+            found.append(code)
+        pending.extend(const for const in code.co_consts if hasattr(const, 'co_code'))
+    return found
+
+
+class Tracer:
+    """Collects breakpoint hits for one program run"""
+
+    def __init__(self, lines, max_snapshots, max_steps, serializer):
+        self.lines = set(lines)
+        self.max_snapshots = max_snapshots
+        self.max_steps = max_steps
+        self.serializer = serializer
+        self.steps = 0
+        self.hits = {}
+        self.snapshots = []
+        self.detached = False
+
+    def hit(self, frame, line):
+        """Record a breakpoint hit; returns False once the debugger should detach"""
+        self.steps += 1
+        self.hits[line] = self.hits.get(line, 0) + 1
+        if len(self.snapshots) < self.max_snapshots:
+            self.snapshots.append({
+                "line": line,
+                "hit": self.hits[line],
+                "function": frame.f_code.co_name,
+                "callStack": _call_stack(frame),
+                "variables": self.serializer.variables(frame.f_locals),
+            })
+        if self.steps >= self.max_steps:
+            self.detached = True
+        return not self.detached
+
+    def report(self):
+        return {
+            "snapshots": self.snapshots,
+            "hits": {str(line): count for line, count in sorted(self.hits.items())},
+            "steps": self.steps,
+            "truncated": self.detached or sum(self.hits.values()) > len(self.snapshots),
+        }
+
+    def install(self, code):
+        """Start tracing code's breakpoint lines; returns a function that stops it"""
+        traced = _traced_code(code, self.lines)
+        if not traced:
+            return lambda: None
+        if hasattr(sys, 'monitoring'):
+            return self._monitor(traced)
+        return self._settrace(traced)
+
+    def _monitor(self, traced):
+        monitoring = sys.monitoring
+        tool = monitoring.DEBUGGER_ID
+        monitoring.use_tool_id(tool, "ai-tester-debugger")
+
+        def on_line(code, line):
+            if self.detached or line not in self.lines:
+                # Never reported again for this line
+                return monitoring.DISABLE
+            self.hit(sys._getframe(1), line)
+
+        monitoring.register_callback(tool, monitoring.events.LINE, on_line)
+        for code in traced:
+            monitoring.set_local_events(tool, code, monitoring.events.LINE)
+
+        def stop():
+            for code in traced:
+                monitoring.set_local_events(tool, code, 0)
+            monitoring.register_callback(tool, monitoring.events.LINE, None)
+            monitoring.free_tool_id(tool)
+        return stop
+
+    def _settrace(self, traced):
+        traced = set(traced)
+
+        def local_trace(frame, event, arg):
+            if self.detached:
+                return None
+            if event == 'line' and frame.f_lineno in self.lines:
+                if not self.hit(frame, frame.f_lineno):
+                    stop()
+                    return None
+            return local_trace
+
+        def global_trace(frame, event, arg):
+            # Other frames run without a local tracer, so their lines cost nothing
+            if not self.detached and frame.f_code in traced:
+                return local_trace
+            return None
+
+        def stop():
+            sys.settrace(None)
+            threading.settrace(None)
+
+        sys.settrace(global_trace)
+        threading.settrace(global_trace)
+        return stop
+
+
+# Values whose preview can't change while the same object stays bound to a name
+_IMMUTABLE = {int, float, complex, bool, str, bytes, type(None), type, types.ModuleType,
+              types.FunctionType, types.BuiltinFunctionType}
+
+
+class _CountingOutput:
+    """Wraps sys.stdout to count the characters the program has printed"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, text):
+        self.count += len(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Recorder:
+    """Records every line the program's main thread executes into a Trace"""
+
+    def __init__(self, trace, serializer, output, max_steps, max_bytes, deadline, on_deadline):
+        self.trace = trace
+        self.serializer = serializer
+        self.output = output
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        self.on_deadline = on_deadline
+        self.last = {}  # name -> (value, preview) as last recorded
+        self.truncated = False
+
+    def _preview(self, value):
+        try:
+            return self.serializer._preview(value)
+        except Exception as e:
+            return f"<repr failed: {e}>"
+
+    def step(self, frame):
+        """Record one executed line; returns False once recording should stop"""
+        names, changes = [], []
+        for name, value in frame.f_locals.items():
+            if name.startswith('__'):
+                continue
+            names.append(name)
+            last = self.last.get(name)
+            if last is not None and last[0] is value and type(value) in _IMMUTABLE:
+                continue
+            text = self._preview(value)
+            if last is None or last[1] != text:
+                changes.append((name, text))
+            self.last[name] = (value, text)
+        trace = self.trace
+        trace.append(frame.f_lineno, trace.scope(frame.f_code.co_name, names), self.output.count, changes)
+        if len(trace) % 1024 == 0:
+            if time.monotonic() > self.deadline:
+                self.on_deadline()
+            if trace.nbytes >= self.max_bytes:
+                self.truncated = True
+        if len(trace) >= self.max_steps:
+            self.truncated = True
+        return not self.truncated
+
+    def install(self):
+        """Start recording; returns a function that stops it"""
+        def local_trace(frame, event, arg):
+            if self.truncated:
+                return None
+            if event == 'line' and not self.step(frame):
+                sys.settrace(None)
+                return None
+            return local_trace
+
+        def global_trace(frame, event, arg):
+            if not self.truncated and frame.f_code.co_filename == FILENAME:
+                return local_trace
+            return None
+
+        sys.settrace(global_trace)
+        return lambda: sys.settrace(None)
+
+
+# Runs JavaScript with a conditional breakpoint on the first statement of
+# every line. A worker thread attached to the main thread's inspector pauses
+# each line's first hit to read the variable names in scope, then swaps its
+# condition for a call that records the step and evaluates to false, so
+# later hits never pause. The trace goes to the socket named in the job, one
+# JSON message per line: ["scope", id, function, names],
+# ["step", line, scope id, stdout offset, [[name, preview], ...]],
+# ["truncated"] once max_steps is reached and ["error", message].
+NODE_RECORDER = r"""
+const fs = require('fs');
+const path = require('path');
+const util = require('util');
+const vm = require('vm');
+const Module = require('module');
+const { pathToFileURL } = require('url');
+const { Worker } = require('worker_threads');
+function readExactly(n) {
+    const buf = Buffer.alloc(n);
+    let off = 0;
+    while (off < n) {
+        let r;
+        try {
+            r = fs.readSync(0, buf, off, n - off, null);
+        } catch (e) {
+            if (e.code === 'EAGAIN') continue;
+            throw e;
+        }
+        if (r === 0) process.exit(0);
+        off += r;
+    }
+    return buf;
+}
+let header = '';
+for (;;) {
+    const c = readExactly(1).toString();
+    if (c === '\n') break;
+    header += c;
+}
+const job = JSON.parse(header);
+const code = readExactly(job.size).toString('utf8');
+const filename = path.resolve(job.filename);
+const HOOK = '__aiTesterRecorder';
+
+const WORKER = String.raw`
+const { parentPort, workerData } = require('worker_threads');
+const inspector = require('inspector');
+const session = new inspector.Session();
+session.connectToMainThread();
+const keepAlive = setInterval(() => {}, 1 << 30);
+const post = (method, params) => new Promise((resolve, reject) =>
+    session.post(method, params, (error, result) => error ? reject(error) : resolve(result)));
+const hook = 'globalThis[' + JSON.stringify(workerData.hook) + ']';
+const WRAPPER = ['exports', 'require', 'module', '__filename', '__dirname'];
+let scriptId = null;
+let nextScope = 0;
+session.on('Debugger.scriptParsed', ({ params }) => {
+    if (params.url === workerData.url || params.url === workerData.filename) scriptId = params.scriptId;
+});
+session.on('Debugger.paused', async ({ params }) => {
+    const frame = params.callFrames[0];
+    try {
+        if (frame.location.scriptId !== scriptId || !(params.hitBreakpoints || []).length) return;
+        let names = [];
+        for (const scope of frame.scopeChain) {
+            if (scope.type !== 'local' && scope.type !== 'block' && scope.type !== 'catch') continue;
+            const { result } = await post('Runtime.getProperties', { objectId: scope.object.objectId, ownProperties: true });
+            for (const property of result) {
+                if (!names.includes(property.name)) names.push(property.name);
+            }
+        }
+        if (WRAPPER.every(name => names.includes(name))) names = names.filter(name => !WRAPPER.includes(name));
+        const id = nextScope++;
+        const getter = '(k) => { switch (k) { ' + names.map((name, i) => 'case ' + i + ': return ' + name + ';').join(' ') + ' } }';
+        const record = hook + '(' + (frame.location.lineNumber + 1) + ', ' + id + ', ' + getter + ')';
+        for (const breakpointId of params.hitBreakpoints) await post('Debugger.removeBreakpoint', { breakpointId });
+        await post('Debugger.setBreakpoint', { location: frame.location, condition: record });
+        await post('Debugger.evaluateOnCallFrame', {
+            callFrameId: frame.callFrameId,
+            expression: hook + '.scope(' + id + ', ' + JSON.stringify(frame.functionName || 'main') + ', ' +
+                JSON.stringify(names) + '), ' + record,
+        });
+    } catch (e) {
+        // The line goes unrecorded; the program still runs
+    } finally {
+        session.post('Debugger.resume');
+    }
+});
+parentPort.once('message', async () => {
+    try {
+        await post('Debugger.enable');
+        const { locations } = await post('Debugger.getPossibleBreakpoints',
+            { start: { scriptId, lineNumber: 0, columnNumber: 0 } });
+        const lines = new Set();
+        const first = locations.filter(location => !lines.has(location.lineNumber) && lines.add(location.lineNumber));
+        await Promise.all(first.map(location => post('Debugger.setBreakpoint', { location, condition: hook + '.first()' })));
+    } finally {
+        parentPort.postMessage('ready');
+    }
+});
+`;
+
+let written = 0;
+const write = process.stdout.write;
+process.stdout.write = function (chunk, ...rest) {
+    written += chunk.length;
+    return write.call(this, chunk, ...rest);
+};
+
+let pending = '';
+function flush() {
+    const data = Buffer.from(pending);
+    pending = '';
+    let off = 0;
+    while (off < data.length) {
+        try {
+            off += fs.writeSync(job.channel_fd, data, off);
+        } catch (e) {
+            if (e.code !== 'EAGAIN') throw e;
+        }
+    }
+}
+function emit(message) {
+    pending += JSON.stringify(message) + '\n';
+    if (pending.length > 65536) flush();
+}
+process.on('exit', flush);
+
+const inspectOptions = { depth: 1, maxArrayLength: job.max_items, maxStringLength: job.max_chars, breakLength: Infinity };
+function preview(value) {
+    let text;
+    try {
+        text = util.inspect(value, inspectOptions);
+    } catch (e) {
+        text = '<inspect failed: ' + e.message + '>';
+    }
+    return text.length > job.max_chars ? text.slice(0, job.max_chars) + '...' : text;
+}
+
+const scopes = [];
+const last = new Map();
+let steps = 0;
+let stopped = false;
+// Called from breakpoint conditions; returns false so the program doesn't pause
+function hook(line, scope, get) {
+    if (stopped) return false;
+    const names = scopes[scope];
+    const changes = [];
+    for (let k = 0; k < names.length; k++) {
+        let value;
+        try {
+            value = get(k);
+        } catch (e) {
+            continue;  // A let or const before its declaration
+        }
+        const previous = last.get(names[k]);
+        if (previous && Object.is(previous[0], value) && (typeof value !== 'object' || value === null)) continue;
+        const text = preview(value);
+        if (!previous || previous[1] !== text) changes.push([names[k], text]);
+        last.set(names[k], [value, text]);
+    }
+    emit(['step', line, scope, written, changes]);
+    if (++steps >= job.max_steps) {
+        stopped = true;
+        emit(['truncated']);
+    }
+    return false;
+}
+hook.first = () => !stopped;
+hook.scope = (id, fn, names) => {
+    scopes[id] = names;
+    emit(['scope', id, fn, names]);
+};
+Object.defineProperty(globalThis, HOOK, { value: hook });
+
+const m = new Module(filename, null);
+m.id = '.';
+m.filename = filename;
+m.paths = Module._nodeModulePaths(path.dirname(filename));
+process.argv[1] = filename;
+process.mainModule = m;
+function fail(prefix, e) {
+    emit(['error', prefix + (e && e.message !== undefined ? e.message : String(e))]);
+    process.stderr.write(String(e && e.stack || e) + '\n');
+    process.exitCode = 1;
+}
+let wrapper;
+try {
+    wrapper = vm.compileFunction(code, ['exports', 'require', 'module', '__filename', '__dirname'], { filename });
+} catch (e) {
+    fail('Syntax error: ', e);
+    process.exit();
+}
+const worker = new Worker(WORKER, { eval: true, workerData: { hook: HOOK, url: pathToFileURL(filename).href, filename } });
+worker.unref();
+worker.once('message', () => {
+    try {
+        wrapper.call(m.exports, m.exports, Module.createRequire(filename), m, filename, path.dirname(filename));
+    } catch (e) {
+        fail('Runtime error: ', e);
+    }
+});
+worker.postMessage('compiled');
+"""
+
+
+def _record_node(code, job, trace, deadline):
+    """Run JavaScript under NODE_RECORDER into trace; returns (status, errors, truncated)"""
+    channel, node_channel = socket.socketpair()
+    payload = code.encode('utf-8')
+    header = json.dumps({
+        "filename": "main.js",
+        "size": len(payload),
+        "max_steps": job["max_trace_steps"],
+        "max_items": MAX_ITEMS,
+        "max_chars": MAX_VALUE_CHARS,
+        "channel_fd": node_channel.fileno(),
+    }).encode('utf-8') + b'\n'
+    # stdout and stderr are inherited, so the program's output goes straight to the parent
+    proc = subprocess.Popen([worker_pool.NODE_EXECUTABLE, '-e', NODE_RECORDER], stdin=subprocess.PIPE,
+                            pass_fds=(node_channel.fileno(),))
+    node_channel.close()
+    errors = []
+    truncated = False
+    try:
+        proc.stdin.write(header + payload)
+        proc.stdin.close()
+    except OSError:
+        pass  # Node exited early; its status says why
+
+    file = channel.makefile('rb')
+    scopes = {}  # Node scope ID -> trace scope ID
+    try:
+        while True:
+            channel.settimeout(max(deadline - time.monotonic(), 0.01))
+            line = file.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if message[0] == "scope":
+                scopes[message[1]] = trace.scope(message[2], message[3])
+            elif message[0] == "truncated":
+                truncated = True
+            elif message[0] == "error":
+                errors.append(message[1])
+            elif len(trace) < job["max_trace_steps"] and trace.nbytes < job["max_trace_bytes"]:
+                trace.append(message[1], scopes[message[2]], message[3], message[4])
+            else:
+                truncated = True
+    except socket.timeout:
+        proc.kill()
+        errors.append(f"Execution timed out ({job['limits']['wall']}s limit).")
+        truncated = True
+    status = proc.wait()
+    channel.close()
+    if status and not errors:
+        errors.append(sandbox.describe_exit(status, job["limits"]) or f"Program exited with code {status}.")
+    return status, errors, truncated
+
+
+def _reply(request, serializer, trace):
+    try:
+        op = request.get("op", "expand")
+        if op == "expand":
+            return serializer.expand(int(request["handle"]), int(request.get("start", 0)),
+                                     int(request.get("count", MAX_ITEMS)))
+        if op == "trace" and trace is not None:
+            return trace.page(int(request.get("start", 0)), int(request.get("count", TRACE_PAGE)))
+        raise ValueError("This session has no trace." if op == "trace" else f"Unknown request {op!r}.")
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _serve(listener, serializer, trace):
+    """Answer expand and trace requests from any web worker until closed or idle for SESSION_TTL"""
+    listener.settimeout(SESSION_TTL)
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except OSError:
+            return
+        with conn, conn.makefile('rwb') as file:
+            conn.settimeout(REQUEST_TIMEOUT)
+            try:
+                for line in file:
+                    request = json.loads(line)
+                    if request.get("op") == "close":
+                        return
+                    file.write(json.dumps(_reply(request, serializer, trace)).encode('utf-8') + b'\n')
+                    file.flush()
+            except (OSError, ValueError):
+                pass
+
+
+def _listen(path):
+    """A socket listening at path, or None if it can't be created"""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(path)
+        listener.listen(8)
+    except OSError:
+        listener.close()
+        return None
+    return listener
+
+
+def _finish(channel, file, report, status, serializer, trace, session_path):
+    """Hand back stdio, send the report, serve the session and exit"""
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except Exception:
+        pass
+    # The parent collects output until EOF, so hand back stdout and stderr now
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    listener = None
+    if session_path and (report.get("handles") or report.get("trace")):
+        # Listening before the report goes out, so the session is reachable once registered
+        listener = _listen(session_path)
+        report["session"] = listener is not None
+    try:
+        file.write(json.dumps(report).encode('utf-8') + b'\n')
+        file.flush()
+        file.close()
+        channel.close()
+        if listener is not None:
+            _serve(listener, serializer, trace)
+    except OSError:
+        pass
+    if listener is not None:
+        try:
+            os.unlink(session_path)
+        except OSError:
+            pass
+    os._exit(status)
+
+
+def tracer_main():
+    """Entry point of the tracer child: read one job from stdin, run and report it"""
+    import builtins
+    import linecache
+    import traceback
+
+    import trace_recorder
+
+    job = json.loads(sys.stdin.buffer.readline())
+    code = sys.stdin.buffer.read(job["size"]).decode('utf-8')
+    channel = socket.socket(fileno=job["channel_fd"])
+    file = channel.makefile('rwb')
+    sandbox.apply_limits(job["limits"])
+    # Leaves time to report a partial recording before the parent gives up,
+    # unless the program is blocked in a call when it passes
+    deadline = time.monotonic() + job["limits"]["wall"] - 0.5
+
+    serializer = Serializer()
+    trace = trace_recorder.Trace() if job["record"] else None
+    errors = []
+
+    if job["lang"] == "javascript":
+        status, errors, truncated = _record_node(code, job, trace, deadline)
+        report = {"errors": errors, "trace": dict(trace.page(0, TRACE_PAGE), truncated=truncated)}
+        _finish(channel, file, report, status, serializer, trace, job["session_path"])
+
+    sys.argv = [FILENAME]
+    # Don't let user code import the web application's modules
+    sys.path[:] = [entry for entry in sys.path if entry not in ('', _APP_DIR)]
+    main = types.ModuleType('__main__')
+    main.__file__ = FILENAME
+    main.__builtins__ = builtins
+    sys.modules['__main__'] = main
+    linecache.cache[FILENAME] = (len(code), None, code.splitlines(True), FILENAME)
+
+    def build_report():
+        if trace is None:
+            report = tracer.report()
+        else:
+            report = {"trace": dict(trace.page(0, TRACE_PAGE), truncated=tracer.truncated)}
+        report["variables"] = serializer.variables(main.__dict__)
+        report["errors"] = errors
+        report["handles"] = len(serializer.objects)
+        return report
+
+    def timed_out():
+        errors.append(f"Execution timed out ({job['limits']['wall']}s limit).")
+        tracer.truncated = True
+        _finish(channel, file, build_report(), 1, serializer, trace, job["session_path"])
+
+    if trace is None:
+        tracer = Tracer(job["breakpoints"], job["max_snapshots"], job["max_steps"], serializer)
+    else:
+        sys.stdout = _CountingOutput(sys.stdout)
+        tracer = Recorder(trace, serializer, sys.stdout, job["max_trace_steps"], job["max_trace_bytes"],
+                          deadline, timed_out)
+    status = 0
+    try:
+        compiled = compile(code, FILENAME, 'exec')
+        stop = tracer.install(compiled) if trace is None else tracer.install()
+        try:
+            exec(compiled, main.__dict__)
+        finally:
+            stop()
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        etype, value, tb = sys.exc_info()
+        errors.append(f"Runtime error: {str(e)}")
+        errors.append(''.join(traceback.format_exception(etype, value, tb.tb_next)))
+        status = 1
+
+    _finish(channel, file, build_report(), status, serializer, trace, job["session_path"])
@@ -0,0 +1,140 @@
+"""
+Asynchronous execution jobs.
+
+Submitting a job records it in the jobs table and hands it to a bounded
+thread pool in the current worker process, so the request that submitted it
+returns immediately. Job state and results live in the database, which lets
+any gunicorn worker answer status polls for any job. A job still queued or
+running JOB_STALE_AFTER seconds after it was submitted belonged to a worker
+that died, and is marked failed.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 8))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 64))
+JOB_TTL = int(os.environ.get('JOB_TTL', 3600))
+JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 600))
+MAX_WAIT = 25  # Longest a status request may long-poll, in seconds
+POLL_INTERVAL = 0.1
+CLEANUP_INTERVAL = 60
+
+TERMINAL_STATUSES = {'done', 'failed'}
+
+
+class QueueFull(Exception):
+    """Raised when this worker already has JOB_MAX_PENDING jobs in flight"""
+
+
+_executor = None
+_executor_pid = None
+_pending = 0
+_events = {}
+_stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+_last_cleanup = 0.0
+_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return this process's executor (threads don't survive a fork)"""
+    global _executor, _executor_pid, _pending
+    if _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+        _executor_pid = os.getpid()
+        _pending = 0
+        _events.clear()
+    return _executor
+
+
+def _cleanup():
+    global _last_cleanup
+    now = time.monotonic()
+    if now - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    _last_cleanup = now
+    database.fail_stale_jobs(JOB_STALE_AFTER, "Job was lost: the worker running it stopped.")
+    database.delete_expired_jobs(JOB_TTL)
+
+
+def submit(user_id, type, fn, *args):
+    """Queue fn(*args) and return the new job's ID"""
+    global _pending
+    with _lock:
+        executor = _get_executor()
+        if _pending >= JOB_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise QueueFull(f"{_pending} jobs already in progress")
+        _pending += 1
+        _stats["submitted"] += 1
+        job_id = uuid.uuid4().hex
+        _events[job_id] = threading.Event()
+
+    try:
+        _cleanup()
+        database.create_job(job_id, user_id, type)
+        executor.submit(_run, job_id, fn, args)
+    except Exception:
+        _finish(job_id, None)
+        raise
+    return job_id
+
+
+def _run(job_id, fn, args):
+    database.update_job(job_id, 'running')
+    status = 'failed'
+    try:
+        result = fn(*args)
+        database.update_job(job_id, 'done', result=result)
+        status = 'completed'
+    except Exception as e:
+        database.update_job(job_id, 'failed', error=str(e))
+    finally:
+        _finish(job_id, status)
+
+
+def _finish(job_id, status):
+    global _pending
+    with _lock:
+        _pending -= 1
+        if status:
+            _stats[status] += 1
+        event = _events.pop(job_id, None)
+    if event:
+        event.set()
+
+
+def get(job_id, user_id, wait=0):
+    """
+    Return a job's current state, waiting up to wait seconds for it to finish.
+
+    Jobs started by this process are waited on directly; jobs owned by other
+    workers are polled from the database.
+    """
+    wait = min(max(wait, 0), MAX_WAIT)
+    deadline = time.monotonic() + wait
+    _cleanup()
+
+    event = _events.get(job_id)
+    if event is not None and wait:
+        event.wait(wait)
+
+    while True:
+        job = database.get_job(job_id, user_id)
+        if job is None or job['status'] in TERMINAL_STATUSES or time.monotonic() >= deadline:
+            return job
+        time.sleep(POLL_INTERVAL)
+
+
+def get_stats():
+    """Return job counters for this process"""
+    with _lock:
+        stats = dict(_stats)
+        stats["pending"] = _pending if _executor_pid == os.getpid() else 0
+    stats["workers"] = JOB_WORKERS
+    stats["max_pending"] = JOB_MAX_PENDING
+    return stats
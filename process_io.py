@@ -0,0 +1,199 @@
+"""
+Incremental reading of child process output.
+
+Works with both subprocess.Popen objects and the Popen-like handles returned
+by worker_pool, as long as stdout and stderr are binary pipes.
+"""
+import os
+import selectors
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+CHUNK_SIZE = 4096
+# Bytes of each stream kept in memory (half from the start, half from the end)
+OUTPUT_LIMIT = int(os.environ.get('RUN_OUTPUT_LIMIT_KB', 64)) * 1024
+SPILL_LIMIT = int(os.environ.get('RUN_SPILL_LIMIT_MB', 64)) * 1024 * 1024
+
+
+def iter_output(proc, timeout=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield ("stdout" | "stderr", bytes) chunks as the process writes them.
+
+    Stops once both pipes are closed. Raises subprocess.TimeoutExpired if that
+    doesn't happen within timeout seconds; killing the process is up to the
+    caller.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    for name in ('stdout', 'stderr'):
+        stream = getattr(proc, name)
+        if stream is not None:
+            selector.register(stream, selectors.EVENT_READ, name)
+    try:
+        while selector.get_map():
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(proc.args, timeout)
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, chunk_size)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+                yield key.data, data
+    finally:
+        selector.close()
+
+
+class OutputCollector:
+    """
+    Bounded capture of one output stream.
+
+    Keeps the first and last ``limit / 2`` bytes and counts everything in
+    between, so a program printing in a loop can't grow the web worker's
+    memory. With spill=True the complete output (up to SPILL_LIMIT bytes)
+    stays readable through iter_full(): once it outgrows the two windows it
+    is written to an anonymous temp file.
+    """
+
+    def __init__(self, limit=OUTPUT_LIMIT, spill=False):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill = spill
+        self.spill_file = None
+        self.spilled = 0
+
+    def write(self, data):
+        """Record a chunk and return the part of it that went into the head window"""
+        if self.spill and self.spill_file is None and \
+                self.total + len(data) > self.head_limit + self.tail_limit:
+            # Nothing has been dropped yet, so the windows still hold everything so far
+            self.spill_file = tempfile.TemporaryFile()
+            self.spill_file.write(self.head + self.tail)
+            self.spilled = self.total
+        self.total += len(data)
+        if self.spill_file is not None and self.spilled < SPILL_LIMIT:
+            part = data[:SPILL_LIMIT - self.spilled]
+            self.spill_file.write(part)
+            self.spilled += len(part)
+
+        room = self.head_limit - len(self.head)
+        live = data[:room] if room > 0 else b''
+        self.head += live
+        rest = data[len(live):]
+        if rest:
+            self.tail += rest
+            if len(self.tail) > self.tail_limit:
+                del self.tail[:len(self.tail) - self.tail_limit]
+        return live
+
+    @property
+    def truncated(self):
+        return self.total > len(self.head) + len(self.tail)
+
+    @property
+    def omitted(self):
+        return self.total - len(self.head) - len(self.tail)
+
+    @property
+    def complete(self):
+        """True when iter_full() can return the entire output"""
+        if self.spill_file is None:
+            return not self.truncated
+        return self.spilled == self.total
+
+    def omission_notice(self):
+        return f"\n... [{self.omitted} bytes omitted] ...\n"
+
+    def tail_text(self):
+        return bytes(self.tail).decode('utf-8', errors='replace')
+
+    def text(self):
+        """Head and tail decoded, with a notice in place of the omitted middle"""
+        head = bytes(self.head).decode('utf-8', errors='replace')
+        if self.truncated:
+            return head + self.omission_notice() + self.tail_text()
+        return head + self.tail_text()
+
+    def iter_full(self, chunk_size=65536):
+        """Yield the output from the start, chunk by chunk (all of it only if complete)"""
+        if self.spill_file is None:
+            yield bytes(self.head + self.tail)
+            return
+        self.spill_file.flush()
+        self.spill_file.seek(0)
+        while True:
+            chunk = self.spill_file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+
+def _feed(stdin, data):
+    try:
+        if hasattr(data, 'read'):
+            shutil.copyfileobj(data, stdin, 65536)
+        elif data:
+            stdin.write(data)
+    except BrokenPipeError:
+        pass
+    finally:
+        if hasattr(data, 'close'):
+            data.close()
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def send_input(proc, input=None):
+    """
+    Write input to proc's stdin and close it, in the background if there is any.
+
+    input is bytes or a binary file object, which is streamed and then closed.
+    """
+    if proc.stdin is None:
+        return
+    if input or hasattr(input, 'read'):
+        threading.Thread(target=_feed, args=(proc.stdin, input), daemon=True).start()
+    else:
+        _feed(proc.stdin, None)
+
+
+def collect(proc, input=None, timeout=None, limit=OUTPUT_LIMIT, spill=False):
+    """
+    Send input, then read stdout and stderr into OutputCollectors until both close.
+
+    Returns (stdout, stderr) collectors. The process is not reaped, so the
+    caller can still collect its resource usage. On timeout the collectors
+    ride along on the TimeoutExpired as its output and stderr; their spill
+    files are closed, but the head and tail windows are still readable.
+    """
+    send_input(proc, input)
+    collectors = {
+        'stdout': OutputCollector(limit, spill),
+        'stderr': OutputCollector(limit, spill),
+    }
+    try:
+        for name, data in iter_output(proc, timeout):
+            collectors[name].write(data)
+    except BaseException as e:
+        for collector in collectors.values():
+            collector.close()
+        if isinstance(e, subprocess.TimeoutExpired):
+            e.output, e.stderr = collectors['stdout'], collectors['stderr']
+        raise
+    return collectors['stdout'], collectors['stderr']
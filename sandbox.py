@@ -0,0 +1,139 @@
+"""
+Resource limits and usage accounting for user programs.
+
+Limits are derived from the user's ``timeout`` setting: it bounds both wall
+clock and CPU time. Memory, file output and process count limits come from
+the environment. Memory is capped with RLIMIT_DATA rather than RLIMIT_AS,
+because Node and the JVM reserve far more address space than they use.
+"""
+import os
+import signal
+import subprocess
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TIMEOUT = 10
+MAX_TIMEOUT = int(os.environ.get('RUN_MAX_TIMEOUT', 60))
+MEMORY_LIMIT = int(os.environ.get('RUN_MEMORY_MB', 512)) * 1024 * 1024
+FILE_SIZE_LIMIT = int(os.environ.get('RUN_FILE_SIZE_MB', 16)) * 1024 * 1024
+# RLIMIT_NPROC counts every thread of the account, web workers included
+PROCESS_LIMIT = int(os.environ.get('RUN_MAX_PROCESSES', 512))
+
+
+def limits_for(timeout=None):
+    """Build the limits for one run from a user's timeout setting"""
+    try:
+        timeout = int(timeout)
+    except (TypeError, ValueError):
+        timeout = DEFAULT_TIMEOUT
+    timeout = min(max(timeout, 1), MAX_TIMEOUT)
+    return {
+        "wall": timeout,
+        "cpu": timeout,
+        "memory": MEMORY_LIMIT,
+        "file_size": FILE_SIZE_LIMIT,
+        "processes": PROCESS_LIMIT,
+    }
+
+
+def _rlimits(limits):
+    return [
+        # The hard CPU limit sits one second above the soft one, so SIGXCPU comes first
+        (resource.RLIMIT_CPU, (limits["cpu"], limits["cpu"] + 1)),
+        (resource.RLIMIT_DATA, (limits["memory"], limits["memory"])),
+        (resource.RLIMIT_FSIZE, (limits["file_size"], limits["file_size"])),
+        (resource.RLIMIT_NPROC, (limits["processes"], limits["processes"])),
+    ]
+
+
+def apply_limits(limits):
+    """Apply limits to the current process (called in a freshly forked child)"""
+    if resource is None or not limits:
+        return
+    for which, value in _rlimits(limits):
+        try:
+            resource.setrlimit(which, value)
+        except (ValueError, OSError):
+            pass
+
+
+def limit_process(pid, limits):
+    """Apply limits to an already running process, e.g. a pre-started worker"""
+    if resource is None or not limits or not hasattr(resource, 'prlimit'):
+        return
+    for which, value in _rlimits(limits):
+        try:
+            resource.prlimit(pid, which, value)
+        except (ValueError, OSError):
+            pass
+
+
+def wait(proc, timeout=None):
+    """
+    Wait for proc to exit and store its rusage on proc.rusage.
+
+    Popen reaps with waitpid(), which discards resource usage, so plain
+    Popen children are reaped here with wait4() instead. Worker pool handles
+    already report their usage.
+    """
+    if proc.returncode is not None or not isinstance(proc, subprocess.Popen):
+        return proc.wait(timeout)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.0005
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            proc.rusage = {
+                "utime": rusage.ru_utime,
+                "stime": rusage.ru_stime,
+                "maxrss": rusage.ru_maxrss,
+            }
+            return proc.returncode
+        if deadline is not None and time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.02)
+
+
+def kill(proc):
+    """Kill proc if it is still running and reap it"""
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    wait(proc)
+
+
+def usage(proc, wall_time, compile_time=0.0):
+    """
+    Summarize a finished run for API responses.
+
+    peak_rss_kb is the kernel's ru_maxrss, which survives exec(), so it is
+    never lower than the footprint of the process that forked the program.
+    """
+    rusage = getattr(proc, 'rusage', None) or {}
+    cpu_time = rusage.get("utime", 0.0) + rusage.get("stime", 0.0)
+    return {
+        "cpu_time": round(cpu_time, 4),
+        "peak_rss_kb": rusage.get("maxrss", 0),
+        "wall_time": round(wall_time, 4),
+        "compile_time": round(compile_time, 4),
+    }
+
+
+def describe_exit(returncode, limits):
+    """Explain an exit caused by one of the rlimits, or return None"""
+    if resource is None or returncode is None or returncode >= 0:
+        return None
+    if -returncode == signal.SIGXCPU:
+        return f"CPU time limit exceeded ({limits['cpu']}s)."
+    if -returncode == signal.SIGXFSZ:
+        return f"File size limit exceeded ({limits['file_size'] // (1024 * 1024)} MB)."
+    return None
@@ -0,0 +1,262 @@
+"""
+Fair-share execution scheduler shared by all gunicorn workers.
+
+Every execution takes a ticket in a small SQLite database that all worker
+processes on the host share. A ticket may start once a slot is free and it
+is the next one in round-robin order: among users with waiting tickets, the
+user who was served least recently goes first, so one user queuing many
+programs can't starve everybody else.
+
+Short requests (such as /analyze) use their own lane with reserved slots
+and are never queued behind long-running programs. When a lane's queue is
+full, or a user already has too many tickets waiting, new work is rejected
+with Overloaded, which the web layer turns into HTTP 429 with Retry-After.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEDULER_DB = os.environ.get(
+    'SCHEDULER_DB',
+    os.path.join(tempfile.gettempdir(), 'ai_tester_scheduler.db')
+)
+MAX_RUNNING = int(os.environ.get('SCHED_MAX_RUNNING', os.cpu_count() or 4))
+SHORT_SLOTS = int(os.environ.get('SCHED_SHORT_SLOTS', 4))
+MAX_QUEUE = int(os.environ.get('SCHED_MAX_QUEUE', MAX_RUNNING * 4))
+MAX_QUEUED_PER_USER = int(os.environ.get('SCHED_MAX_QUEUED_PER_USER', 4))
+QUEUE_TIMEOUT = float(os.environ.get('SCHED_QUEUE_TIMEOUT', 30))
+POLL_INTERVAL = 0.02
+REAP_INTERVAL = 1.0
+
+NORMAL = 'normal'
+SHORT = 'short'
+
+LANE_SLOTS = {
+    NORMAL: MAX_RUNNING,
+    SHORT: SHORT_SLOTS,
+}
+
+
+class Overloaded(Exception):
+    """Raised when a ticket can't be admitted; retry_after is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+_local = threading.local()
+_stats = {"admitted": 0, "rejected": 0, "timed_out": 0}
+_avg_runtime = {NORMAL: 1.0, SHORT: 0.1}
+_started = {}
+_last_reap = 0.0
+_lock = threading.Lock()
+
+
+def _get_connection():
+    """Return this thread's scheduler connection, creating the schema once"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.path == SCHEDULER_DB:
+        return conn
+    conn = sqlite3.connect(SCHEDULER_DB, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_key TEXT NOT NULL,
+            lane TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'waiting',
+            pid INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tickets_lane_state ON tickets (lane, state, user_key)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS served (
+            user_key TEXT PRIMARY KEY,
+            last_served REAL NOT NULL
+        )
+    ''')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.path = SCHEDULER_DB
+    return conn
+
+
+@contextmanager
+def _transaction():
+    """BEGIN IMMEDIATE serializes scheduling decisions across processes"""
+    conn = _get_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _reap(conn):
+    """Drop tickets left behind by worker processes that died"""
+    global _last_reap
+    now = time.monotonic()
+    if now - _last_reap < REAP_INTERVAL:
+        return
+    _last_reap = now
+    pids = [row[0] for row in conn.execute('SELECT DISTINCT pid FROM tickets')]
+    for pid in pids:
+        if not _pid_alive(pid):
+            conn.execute('DELETE FROM tickets WHERE pid = ?', (pid,))
+
+
+def _retry_after(lane, waiting):
+    """Rough time for the current queue to drain, in whole seconds"""
+    return max(1, math.ceil((waiting + 1) * _avg_runtime[lane] / LANE_SLOTS[lane]))
+
+
+def _admit(user_key, lane):
+    with _transaction() as conn:
+        _reap(conn)
+        waiting = conn.execute(
+            "SELECT COUNT(*) FROM tickets WHERE lane = ? AND state = 'waiting'", (lane,)
+        ).fetchone()[0]
+        if waiting >= MAX_QUEUE:
+            raise Overloaded("Server is busy, please retry shortly.", _retry_after(lane, waiting))
+        user_waiting = conn.execute(
+            "SELECT COUNT(*) FROM tickets WHERE user_key = ? AND state = 'waiting'", (user_key,)
+        ).fetchone()[0]
+        if user_waiting >= MAX_QUEUED_PER_USER:
+            raise Overloaded("Too many of your programs are already queued.",
+                             _retry_after(lane, user_waiting))
+        cursor = conn.execute(
+            'INSERT INTO tickets (user_key, lane, pid, created_at) VALUES (?, ?, ?, ?)',
+            (user_key, lane, os.getpid(), time.time())
+        )
+        return cursor.lastrowid
+
+
+def _try_start(ticket_id, user_key, lane):
+    """Start the ticket if a slot is free and it is next in round-robin order"""
+    with _transaction() as conn:
+        running = conn.execute(
+            "SELECT COUNT(*) FROM tickets WHERE lane = ? AND state = 'running'", (lane,)
+        ).fetchone()[0]
+        if running >= LANE_SLOTS[lane]:
+            return False
+        # Oldest waiting ticket of the least recently served user
+        row = conn.execute('''
+            SELECT t.id FROM tickets t
+            LEFT JOIN served s ON s.user_key = t.user_key
+            WHERE t.lane = ? AND t.state = 'waiting'
+              AND t.id = (SELECT MIN(id) FROM tickets
+                          WHERE user_key = t.user_key AND lane = t.lane AND state = 'waiting')
+            ORDER BY COALESCE(s.last_served, 0), t.id
+            LIMIT 1
+        ''', (lane,)).fetchone()
+        if not row or row[0] != ticket_id:
+            return False
+        conn.execute("UPDATE tickets SET state = 'running' WHERE id = ?", (ticket_id,))
+        conn.execute(
+            'INSERT OR REPLACE INTO served (user_key, last_served) VALUES (?, ?)',
+            (user_key, time.time())
+        )
+        return True
+
+
+def acquire(user_key, lane=NORMAL):
+    """Wait for an execution slot and return the ticket ID holding it"""
+    user_key = str(user_key)
+    try:
+        ticket_id = _admit(user_key, lane)
+    except Overloaded:
+        _count("rejected")
+        raise
+
+    deadline = time.monotonic() + QUEUE_TIMEOUT
+    try:
+        while not _try_start(ticket_id, user_key, lane):
+            if time.monotonic() >= deadline:
+                _count("timed_out")
+                raise Overloaded("Timed out waiting for an execution slot.",
+                                 _retry_after(lane, MAX_QUEUE))
+            time.sleep(POLL_INTERVAL)
+    except BaseException:
+        _delete(ticket_id)
+        raise
+
+    _count("admitted")
+    with _lock:
+        _started[ticket_id] = (lane, time.monotonic())
+    return ticket_id
+
+
+def _delete(ticket_id):
+    conn = _get_connection()
+    conn.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
+
+
+def release(ticket_id):
+    """Give a slot back; safe to call more than once"""
+    _delete(ticket_id)
+    with _lock:
+        started = _started.pop(ticket_id, None)
+        if started:
+            lane, at = started
+            # Exponential moving average feeds the Retry-After estimate
+            _avg_runtime[lane] = 0.8 * _avg_runtime[lane] + 0.2 * (time.monotonic() - at)
+
+
+@contextmanager
+def slot(user_key, lane=NORMAL):
+    """Hold an execution slot for the duration of the with-block"""
+    ticket_id = acquire(user_key, lane)
+    try:
+        yield ticket_id
+    finally:
+        release(ticket_id)
+
+
+def check_admission(user_key, lane=NORMAL):
+    """Raise Overloaded if a ticket for user_key would be rejected right now"""
+    conn = _get_connection()
+    waiting = conn.execute(
+        "SELECT COUNT(*) FROM tickets WHERE lane = ? AND state = 'waiting'", (lane,)
+    ).fetchone()[0]
+    if waiting >= MAX_QUEUE:
+        _count("rejected")
+        raise Overloaded("Server is busy, please retry shortly.", _retry_after(lane, waiting))
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def get_stats():
+    """Return scheduler counters for this process plus host-wide queue depth"""
+    with _lock:
+        stats = dict(_stats)
+        stats["avg_runtime"] = dict(_avg_runtime)
+    conn = _get_connection()
+    lanes = {}
+    for lane, state, count in conn.execute(
+            'SELECT lane, state, COUNT(*) FROM tickets GROUP BY lane, state'):
+        lanes.setdefault(lane, {})[state] = count
+    stats["lanes"] = lanes
+    stats["slots"] = dict(LANE_SLOTS)
+    return stats
@@ -0,0 +1,25 @@
+// Server-Sent Events over fetch(), shared by the editor and test case pages
+
+// Parse a text/event-stream response, calling onEvent(name, data) per event
+async function readEventStream(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = "message";
+            let data = "";
+            for (const line of block.split("\n")) {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            }
+            onEvent(event, data ? JSON.parse(data) : null);
+        }
+    }
+}
@@ -6,9 +6,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const clearHistoryBtn = document.getElementById('clearHistoryBtn');
 
     let history = [];
+    let nextBefore = null;
 
-    // Load history from database
-    async function loadHistory() {
+    // Load history from database; with more, append the next page
+    async function loadHistory(more) {
         try {
             const typeFilter = filterType && filterType.value !== 'all' ? filterType.value : null;
             const langFilter = filterLang && filterLang.value !== 'all' ? filterLang.value : null;
@@ -16,15 +17,21 @@ document.addEventListener('DOMContentLoaded', () => {
             let url = '/api/history?limit=50';
             if (typeFilter) url += `&type=${typeFilter}`;
             if (langFilter) url += `&language=${langFilter}`;
+            // Searched on the server, which has the whole code and not just the preview
+            const search = searchInput ? searchInput.value.trim() : '';
+            if (search) url += `&search=${encodeURIComponent(search)}`;
+            if (more === true && nextBefore) url += `&before=${encodeURIComponent(nextBefore)}`;
             
             const response = await fetch(url);
             const data = await response.json();
-            history = data.history || [];
+            const page = data.history || [];
+            nextBefore = data.nextBefore || null;
             
             // Convert created_at to timestamp for compatibility
-            history.forEach(item => {
+            page.forEach(item => {
                 item.timestamp = new Date(item.created_at).getTime();
             });
+            history = more === true ? history.concat(page) : page;
             
             renderHistory();
         } catch (error) {
@@ -48,15 +55,6 @@ document.addEventListener('DOMContentLoaded', () => {
             filtered = filtered.filter(item => item.language === filterLang.value);
         }
 
-        // Search filter
-        if (searchInput && searchInput.value.trim()) {
-            const search = searchInput.value.toLowerCase();
-            filtered = filtered.filter(item => 
-                item.title.toLowerCase().includes(search) ||
-                item.code.toLowerCase().includes(search)
-            );
-        }
-
         // Sort by timestamp (newest first)
         filtered.sort((a, b) => b.timestamp - a.timestamp);
 
@@ -94,7 +92,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         </div>
                     </div>
                     <div class="history-content">
-                        <div class="history-code">${escapeHtml(item.code)}</div>
+                        <div class="history-code">${escapeHtml(truncated(item.preview, item.code_size))}</div>
                         ${getItemDetails(item)}
                         <div class="history-actions">
                             <button class="history-btn" onclick="restoreCode('${item.id}')">
@@ -122,7 +120,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     </div>
                 </div>
             `;
-        }).join('');
+        }).join('') + (nextBefore ? '<button class="history-btn load-more" onclick="loadMoreHistory()">Load more</button>' : '');
     }
 
     function getTypeIcon(type) {
@@ -146,21 +144,31 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function getItemDetails(item) {
-        if (item.output) {
-            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Output: ${escapeHtml(item.output)}</div>`;
+        if (item.output_preview) {
+            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Output: ${escapeHtml(truncated(item.output_preview, item.output_size))}</div>`;
         }
-        if (item.issues) {
-            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Issues found: ${item.issues.length}</div>`;
+        if (item.issue_count !== null) {
+            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Issues found: ${item.issue_count}</div>`;
         }
-        if (item.variables) {
-            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Variables: ${item.variables.join(', ')}</div>`;
+        if (item.variable_names) {
+            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Variables: ${escapeHtml(item.variable_names)}</div>`;
         }
-        if (item.testResults) {
-            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Tests: ${item.testResults.passed} passed, ${item.testResults.failed} failed</div>`;
+        if (item.tests_passed !== null) {
+            return `<div style="margin-top: 8px; font-size: 12px; color: var(--text-muted);">Tests: ${item.tests_passed} passed, ${item.tests_failed} failed</div>`;
         }
         return '';
     }
 
+    // Listings carry only the start of the code and output
+    function truncated(preview, size) {
+        return size > preview.length ? preview + '…' : preview;
+    }
+
+    async function loadItem(id) {
+        const response = await fetch(`/api/history/${id}`);
+        return response.ok ? response.json() : null;
+    }
+
     function getTimeAgo(timestamp) {
         const seconds = Math.floor((Date.now() - timestamp) / 1000);
         
@@ -193,8 +201,12 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Global functions for inline handlers
-    window.restoreCode = function(id) {
-        const item = history.find(h => h.id == id);
+    window.loadMoreHistory = function() {
+        loadHistory(true);
+    };
+
+    window.restoreCode = async function(id) {
+        const item = await loadItem(id);
         if (item) {
             localStorage.setItem('restoredCode', JSON.stringify({
                 code: item.code,
@@ -204,8 +216,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
-    window.copyCode = function(id) {
-        const item = history.find(h => h.id == id);
+    window.copyCode = async function(id) {
+        const item = await loadItem(id);
         if (item) {
             navigator.clipboard.writeText(item.code).then(() => {
                 alert('Code copied to clipboard!');
@@ -231,7 +243,11 @@ document.addEventListener('DOMContentLoaded', () => {
     // Event listeners
     if (filterType) filterType.addEventListener('change', loadHistory);
     if (filterLang) filterLang.addEventListener('change', loadHistory);
-    if (searchInput) searchInput.addEventListener('input', renderHistory);
+    let searchTimer = null;
+    if (searchInput) searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(loadHistory, 300);
+    });
 
     if (clearHistoryBtn) {
         clearHistoryBtn.addEventListener('click', async () => {
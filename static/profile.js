@@ -32,13 +32,18 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
         
         // Load stats
-        const historyResponse = await fetch('/api/history?limit=1000');
-        const historyData = await historyResponse.json();
-        const history = historyData.history || [];
+        const statsResponse = await fetch('/api/user/stats');
+        const stats = await statsResponse.json();
+        const byType = stats.by_type || {};
         
-        document.getElementById('totalHistory').textContent = history.length;
-        document.getElementById('codeExecutions').textContent = history.filter(h => h.type === 'code').length;
-        document.getElementById('testsRun').textContent = history.filter(h => h.type === 'test').length;
+        document.getElementById('totalHistory').textContent = stats.total || 0;
+        document.getElementById('codeExecutions').textContent = byType.code || 0;
+        document.getElementById('testsRun').textContent = byType.test || 0;
+        const passRate = stats.tests && stats.tests.pass_rate;
+        document.getElementById('testPassRate').textContent =
+            passRate === null || passRate === undefined ? '-' : `${Math.round(passRate * 100)}%`;
+        renderActivity(stats.activity || []);
+        renderLanguages(stats.by_language || {});
         
     } catch (error) {
         console.error('Error loading profile:', error);
@@ -88,6 +93,37 @@ document.addEventListener('DOMContentLoaded', async () => {
         });
     }
     
+    // One bar per day of the last 30, days without history included
+    function renderActivity(activity) {
+        const chart = document.getElementById('activityChart');
+        if (!chart) return;
+        const counts = {};
+        activity.forEach(day => { counts[day.date] = day.count; });
+        const max = Math.max(1, ...activity.map(day => day.count));
+        const bars = [];
+        for (let i = 29; i >= 0; i--) {
+            const date = new Date(Date.now() - i * 86400000).toISOString().slice(0, 10);
+            const count = counts[date] || 0;
+            bars.push(`<div class="activity-bar${count ? '' : ' empty'}" style="height: ${count / max * 100}%" title="${date}: ${count}"></div>`);
+        }
+        chart.innerHTML = bars.join('');
+    }
+
+    function renderLanguages(byLanguage) {
+        const list = document.getElementById('languageList');
+        if (!list) return;
+        const languages = Object.entries(byLanguage).sort((a, b) => b[1] - a[1]);
+        list.innerHTML = languages.length
+            ? languages.map(([language, count]) => `<div class="language-row"><span>${escapeHtml(language)}</span><span>${count}</span></div>`).join('')
+            : '<p class="activity-empty">No history yet</p>';
+    }
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
     function showNotification(message, type = 'info') {
         const notification = document.createElement('div');
         notification.textContent = message;
@@ -228,7 +228,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
       setResult('<span style="color: #60a5fa;">⏳ Running code...</span>');
       try {
-        const res = await fetch("/run", {
+        const res = await fetch("/run/stream", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ code, language })
@@ -240,9 +240,24 @@ document.addEventListener('DOMContentLoaded', () => {
           return;
         }
 
-        const data = await res.json();
-        const output = (data && data.output) || "No output";
-        setResult(`<span style="color: #22d3ee; font-weight: 600;">Output:</span><br><span style="color: #e2e8f0;">${output}</span>`);
+        // Show output as the program produces it
+        setResult('<span style="color: #22d3ee; font-weight: 600;">Output:</span><br><span id="runOutput" style="color: #e2e8f0;"></span>');
+        const outputEl = document.getElementById('runOutput');
+        let output = "";
+        await readEventStream(res, (event, data) => {
+          let text = null;
+          if (event === "stdout" || event === "stderr") text = data.text;
+          else if (event === "error") text = data.message;
+          if (text) {
+            output += text;
+            if (outputEl) outputEl.appendChild(document.createTextNode(text));
+          }
+        });
+
+        if (!output) {
+          output = "No output";
+          if (outputEl) outputEl.textContent = output;
+        }
         
         // Save to history
         saveToHistory('code', code, language, {
@@ -327,6 +342,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let breakpoints = [];
     let isDebugging = false;
+    let debugSessionId = null;
 
     // Tab switching
     debugTabs.forEach(tab => {
@@ -375,6 +391,84 @@ document.addEventListener('DOMContentLoaded', () => {
         `).join('');
     }
 
+    // Render one snapshot value; containers carry a handle for fetching more children
+    function renderVariable(v) {
+        const size = v.length !== undefined ? `, ${v.length} items` : '';
+        const loaded = v.children ? v.children.length : 0;
+        const toggle = v.handle !== undefined
+            ? `<button class="expand-variable" data-handle="${v.handle}" data-loaded="${loaded}" data-length="${v.length}">${loaded ? '▾' : '▸'}</button>`
+            : '';
+        return `
+            <div class="variable-item">
+                ${toggle}<span class="variable-name">${v.name}</span>
+                <span class="variable-value">${v.value} <span style="color: var(--text-muted); font-size: 11px;">(${v.type}${size})</span></span>
+            </div>
+            <div class="variable-children"${loaded ? '' : ' style="display: none;"'}>${(v.children || []).map(renderVariable).join('')}${loaded && loaded < v.length ? moreButton(v.handle, loaded) : ''}</div>
+        `;
+    }
+
+    function moreButton(handle, start) {
+        return `<button class="more-children" data-handle="${handle}" data-start="${start}">Show more…</button>`;
+    }
+
+    // Fetch a page of a value's children from the live debug session
+    async function fetchChildren(handle, start) {
+        if (!debugSessionId) {
+            addConsoleMessage('Debug session has ended, run the debugger again to expand values', 'info');
+            return null;
+        }
+        const res = await fetch(`/debug/sessions/${debugSessionId}/expand`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ handle, start })
+        });
+        const page = await res.json();
+        if (!res.ok) {
+            addConsoleMessage(`❌ ${page.error}`, 'error');
+            if (res.status === 404) debugSessionId = null;
+            return null;
+        }
+        return page;
+    }
+
+    const variablesPanelList = document.getElementById('variablesList');
+    if (variablesPanelList) {
+        variablesPanelList.addEventListener('click', async (e) => {
+            const button = e.target.closest('.expand-variable, .more-children');
+            if (!button) return;
+            const handle = parseInt(button.dataset.handle);
+
+            if (button.classList.contains('more-children')) {
+                const page = await fetchChildren(handle, parseInt(button.dataset.start));
+                if (!page) return;
+                const next = page.start + page.children.length;
+                button.insertAdjacentHTML('beforebegin', page.children.map(renderVariable).join(''));
+                if (next < page.length) {
+                    button.dataset.start = next;
+                } else {
+                    button.remove();
+                }
+                return;
+            }
+
+            const children = button.parentElement.nextElementSibling;
+            if (children.style.display !== 'none') {
+                children.style.display = 'none';
+                button.textContent = '▸';
+                return;
+            }
+            if (button.dataset.loaded === '0') {
+                const page = await fetchChildren(handle, 0);
+                if (!page) return;
+                children.innerHTML = page.children.map(renderVariable).join('') +
+                    (page.children.length < page.length ? moreButton(handle, page.children.length) : '');
+                button.dataset.loaded = page.children.length;
+            }
+            children.style.display = '';
+            button.textContent = '▾';
+        });
+    }
+
     // Remove breakpoint (global function for onclick)
     window.removeBreakpoint = function(line) {
         breakpoints = breakpoints.filter(bp => bp !== line);
@@ -429,6 +523,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 const debugData = await res.json();
                 console.log('Debug data:', debugData);
+                endDebugSession();
+                debugSessionId = debugData.sessionId || null;
 
                 // Display errors if any
                 if (debugData.errors && debugData.errors.length > 0) {
@@ -443,6 +539,16 @@ document.addEventListener('DOMContentLoaded', () => {
                     addConsoleMessage(debugData.output, 'success');
                 }
 
+                // Report where breakpoints were hit (the panels show the first hit)
+                if (debugData.snapshots && debugData.snapshots.length > 0) {
+                    debugData.snapshots.forEach(snap => {
+                        addConsoleMessage(`⏸ Line ${snap.line} (hit ${snap.hit}) in ${snap.function}`, 'info');
+                    });
+                    if (debugData.truncated) {
+                        addConsoleMessage('Snapshot limit reached, later hits were only counted', 'info');
+                    }
+                }
+
                 // Show variables
                 const variablesList = document.getElementById('variablesList');
                 const debugInfo = document.querySelector('#variables-panel .debug-info');
@@ -451,12 +557,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 
                 if (variablesList) {
                     if (debugData.variables && debugData.variables.length > 0) {
-                        variablesList.innerHTML = debugData.variables.map(v => `
-                            <div class="variable-item">
-                                <span class="variable-name">${v.name}</span>
-                                <span class="variable-value">${v.value} <span style="color: var(--text-muted); font-size: 11px;">(${v.type})</span></span>
-                            </div>
-                        `).join('');
+                        variablesList.innerHTML = debugData.variables.map(renderVariable).join('');
                         addConsoleMessage(`✓ Found ${debugData.variables.length} variable(s)`, 'success');
                     } else {
                         variablesList.innerHTML = '<div class="empty-state">No variables found</div>';
@@ -490,6 +591,14 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Let the server stop the process that keeps snapshot values expandable
+    function endDebugSession() {
+        if (debugSessionId) {
+            fetch(`/debug/sessions/${debugSessionId}`, { method: "DELETE" }).catch(() => {});
+            debugSessionId = null;
+        }
+    }
+
     // Helper function to stop debugging
     function stopDebugging() {
         isDebugging = false;
@@ -511,6 +620,7 @@ document.addEventListener('DOMContentLoaded', () => {
     if (stopDebugBtn) {
         stopDebugBtn.addEventListener('click', () => {
             stopDebugging();
+            endDebugSession();
             addConsoleMessage('🛑 Debugging session stopped', 'info');
 
             // Reset panels
@@ -159,18 +159,20 @@ document.addEventListener('DOMContentLoaded', () => {
             `;
 
             try {
-                const res = await fetch("/run-tests", {
+                const cases = testCases.map(t => ({
+                    name: t.name,
+                    input: t.input,
+                    expected: t.expected
+                }));
+                // Run the stored copy of the suite when it can be saved, so unchanged
+                // cases aren't uploaded again on every run
+                const suiteId = await saveSuite(language, cases);
+                const res = await fetch("/run-tests/stream", {
                     method: "POST",
                     headers: { "Content-Type": "application/json" },
-                    body: JSON.stringify({ 
-                        code, 
-                        language,
-                        testCases: testCases.map(t => ({
-                            name: t.name,
-                            input: t.input,
-                            expected: t.expected
-                        }))
-                    })
+                    body: JSON.stringify(suiteId
+                        ? { code, language, suiteId }
+                        : { code, language, testCases: cases })
                 });
 
                 if (!res.ok) {
@@ -179,14 +181,28 @@ document.addEventListener('DOMContentLoaded', () => {
                     return;
                 }
 
-                const data = await res.json();
-                
-                if (data.error) {
-                    showNotification(`Error: ${data.error}`, 'error');
+                // Results arrive in completion order; keep them in test case order
+                const results = [];
+                let error = null;
+                let summary = null;
+                await readEventStream(res, (event, data) => {
+                    if (event === "result") {
+                        results[data.index] = data;
+                        displayResults(results.filter(Boolean));
+                    } else if (event === "summary") {
+                        summary = data;
+                        displayResults(results.filter(Boolean), data);
+                    } else if (event === "error") {
+                        error = data.message;
+                    }
+                });
+
+                if (error) {
+                    showNotification(`Error: ${error}`, 'error');
                     return;
                 }
 
-                displayResults(data.results);
+                if (summary) saveToHistory(code, language, summary);
                 showNotification('Tests completed!', 'success');
                 
             } catch (err) {
@@ -205,17 +221,79 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    function displayResults(results) {
+    // Record the run's counts; the profile page's pass rate is computed from them
+    async function saveToHistory(code, language, summary) {
+        try {
+            await fetch('/api/history', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    type: 'test',
+                    language: language,
+                    title: `Tests - ${new Date().toLocaleString()}`,
+                    code: code,
+                    test_results: {
+                        total: summary.total,
+                        passed: summary.passed,
+                        failed: summary.failed,
+                        skipped: summary.skipped
+                    }
+                })
+            });
+        } catch (error) {
+            console.error('Error saving history:', error);
+        }
+    }
+
+    // Store the test cases server-side, returning the suite ID (null if saving failed)
+    let savedSignature = null;
+    async function saveSuite(language, cases) {
+        const signature = JSON.stringify({ language, cases });
+        let suiteId = Number(localStorage.getItem('testSuiteId')) || null;
+        if (suiteId && signature === savedSignature) {
+            return suiteId;
+        }
+        try {
+            const body = JSON.stringify({ name: 'Test cases', language, testCases: cases });
+            let res = suiteId ? await fetch(`/api/suites/${suiteId}`, {
+                method: "PUT",
+                headers: { "Content-Type": "application/json" },
+                body
+            }) : null;
+            if (!res || res.status === 404) {
+                res = await fetch("/api/suites", {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body
+                });
+            }
+            if (!res.ok) {
+                return null;
+            }
+            suiteId = (await res.json()).id;
+            localStorage.setItem('testSuiteId', suiteId);
+            savedSignature = signature;
+            return suiteId;
+        } catch (err) {
+            console.error("Suite save error:", err);
+            return null;
+        }
+    }
+
+    function displayResults(results, summary = null) {
         if (!testResults || !resultsSummary) return;
 
         const passed = results.filter(r => r.passed).length;
-        const failed = results.length - passed;
+        const skipped = results.filter(r => r.skipped).length;
+        const failed = results.length - passed - skipped;
 
         // Update summary
         resultsSummary.innerHTML = `
             <span class="summary-item">Total: <strong>${results.length}</strong></span>
             <span class="summary-item passed">Passed: <strong>${passed}</strong></span>
             <span class="summary-item failed">Failed: <strong>${failed}</strong></span>
+            ${skipped ? `<span class="summary-item">Skipped: <strong>${skipped}</strong></span>` : ''}
+            ${summary ? `<span class="summary-item">Time: <strong>${summary.wall_time.toFixed(2)}s</strong></span>` : ''}
         `;
 
         // Display results
@@ -224,7 +302,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="result-header">
                     <div class="result-name">${result.name}</div>
                     <div class="result-status ${result.passed ? 'passed' : 'failed'}">
-                        ${result.passed ? '✓ Passed' : '✗ Failed'}
+                        ${result.passed ? '✓ Passed' : result.skipped ? '– Skipped' : '✗ Failed'}
                     </div>
                 </div>
                 <div class="result-details">
@@ -236,6 +314,12 @@ document.addEventListener('DOMContentLoaded', () => {
                         <span class="result-label">Actual:</span>
                         <span class="result-value">${result.actual || '(empty)'}</span>
                     </div>
+                    ${result.diff ? `
+                        <div class="result-row">
+                            <span class="result-label">First difference:</span>
+                            <span class="result-value">${result.diff.line ? `line ${result.diff.line}` : `character ${result.diff.offset + 1}`}</span>
+                        </div>
+                    ` : ''}
                     ${result.error ? `
                         <div class="result-error">
                             <strong>Error:</strong> ${result.error}
@@ -0,0 +1,614 @@
+"""
+Compile-once, run-many execution of test suites.
+
+A suite's program is prepared a single time: C++ and Java are built through
+the compile cache, Python and JavaScript go to the worker pool as source.
+Every test case then runs as its own process with the case's input on
+stdin (streamed from disk for cases with an input_file), and cases run in
+parallel, so a suite takes roughly as long as its slowest case rather than
+the sum of all of them.
+"""
+import json
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import comparator
+import compile_cache
+import process_io
+import sandbox
+import worker_pool
+
+# Cases of one suite running at once (each is a separate process)
+TEST_PARALLELISM = int(os.environ.get('TEST_PARALLELISM', min(os.cpu_count() or 4, 8)))
+NODE_HARNESS_ENABLED = os.environ.get('NODE_TEST_HARNESS', '1') != '0'
+
+# "ValueError: ...", "Error: ...", "Exception in thread "main" java.lang...";
+# indented lines are stack frames or source excerpts
+ERROR_LINE = re.compile(r'^[\w.$]*(?:Error|Exception)\b')
+
+# Runs a batch of JavaScript test cases in one Node process. Reads
+# {"code", "inputs", "timeout_ms", "output_limit"} as JSON on stdin (an input is a
+# string or {"file": path}), runs the code once per input in a fresh vm context with its own console, stdin and timers,
+# and a process object with its own events and exit code, and prints one {"stdout", "stderr", "error", "time_ms", "truncated"} JSON line
+# per case.
+NODE_HARNESS = r"""
+const fs = require('fs');
+const path = require('path');
+const util = require('util');
+const vm = require('vm');
+const EventEmitter = require('events');
+const Module = require('module');
+const { Readable } = require('stream');
+
+const suite = JSON.parse(fs.readFileSync(0, 'utf8'));
+const filename = path.resolve('main.js');
+const realRequire = Module.createRequire(filename);
+const script = new vm.Script(
+    '(function (exports, require, module, __filename, __dirname) {' + suite.code + '\n})',
+    { filename }
+);
+const invoke = new vm.Script('__callback(...__args)');
+
+class Capture {
+    constructor(limit) {
+        this.limit = limit;
+        this.head = '';
+        this.tail = '';
+        this.omitted = 0;
+    }
+    write(text) {
+        const room = this.limit / 2 - this.head.length;
+        if (room > 0) {
+            this.head += text.slice(0, room);
+            text = text.slice(room);
+        }
+        this.tail += text;
+        if (this.tail.length > this.limit / 2) {
+            this.omitted += this.tail.length - this.limit / 2;
+            this.tail = this.tail.slice(this.tail.length - this.limit / 2);
+        }
+    }
+    text() {
+        if (!this.omitted) return this.head + this.tail;
+        return this.head + '\n... [' + this.omitted + ' characters omitted] ...\n' + this.tail;
+    }
+}
+
+class Exit {
+    constructor(code) {
+        this.code = code;
+    }
+}
+
+const IDLE_TURNS = 3;
+const EMITTER_METHODS = [
+    'on', 'addListener', 'once', 'prependListener', 'prependOnceListener', 'off', 'removeListener',
+    'removeAllListeners', 'emit', 'listeners', 'listenerCount', 'eventNames',
+];
+let current = null;
+
+function describe(error) {
+    if (error instanceof Exit) return error.code ? 'Exited with code ' + error.code : null;
+    if (error && error.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') return 'Timed out (' + suite.timeout_ms / 1000 + 's limit).';
+    if (error && typeof error === 'object' && 'message' in error) return (error.name || 'Error') + ': ' + error.message;
+    return 'Uncaught ' + util.inspect(error);
+}
+
+function fail(state, error) {
+    if (state.done) return;
+    const message = describe(error);
+    if (message && !state.error) state.error = message;
+    if (error instanceof Exit) state.process.exitCode = error.code;
+    else if (message && !state.process.exitCode) state.process.exitCode = 1;
+    finish(state);
+}
+
+// Like a real process: 'exit' listeners run last and may still write output
+function finish(state) {
+    if (state.done || state.exiting) return;
+    state.exiting = true;
+    state.emit('exit', state.process.exitCode || 0);
+    state.done = true;
+    for (const [timer, clear] of state.timers) clear(timer);
+    state.timers.clear();
+    const code = state.process.exitCode;
+    if (code && !state.error) state.error = 'Exited with code ' + code;
+    state.resolve();
+}
+
+process.on('uncaughtException', (error) => current && fail(current, error));
+process.on('unhandledRejection', (error) => current && fail(current, error));
+
+function sandbox(state, input) {
+    const write = (capture) => (chunk) => {
+        capture.write(typeof chunk === 'string' ? chunk : Buffer.from(chunk).toString());
+        return true;
+    };
+    const log = (capture) => (...args) => capture.write(util.format(...args) + '\n');
+    const console = {
+        log: log(state.stdout), info: log(state.stdout), debug: log(state.stdout),
+        error: log(state.stderr), warn: log(state.stderr), trace: log(state.stderr),
+        dir: (value) => state.stdout.write(util.inspect(value) + '\n'),
+        table: log(state.stdout),
+    };
+    const stdin = Readable.from([input]);
+    // Listeners go on the case's own emitter, not the shared process
+    const events = new EventEmitter();
+    const forward = (name) => ({
+        value: (...args) => {
+            const result = events[name](...args);
+            return result === events ? fakeProcess : result;
+        },
+    });
+    const fakeProcess = Object.create(process, {
+        stdin: { value: stdin },
+        stdout: { value: { write: write(state.stdout), isTTY: false } },
+        stderr: { value: { write: write(state.stderr), isTTY: false } },
+        argv: { value: [process.argv[0], filename] },
+        exitCode: { value: undefined, writable: true },
+        exit: {
+            value: (code) => { throw new Exit(code === undefined ? fakeProcess.exitCode || 0 : code); }
+        },
+        ...Object.fromEntries(EMITTER_METHODS.map((name) => [name, forward(name)])),
+    });
+    state.process = fakeProcess;
+    const fakeFs = Object.create(fs, {
+        readFileSync: {
+            value: (file, options) => {
+                if (file === 0 || file === '/dev/stdin') {
+                    const encoding = typeof options === 'string' ? options : options && options.encoding;
+                    return encoding ? input : Buffer.from(input);
+                }
+                return fs.readFileSync(file, options);
+            }
+        },
+    });
+    const require = (id) => {
+        if (id === 'fs' || id === 'node:fs') return fakeFs;
+        if (id === 'process' || id === 'node:process') return fakeProcess;
+        return realRequire(id);
+    };
+    require.resolve = realRequire.resolve;
+
+    // Timer callbacks run through the context too, so the per-case timeout covers them
+    const context = vm.createContext({}, { microtaskMode: 'afterEvaluate' });
+    const guard = (callback, args) => {
+        if (state.done) return;
+        context.__callback = callback;
+        context.__args = args;
+        try {
+            invoke.runInContext(context, { timeout: Math.max(state.deadline - Date.now(), 1) });
+        } catch (error) {
+            fail(state, error);
+        }
+    };
+    state.emit = (name, ...args) => {
+        for (const listener of events.rawListeners(name)) {
+            if (state.done || (state.exiting && name !== 'exit')) return;
+            guard(listener, args);
+        }
+    };
+    const later = (start, clear, repeat) => (callback, ...args) => {
+        const handle = start(() => {
+            if (!repeat) state.timers.delete(handle);
+            guard(callback, args);
+        });
+        state.timers.set(handle, clear);
+        return handle;
+    };
+    const cancel = (clear) => (handle) => {
+        state.timers.delete(handle);
+        clear(handle);
+    };
+    Object.assign(context, {
+        console, process: fakeProcess, Buffer, URL, URLSearchParams, TextEncoder, TextDecoder,
+        queueMicrotask, structuredClone,
+        setTimeout: (callback, ms, ...args) =>
+            later((fire) => setTimeout(fire, ms), clearTimeout, false)(callback, ...args),
+        setInterval: (callback, ms, ...args) =>
+            later((fire) => setInterval(fire, ms), clearInterval, true)(callback, ...args),
+        setImmediate: later(setImmediate, clearImmediate, false),
+        clearTimeout: cancel(clearTimeout),
+        clearInterval: cancel(clearInterval),
+        clearImmediate: cancel(clearImmediate),
+    });
+    context.global = context.globalThis = context;
+    return { context, require, stdin };
+}
+
+const tick = () => new Promise((resolve) => setImmediate(resolve));
+
+async function runCase(input) {
+    if (typeof input === 'object') input = fs.readFileSync(input.file, 'utf8');
+    const started = Date.now();
+    const state = {
+        stdout: new Capture(suite.output_limit),
+        stderr: new Capture(suite.output_limit),
+        timers: new Map(),
+        error: null,
+        done: false,
+        exiting: false,
+        deadline: started + suite.timeout_ms,
+    };
+    const finished = new Promise((resolve) => { state.resolve = resolve; });
+    current = state;
+
+    const { context, require, stdin } = sandbox(state, input);
+    const module = { exports: {} };
+    try {
+        const main = script.runInContext(context);
+        context.__callback = main;
+        context.__args = [module.exports, require, module, filename, path.dirname(filename)];
+        invoke.runInContext(context, { timeout: suite.timeout_ms });
+    } catch (error) {
+        fail(state, error);
+    }
+
+    // The case is over once it has been idle (no timers, stdin drained if read) for a few
+    // turns of the event loop. The context has its own microtask queue, and running a script
+    // in it flushes that queue under the timeout.
+    const drain = new vm.Script('');
+    let idle = 0;
+    while (!state.done) {
+        await tick();
+        try {
+            drain.runInContext(context, { timeout: Math.max(state.deadline - Date.now(), 1) });
+        } catch (error) {
+            fail(state, error);
+        }
+        if (state.done) break;
+        const reading = stdin.listenerCount('data') + stdin.listenerCount('readable') > 0;
+        idle = state.timers.size === 0 && (!reading || stdin.readableEnded) ? idle + 1 : 0;
+        if (idle >= IDLE_TURNS) {
+            // 'beforeExit' listeners may schedule more work, which keeps the case going
+            state.emit('beforeExit', state.process.exitCode || 0);
+            if (state.timers.size === 0) finish(state);
+            else idle = 0;
+        } else if (Date.now() >= state.deadline) {
+            fail(state, { code: 'ERR_SCRIPT_EXECUTION_TIMEOUT' });
+        }
+    }
+    await finished;
+    current = null;
+    return {
+        stdout: state.stdout.text(),
+        truncated: state.stdout.omitted > 0,
+        stderr: state.stderr.text(),
+        error: state.error,
+        time_ms: Date.now() - started,
+    };
+}
+
+(async () => {
+    for (const input of suite.inputs) {
+        process.stdout.write(JSON.stringify(await runCase(input)) + '\n');
+    }
+})();
+"""
+
+
+def prepare(lang, code):
+    """Get a program ready to be started once per case; ok is False if it didn't compile"""
+    if lang in worker_pool.POOLED_LANGUAGES:
+        return {"ok": True, "lang": lang, "code": code, "cmd": None, "compile_time": 0.0}
+    build = compile_cache.get_or_compile(lang, code)
+    return dict(build, lang=lang, code=code)
+
+
+def start(program, limits):
+    """Start one run of a prepared program with piped stdio"""
+    if program["cmd"] is None:
+        return worker_pool.spawn(program["lang"], program["code"], limits=limits)
+    return subprocess.Popen(program["cmd"], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            preexec_fn=lambda: sandbox.apply_limits(limits))
+
+
+def _error_message(returncode, stderr, limits):
+    message = sandbox.describe_exit(returncode, limits)
+    if message:
+        return message
+    lines = stderr.strip().splitlines()
+    for line in lines:
+        if ERROR_LINE.match(line):
+            return line
+    # Node ends every uncaught error with a "Node.js v20.x" footer
+    lines = [line for line in lines if line.strip() and not line.startswith("Node.js v")]
+    return lines[-1] if lines else f"Exited with code {returncode}"
+
+
+def _new_result(index, test):
+    return {
+        "index": index,
+        "name": test.get("name", f"Test {index + 1}"),
+        "passed": False,
+        "actual": "",
+        "expected": comparator.preview(test.get("expected", "").strip()),
+        "error": None
+    }
+
+
+def _judge(result, test, chunks, compare):
+    """Compare the output chunks with the case's expected output and record the verdict"""
+    if result["error"] is None:
+        diff = comparator.compare(test.get("expected", ""), chunks, **(compare or {}))
+        if diff:
+            result["diff"] = diff
+        result["passed"] = diff is None
+    return result
+
+
+def _skipped_result(index, test, reason):
+    result = _new_result(index, test)
+    result["skipped"] = True
+    result["error"] = f"Skipped: {reason}"
+    return result
+
+
+def _kill_quietly(proc):
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+class _Running:
+    """Processes started for one suite, so they can all be killed when it stops early"""
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self._procs = set()
+        self._lock = threading.Lock()
+
+    def add(self, proc):
+        with self._lock:
+            self._procs.add(proc)
+            stopped = self.stopped.is_set()
+        if stopped:
+            _kill_quietly(proc)
+
+    def discard(self, proc):
+        with self._lock:
+            self._procs.discard(proc)
+
+    def stop(self):
+        """Kill every running process; each one is still reaped by the thread that started it"""
+        with self._lock:
+            self.stopped.set()
+            procs = list(self._procs)
+        for proc in procs:
+            _kill_quietly(proc)
+
+
+def run_case(program, index, test, limits, running=None, compare=None):
+    """Run a single test case and return its result"""
+    result = _new_result(index, test)
+    if test.get("input_file"):
+        try:
+            input_data = open(test["input_file"], 'rb')
+        except OSError:
+            result["error"] = "Test input file is missing."
+            return result
+    else:
+        input_data = (test.get("input") or "").encode('utf-8')
+
+    proc = None
+    started = time.monotonic()
+    try:
+        proc = start(program, limits)
+        if running is not None:
+            running.add(proc)
+        stdout, stderr = process_io.collect(proc, input_data,
+                                            timeout=limits["wall"], spill=True)
+        sandbox.wait(proc, max(limits["wall"] - (time.monotonic() - started), 0))
+    except subprocess.TimeoutExpired:
+        sandbox.kill(proc)
+        result["error"] = f"Timed out ({limits['wall']}s limit)."
+        result["usage"] = sandbox.usage(proc, time.monotonic() - started)
+        return result
+    except FileNotFoundError:
+        result["error"] = f"{program['lang']} runtime not installed"
+        return result
+    except Exception as e:
+        if proc is not None:
+            sandbox.kill(proc)
+        result["error"] = str(e)
+        return result
+    finally:
+        if running is not None and proc is not None:
+            running.discard(proc)
+
+    try:
+        result["actual"] = comparator.preview(stdout.text().strip())
+        if proc.returncode != 0:
+            result["error"] = _error_message(proc.returncode, stderr.text(), limits)
+        elif not stdout.complete:
+            result["error"] = f"Output exceeded {process_io.SPILL_LIMIT // (1024 * 1024)} MB."
+        _judge(result, test, stdout.iter_full(), compare)
+    finally:
+        stdout.close()
+        stderr.close()
+    result["usage"] = sandbox.usage(proc, time.monotonic() - started)
+    return result
+
+
+def iter_harness_batch(program, batch, limits, running=None, compare=None):
+    """
+    Run (index, test) pairs of a JavaScript suite in one Node process,
+    yielding each result as the harness reports it.
+
+    If the harness itself fails, e.g. because a case exhausted the process's
+    memory, the cases it didn't get to are run one process each instead.
+    """
+    payload = json.dumps({
+        "code": program["code"],
+        "inputs": [{"file": test["input_file"]} if test.get("input_file") else test.get("input") or ""
+                   for _, test in batch],
+        "timeout_ms": limits["wall"] * 1000,
+        "output_limit": process_io.OUTPUT_LIMIT,
+    }).encode('utf-8')
+    # Per-case timeouts are enforced inside the harness; these are a backstop for the batch
+    budget = limits["wall"] * len(batch) + 5
+    batch_limits = dict(limits, wall=budget, cpu=budget)
+    # A result line holds at most two output previews (JSON-escaped) plus a little metadata
+    max_line = 16 * process_io.OUTPUT_LIMIT
+
+    pending = list(batch)
+    proc = None
+    try:
+        proc = worker_pool.spawn("javascript", NODE_HARNESS, filename="harness.js", limits=batch_limits)
+        if running is not None:
+            running.add(proc)
+        process_io.send_input(proc, payload)
+        buffer = b""
+        for name, data in process_io.iter_output(proc, timeout=budget):
+            if name != "stdout":
+                continue
+            buffer += data
+            while b"\n" in buffer and pending:
+                line, buffer = buffer.split(b"\n", 1)
+                index, test = pending.pop(0)
+                outcome = json.loads(line)
+                if outcome["truncated"]:
+                    # The harness only keeps a preview; rerun to compare the whole output
+                    yield run_case(program, index, test, limits, running, compare)
+                else:
+                    yield _harness_result(index, test, outcome, compare)
+            if len(buffer) > max_line:
+                break
+    except (subprocess.TimeoutExpired, OSError, ValueError, KeyError):
+        pass
+    finally:
+        # Also reached when the consumer stops early
+        if proc is not None:
+            sandbox.kill(proc)
+            if running is not None:
+                running.discard(proc)
+
+    for index, test in pending:
+        if running is not None and running.stopped.is_set():
+            return
+        yield run_case(program, index, test, limits, running, compare)
+
+
+def _harness_result(index, test, outcome, compare):
+    result = _new_result(index, test)
+    result["actual"] = comparator.preview(outcome["stdout"].strip())
+    result["error"] = outcome["error"]
+    result["usage"] = {"wall_time": round(outcome["time_ms"] / 1000, 4)}
+    return _judge(result, test, [outcome["stdout"]], compare)
+
+
+def iter_results(program, test_cases, limits, max_failures=None, budget=None, compare=None):
+    """
+    Run every case of a prepared program in parallel, yielding results as
+    they complete (each carries the case's index). compare holds the
+    comparator.compare() options (mode, tolerance).
+
+    Once max_failures cases have failed, or budget seconds have passed, the
+    running cases are killed and every case not reported yet is yielded as
+    skipped. Closing the generator early stops the remaining cases too.
+    """
+    cases = list(enumerate(test_cases))
+    if not cases:
+        return
+    workers = max(1, min(TEST_PARALLELISM, len(cases)))
+    harness = program["lang"] == "javascript" and NODE_HARNESS_ENABLED
+    if harness:
+        # One harness process per worker, each taking a contiguous slice of the cases
+        size = -(-len(cases) // workers)
+        units = [cases[i:i + size] for i in range(0, len(cases), size)]
+    else:
+        units = [[case] for case in cases]
+
+    finished = queue.Queue()
+    running = _Running()
+
+    def work(unit):
+        try:
+            if running.stopped.is_set():
+                return
+            if harness:
+                results = iter_harness_batch(program, unit, limits, running, compare)
+            else:
+                results = (run_case(program, index, test, limits, running, compare)
+                           for index, test in unit)
+            for result in results:
+                finished.put(result)
+                if running.stopped.is_set():
+                    results.close()
+                    return
+        finally:
+            finished.put(None)
+
+    deadline = None if budget is None else time.monotonic() + budget
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='suite')
+    try:
+        for unit in units:
+            executor.submit(work, unit)
+        remaining = len(units)
+        reported = set()
+        failures = 0
+        reason = None
+        while remaining:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    reason = f"suite time budget of {budget}s exceeded."
+                    break
+            try:
+                result = finished.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if result is None:
+                remaining -= 1
+                continue
+            reported.add(result["index"])
+            yield result
+            if not result["passed"]:
+                failures += 1
+                if max_failures and failures >= max_failures:
+                    reason = f"stopped after {failures} failed case{'s' if failures != 1 else ''}."
+                    break
+
+        if reason:
+            running.stop()
+            for index, test in cases:
+                if index not in reported:
+                    yield _skipped_result(index, test, reason)
+    finally:
+        running.stop()
+        executor.shutdown(wait=False)
+
+
+def summarize(results, program, started):
+    """Pass/fail counts and timings for a finished suite"""
+    passed = sum(1 for result in results if result["passed"])
+    skipped = sum(1 for result in results if result.get("skipped"))
+    return {
+        "total": len(results),
+        "passed": passed,
+        "failed": len(results) - passed - skipped,
+        "skipped": skipped,
+        "compile_time": round(program["compile_time"], 4),
+        "wall_time": round(time.monotonic() - started, 4)
+    }
+
+
+def run_suite(lang, code, test_cases, limits=None, max_failures=None, budget=None, compare=None):
+    """Prepare code once, run every case in parallel and return the /run-tests response"""
+    limits = limits or sandbox.limits_for()
+    program = prepare(lang, code)
+    if not program["ok"]:
+        return {"error": program["output"]}
+
+    started = time.monotonic()
+    results = sorted(iter_results(program, test_cases, limits, max_failures, budget, compare),
+                     key=lambda result: result["index"])
+    return dict(summarize(results, program, started), results=results)
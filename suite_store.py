@@ -0,0 +1,186 @@
+"""
+Stored test suites.
+
+Suites are kept in the test_suites and test_cases tables so the test page
+can run one by ID instead of uploading every case on each run. Inputs over
+SUITE_INLINE_INPUT_KB are written under SUITE_DATA_DIR, named after their
+SHA-256, and streamed to the program's stdin from there.
+
+Each worker process caches the suites it has loaded, ready to hand to
+suite_runner. Every lookup checks the suite's version in the database
+(a single-row query) and reloads it only when it has changed.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import database
+
+SUITE_DATA_DIR = os.environ.get(
+    'SUITE_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(database.DATABASE_PATH)), 'suite_data')
+)
+INLINE_INPUT_LIMIT = int(os.environ.get('SUITE_INLINE_INPUT_KB', 64)) * 1024
+CACHE_MAX_BYTES = int(os.environ.get('SUITE_CACHE_MAX_MB', 64)) * 1024 * 1024
+
+_cache = OrderedDict()  # suite ID -> (version, size, suite)
+_cache_bytes = 0
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def input_path(input_file):
+    """Where a stored input lives on disk"""
+    return os.path.join(SUITE_DATA_DIR, input_file[:2], input_file)
+
+
+def _store_input(data):
+    """Write a large input under its content address and return that address"""
+    encoded = data.encode('utf-8')
+    input_file = hashlib.sha256(encoded).hexdigest()
+    path = input_path(input_file)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp, path)
+    return input_file
+
+
+def _remove_unused_inputs(input_files):
+    for input_file in set(input_files):
+        if not database.is_test_input_file_used(input_file):
+            try:
+                os.remove(input_path(input_file))
+            except FileNotFoundError:
+                pass
+
+
+def _clean_cases(cases):
+    """Validate test cases from a request and move large inputs to disk"""
+    if not isinstance(cases, list):
+        raise ValueError("testCases must be a list.")
+    cleaned = []
+    for case in cases:
+        if not isinstance(case, dict):
+            raise ValueError("Each test case must be an object.")
+        fields = {key: case.get(key) for key in ("name", "input", "expected")}
+        if any(value is not None and not isinstance(value, str) for value in fields.values()):
+            raise ValueError("Test case name, input and expected must be strings.")
+        if fields["input"] and len(fields["input"]) > INLINE_INPUT_LIMIT:
+            fields["input_file"] = _store_input(fields.pop("input"))
+        cleaned.append(fields)
+    return cleaned
+
+
+def save(user_id, name, language, cases, suite_id=None):
+    """
+    Create a suite, or replace an existing one when suite_id is given.
+
+    Returns {id, version}, or None if suite_id isn't one of the user's suites.
+    Raises ValueError for malformed cases.
+    """
+    cleaned = _clean_cases(cases)
+    if suite_id is None:
+        return {"id": database.create_test_suite(user_id, name, language, cleaned), "version": 1}
+
+    previous = database.get_test_suite(suite_id, user_id)
+    if previous is None:
+        return None
+    version = database.update_test_suite(suite_id, user_id, name, language, cleaned)
+    if version is None:
+        return None
+    _remove_unused_inputs(case["input_file"] for case in previous["cases"] if case["input_file"])
+    return {"id": suite_id, "version": version}
+
+
+def _runnable(row):
+    """Turn a database suite into the form suite_runner takes"""
+    cases = []
+    for position, stored in enumerate(row["cases"]):
+        case = {"name": stored["name"] or f"Test {position + 1}", "expected": stored["expected"] or ""}
+        if stored["input_file"]:
+            case["input_file"] = input_path(stored["input_file"])
+        else:
+            case["input"] = stored["input"] or ""
+        cases.append(case)
+    suite = {key: row[key] for key in ("id", "name", "language", "version", "created_at", "updated_at")}
+    suite["cases"] = cases
+    return suite
+
+
+def _size(suite):
+    return sum(len(case.get("input", "")) + len(case["expected"]) + len(case["name"])
+               for case in suite["cases"])
+
+
+def _cache_put(suite):
+    global _cache_bytes
+    size = _size(suite)
+    with _lock:
+        if suite["id"] in _cache:
+            _cache_bytes -= _cache.pop(suite["id"])[1]
+        if size > CACHE_MAX_BYTES:
+            return
+        _cache[suite["id"]] = (suite["version"], size, suite)
+        _cache_bytes += size
+        while _cache_bytes > CACHE_MAX_BYTES:
+            _, (_, evicted, _) = _cache.popitem(last=False)
+            _cache_bytes -= evicted
+
+
+def _cache_drop(suite_id):
+    global _cache_bytes
+    with _lock:
+        if suite_id in _cache:
+            _cache_bytes -= _cache.pop(suite_id)[1]
+
+
+def get(suite_id, user_id):
+    """
+    Get one of the user's suites with its cases ready for suite_runner, or None.
+
+    The returned suite is shared with other requests and must not be modified.
+    """
+    version = database.get_test_suite_version(suite_id, user_id)
+    if version is None:
+        _cache_drop(suite_id)
+        return None
+    with _lock:
+        entry = _cache.get(suite_id)
+        if entry is not None and entry[0] == version:
+            _cache.move_to_end(suite_id)
+            _stats["hits"] += 1
+            return entry[2]
+        _stats["misses"] += 1
+
+    row = database.get_test_suite(suite_id, user_id)
+    if row is None:
+        return None
+    suite = _runnable(row)
+    _cache_put(suite)
+    return suite
+
+
+def list_suites(user_id):
+    """Summaries of the user's suites, most recently changed first"""
+    return database.get_test_suites(user_id)
+
+
+def delete(suite_id, user_id):
+    """Delete one of the user's suites along with inputs no other suite uses"""
+    previous = database.get_test_suite(suite_id, user_id)
+    if previous is None or not database.delete_test_suite(suite_id, user_id):
+        return False
+    _cache_drop(suite_id)
+    _remove_unused_inputs(case["input_file"] for case in previous["cases"] if case["input_file"])
+    return True
+
+
+def get_stats():
+    """Cache counters for this worker process"""
+    with _lock:
+        return dict(_stats, entries=len(_cache), bytes=_cache_bytes)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+from collections import OrderedDict
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analyze_batch
+import analyze_cache
+
+def test_analyze_batch(monkeypatch):
+    """Test batch analysis across the process pool"""
+    print("Testing analyze batch...")
+    # Batch results land in the analyze cache; use a private one for this test
+    monkeypatch.setattr(analyze_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(analyze_cache, "_stats", dict.fromkeys(analyze_cache._stats, 0))
+    monkeypatch.setattr(analyze_cache, "SHARED", False)
+    files = [
+        {"filename": "a.js", "language": "javascript", "code": "var a = 1;"},
+        {"filename": "b.py", "language": "python", "code": "import os\n"},
+        {"filename": "c.rb", "language": "ruby", "code": "puts 1"},
+        {"filename": "big.js", "language": "javascript", "code": "let a = b == c;\n" * 300000},
+    ]
+    assert analyze_batch.validate(files) is None
+    assert analyze_batch.validate(files + files[:1]) == "Duplicate filename: a.js"
+
+    print("1. Every file gets a result or an error...")
+    results = {r["filename"]: r for r in analyze_batch.iter_batch(files, file_timeout=0.2)}
+    for name, result in results.items():
+        print(f"   {name}: {result.get('error') or result['issues']}")
+    assert results["a.js"]["diagnostics"][0]["rule"] == "no-var"
+    assert results["b.py"]["diagnostics"][0]["rule"] == "unused-name"
+    assert results["c.rb"]["error"] == "Unsupported language."
+    assert "timed out" in results["big.js"]["error"]
+
+    print("2. Repeated files come from the analyze cache...")
+    again = list(analyze_batch.iter_batch(files[:2]))
+    assert all(r["cached"] for r in again)
+
+    print(f"   Stats: {analyze_batch.get_stats()}")
+    print("Analyze batch test completed!")
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_analyze_batch(monkeypatch)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import tempfile
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analyze_cache
+
+def test_analyze_cache(monkeypatch):
+    """Test analyze result caching, eviction, expiry and the shared backend"""
+    print("Testing analyze cache...")
+    monkeypatch.setattr(analyze_cache, "ANALYZE_CACHE_DB",
+                        os.path.join(tempfile.mkdtemp(prefix='analyze_cache_test_'), 'cache.db'))
+    monkeypatch.setattr(analyze_cache, "CACHE_SIZE", 2)
+
+    print("1. Repeat submissions hit the cache...")
+    first, cached = analyze_cache.get_or_analyze("javascript", "var x = 1;")
+    again, cached_again = analyze_cache.get_or_analyze("javascript", "var x = 1;")
+    print(f"   cached={cached}, {cached_again}")
+    assert not cached and cached_again and again == first
+    assert analyze_cache.get_or_analyze("python", "var x = 1;")[1] is False
+
+    print("2. The least recently used entry is evicted...")
+    analyze_cache.get_or_analyze("javascript", "let y = 2;")
+    assert analyze_cache.get_stats()["evictions"] == 1
+    assert analyze_cache.get_or_analyze("javascript", "var x = 1;")[1] is False
+
+    print("3. Entries expire after the TTL...")
+    monkeypatch.setattr(analyze_cache, "TTL", 0)
+    analyze_cache.get_or_analyze("cpp", "int main() {}")
+    assert analyze_cache.get_or_analyze("cpp", "int main() {}")[1] is False
+    monkeypatch.setattr(analyze_cache, "TTL", 3600)
+
+    print("4. Other workers' results come from the shared database...")
+    monkeypatch.setattr(analyze_cache, "SHARED", True)
+    analyze_cache.get_or_analyze("java", "class A {}")
+    analyze_cache.clear()
+    diagnostics, cached = analyze_cache.get_or_analyze("java", "class A {}")
+    stats = analyze_cache.get_stats()
+    print(f"   Stats: {stats}")
+    assert cached and stats["shared_hits"] == 1 and diagnostics[0]["rule"] == "print-statement"
+    assert 0 < stats["hit_rate"] < 1
+
+    print("Analyze cache test completed!")
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_analyze_cache(monkeypatch)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analyzer
+import analyze_session
+
+def at(line, column):
+    return {"line": line, "column": column}
+
+def test_analyze_session():
+    """Test incremental analysis against full re-analysis"""
+    print("Testing analyze sessions...")
+    code = "let a = 1;\nlet b = 2;\n/* note\n   == */\nlet c = a;\n"
+    session_id, session = analyze_session.create("javascript", code, "tester")
+    assert session.diagnostics() == []
+
+    print("1. An edit returns the diagnostics of the lines it changed...")
+    changed, diagnostics = analyze_session.edit(session, 1, [
+        {"start": at(2, 1), "end": at(2, 4), "text": "var"},
+        {"start": at(5, 9), "end": at(5, 10), "text": "a == b"},
+    ])
+    print(f"   changed={changed} {[(d['rule'], d['line']) for d in diagnostics]}")
+    assert [(d["rule"], d["line"]) for d in diagnostics] == [("no-var", 2), ("strict-equality", 5)]
+    assert changed["start"] == 2 and changed["end"] == changed["oldEnd"] == 6
+
+    print("2. Opening a comment re-tokenizes the lines it swallows...")
+    changed, diagnostics = analyze_session.edit(session, 2, [
+        {"start": at(2, 1), "end": at(2, 1), "text": "/*\n"},
+    ])
+    print(f"   changed={changed} {[(d['rule'], d['line']) for d in diagnostics]}")
+    assert changed == {"start": 2, "end": 6, "oldEnd": 5} and diagnostics == []
+
+    print("3. The session always agrees with a full analysis...")
+    assert session.diagnostics() == analyzer.analyze(session.text, "javascript")
+
+    print("4. Stale versions and other owners are refused...")
+    try:
+        analyze_session.edit(session, 1, [])
+        assert False, "expected VersionConflict"
+    except analyze_session.VersionConflict:
+        pass
+    assert analyze_session.get(session_id, "someone else") is None
+    assert analyze_session.discard(session_id, "tester")
+    assert analyze_session.get(session_id, "tester") is None
+
+    print(f"   Stats: {analyze_session.get_stats()}")
+    print("Analyze session test completed!")
+
+if __name__ == "__main__":
+    test_analyze_session()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analyzer
+
+def issues(code, lang):
+    return [(d["rule"], d["line"], d["column"]) for d in analyzer.analyze(code, lang)]
+
+def test_analyzer():
+    """Test the tokenizer and the rules built on it"""
+    print("Testing analyzer...")
+
+    print("1. Strings, comments and regexes hide their contents...")
+    code = 'let s = "a == b, var x"; // == and var\nlet r = /["\']/g; /* var */\n'
+    found = issues(code, "javascript")
+    print(f"   {found}")
+    assert found == []
+
+    print("2. JavaScript rules report line and column...")
+    found = issues('var x = 1;\nif (x == 2) {}\nlet y = x / 2 / 3;\n', "javascript")
+    print(f"   {found}")
+    assert found == [("no-var", 1, 1), ("strict-equality", 2, 7)]
+
+    print("3. Unterminated literals...")
+    found = issues('int main() {\n  char *s = "abc;\n}\n/* open', "cpp")
+    print(f"   {found}")
+    assert ("unterminated-string", 2, 13) in found and ("unterminated-comment", 4, 1) in found
+
+    print("4. Python syntax errors and mixed indentation...")
+    found = issues("def f():\n\tif True:\n\t    return 1\n", "python")
+    print(f"   {found}")
+    assert found == [("mixed-indentation", 3, 1)]
+    found = issues("def f(:\n    pass\n", "python")
+    assert found[0][0] == "syntax-error" and found[0][1] == 1
+
+    print("5. Python checks share one parse...")
+    code = ("import os\ndef f(list):\n    unused = 1\n    for i in range(3):\n        return i\n"
+            "        print(i)\n")
+    found = issues(code, "python")
+    print(f"   {found}")
+    assert found == [("unused-name", 1, 1), ("shadowed-builtin", 2, 7), ("unused-name", 3, 5),
+                     ("unreachable-code", 6, 9)]
+    assert analyzer.parse(code, "python") is analyzer.parse(code, "python")
+
+    print("6. File-level checks ignore comments...")
+    found = issues("// class Main { System.out.println(); }\n", "java")
+    print(f"   {found}")
+    assert [rule for rule, _, _ in found] == ["class-declaration", "print-statement"]
+    assert issues('#include <cstdio>\nint main() { return 0; }\n', "cpp") == []
+
+    print("7. Deeply nested code is reported instead of crashing...")
+    found = issues("x = " + "+".join(["1"] * 500) + "\nimport os\n", "python")
+    print(f"   {found}")
+    assert found == [("unused-name", 2, 1)]
+    found = analyzer.analyze("x = " + "+".join(["1"] * 200000), "python")
+    print(f"   {found}")
+    assert found[0]["rule"] == "syntax-error" and "nested too deeply" in found[0]["message"]
+
+    print("Analyzer test completed!")
+
+if __name__ == "__main__":
+    test_analyzer()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import comparator
+
+def chunked(text, size=7):
+    return [text[i:i + size].encode('utf-8') for i in range(0, len(text), size)]
+
+def test_comparator():
+    """Test streaming output comparison"""
+    print("Testing comparator...")
+
+    print("1. Exact mode ignores surrounding whitespace only...")
+    assert comparator.compare("1 2\n3", chunked("\n1 2\n3  \n\n")) is None
+    diff = comparator.compare("1 2\n3", chunked("1  2\n3"))
+    print(f"   Diff: {diff}")
+    assert diff["line"] == 1 and diff["offset"] == 2
+
+    print("2. Whitespace mode ignores trailing spaces and blank lines...")
+    assert comparator.compare("a\nb", chunked("a   \nb\t\n\n\n"), "whitespace") is None
+    assert comparator.compare("a b", chunked("a  b"), "whitespace") is not None
+
+    print("3. Token and float modes...")
+    assert comparator.compare("1 2\n3", chunked("1\n2    3"), "tokens") is None
+    assert comparator.compare("0.3333333", chunked("0.33333334"), "float") is None
+    assert comparator.compare("0.3 1", chunked("0.4 1"), "float", tolerance=1e-3) is not None
+    assert comparator.compare("1 2 3", chunked("1 2"), "float") is not None
+
+    print("4. Large outputs report a bounded window around the first mismatch...")
+    expected = "\n".join(str(i) for i in range(200000))
+    actual = expected.replace("\n123456\n", "\n123457\n")
+    diff = comparator.compare(expected, chunked(actual, 65536))
+    print(f"   Mismatch on line {diff['line']}")
+    assert diff["line"] == 123457
+    assert len(diff["actual"]) <= 2 * comparator.DIFF_WINDOW
+    assert "123457" in diff["actual"][diff["column"] - 10:]
+
+    print("Comparator test completed!")
+
+if __name__ == "__main__":
+    test_comparator()
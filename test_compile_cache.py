@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import tempfile
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import compile_cache
+
+def test_compile_cache(monkeypatch):
+    """Test compile cache hits, misses and eviction"""
+    print("Testing compile cache...")
+    monkeypatch.setattr(compile_cache, "CACHE_DIR", tempfile.mkdtemp(prefix='compile_cache_test_'))
+
+    code = '#include <iostream>\nint main() { std::cout << "hi"; return 0; }\n'
+
+    print("1. First compile should miss...")
+    build = compile_cache.get_or_compile("cpp", code)
+    print(f"   ok={build['ok']} cached={build['cached']}")
+    assert build["ok"] and not build["cached"]
+
+    print("2. Identical source should hit...")
+    again = compile_cache.get_or_compile("cpp", code)
+    print(f"   cached={again['cached']} cmd={again['cmd']}")
+    assert again["cached"] and again["cmd"] == build["cmd"]
+
+    print("3. Compile errors are cached too...")
+    broken = compile_cache.get_or_compile("cpp", "int main( {")
+    broken_again = compile_cache.get_or_compile("cpp", "int main( {")
+    print(f"   ok={broken['ok']} cached={broken_again['cached']}")
+    assert not broken["ok"] and broken_again["cached"] and broken_again["output"]
+
+    print("4. The cache size is tracked as entries are added...")
+    size = compile_cache.get_stats()["bytes"]
+    assert size == sum(entry[1] for entry in compile_cache._list_entries()) and size > 0
+
+    print("5. Recently used entries are not evicted...")
+    monkeypatch.setattr(compile_cache, "CACHE_MAX_BYTES", 1)
+    assert compile_cache.evict() == 0 and compile_cache.get_stats()["entries"] == 2
+
+    print("6. Eviction keeps the cache under its size limit...")
+    monkeypatch.setattr(compile_cache, "MIN_AGE", 0)
+    evicted = compile_cache.evict()
+    print(f"   Evicted {evicted} entries")
+    assert evicted == 2 and compile_cache.get_stats()["entries"] == 0
+    assert compile_cache.get_stats()["bytes"] == 0
+    assert os.listdir(compile_cache.CACHE_DIR) == [compile_cache.SIZE_FILE]
+
+    print(f"   Stats: {compile_cache.get_stats()}")
+    print("Compile cache test completed!")
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_compile_cache(monkeypatch)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+
+def test_database():
+    """Test per-thread persistent connections and their settings"""
+    print("Testing database connections...")
+    database.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='database_test_'), 'test.db')
+    database.init_db()
+
+    print("1. A thread reuses one connection in WAL mode...")
+    conn = database.get_db_connection()
+    assert database.get_db_connection() is conn
+    mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    print(f"   journal_mode={mode}")
+    assert mode == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == database.BUSY_TIMEOUT_MS
+
+    print("2. Other threads get their own connection...")
+    others = []
+    thread = threading.Thread(target=lambda: others.append(database.get_db_connection()))
+    thread.start()
+    thread.join()
+    assert others[0] is not conn
+
+    print("3. close() drops uncommitted changes but keeps the connection...")
+    user_id = database.create_user("dbtest", "dbtest@example.com", "secret")
+    conn = database.get_db_connection()
+    conn.execute('UPDATE users SET full_name = ? WHERE id = ?', ("Uncommitted", user_id))
+    conn.close()
+    assert database.get_db_connection() is conn
+    assert database.get_user_by_id(user_id)["full_name"] is None
+    database.update_user_profile(user_id, full_name="Committed")
+    assert database.get_user_by_id(user_id)["full_name"] == "Committed"
+
+    print("   A transaction left open by a failed caller is rolled back on next use...")
+    conn.execute('UPDATE users SET full_name = ? WHERE id = ?', ("Abandoned", user_id))
+    assert conn.in_transaction
+    assert database.get_db_connection() is conn and not conn.in_transaction
+    thread = threading.Thread(target=lambda: database.update_user_profile(user_id, full_name="Other thread"))
+    thread.start()
+    thread.join()
+    assert database.get_user_by_id(user_id)["full_name"] == "Other thread"
+
+    print("4. Changing DATABASE_PATH opens a new connection...")
+    database.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='database_test_'), 'other.db')
+    assert database.get_db_connection() is not conn
+    database.init_db()
+
+    print("5. History pages follow a keyset cursor...")
+    for i in range(5):
+        database.add_history(7, "code" if i % 2 else "test", "python", f"run {i}", "print(1)")
+    first = database.get_user_history(7, limit=2)
+    assert [item["title"] for item in first] == ["run 4", "run 3"]  # Same second: newest id first
+    cursor = (first[-1]["created_at"], first[-1]["id"])
+    rest = database.get_user_history(7, limit=10, before=cursor)
+    print(f"   {[item['title'] for item in rest]}")
+    assert [item["title"] for item in rest] == ["run 2", "run 1", "run 0"]
+    assert [item["title"] for item in database.get_user_history(7, type_filter="code", before=cursor)] == ["run 1"]
+    database.HISTORY_MAX_PAGE = 1
+    try:
+        assert len(database.get_user_history(7, limit=1000)) == 1
+    finally:
+        database.HISTORY_MAX_PAGE = 100
+
+    print("6. Listings are summaries; items load in full...")
+    code = "x = 1\n" * 100
+    history_id = database.add_history(8, "analyze", "python", "big", code, output="ok",
+                                      issues=[{"line": 1}, {"line": 2}])
+    summary, = database.get_user_history(8)
+    print(f"   {sorted(summary)}")
+    assert "code" not in summary and "issues" not in summary
+    assert summary["preview"] == code[:database.HISTORY_PREVIEW_CHARS] and summary["code_size"] == len(code)
+    assert summary["output_preview"] == "ok" and summary["issue_count"] == 2
+    item = database.get_history_item(history_id, 8)
+    assert item["code"] == code and item["issues"] == [{"line": 1}, {"line": 2}]
+    assert database.get_history_item(history_id, 7) is None
+    assert summary["variable_names"] is None and summary["tests_passed"] is None
+
+    print("   Variable names and test counts are part of the summary...")
+    database.add_history(8, "debug", "python", "vars", "a = b = 1",
+                         variables=[{"name": "a", "value": "1"}, {"name": "b", "value": "1"}])
+    database.add_history(8, "debug", "python", "names", "c = 1", variables=["c"])
+    database.add_history(8, "test", "python", "suite", "pass", test_results={"passed": 3, "failed": 1})
+    summaries = {item["title"]: item for item in database.get_user_history(8)}
+    assert summaries["vars"]["variable_names"] == "a, b" and summaries["names"]["variable_names"] == "c"
+    assert (summaries["suite"]["tests_passed"], summaries["suite"]["tests_failed"]) == (3, 1)
+
+    print("   Search covers the whole code, not just the preview...")
+    database.add_history(8, "code", "python", "long", "x = 1\n" * 100 + "needle_100% = 2\n")
+    assert [item["title"] for item in database.get_user_history(8, search="needle_100%")] == ["long"]
+    assert [item["title"] for item in database.get_user_history(8, search="SUITE")] == ["suite"]
+    assert database.get_user_history(8, search="needle_1000") == []
+    assert database.get_user_history(8, search="x%1") == []
+
+    print("7. Stats are aggregated in SQL...")
+    database.add_history(9, "code", "python", "a", "x")
+    database.add_history(9, "test", "python", "b", "x", test_results={"total": 4, "passed": 3, "failed": 1})
+    database.add_history(9, "test", "javascript", "c", "x", test_results={"total": 2, "passed": 2, "failed": 0})
+    stats = database.get_user_stats(9)
+    print(f"   {stats}")
+    assert stats["total"] == 3
+    assert stats["by_type"] == {"code": 1, "test": 2}
+    assert stats["by_language"] == {"javascript": 1, "python": 2}
+    assert len(stats["activity"]) == 1 and stats["activity"][0]["count"] == 3
+    assert stats["tests"] == {"runs": 2, "passed": 5, "failed": 1, "pass_rate": 0.8333}
+    empty = database.get_user_stats(10)
+    assert empty["total"] == 0 and empty["activity"] == [] and empty["tests"]["pass_rate"] is None
+
+    print("Database test completed!")
+
+if __name__ == "__main__":
+    test_database()
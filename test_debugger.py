@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import debugger
+import sandbox
+
+CODE = '''def total(n):
+    s = 0
+    for i in range(n):
+        s += i
+    return s
+print(total(4))
+done = True
+'''
+
+def test_debugger():
+    """Test breakpoint snapshots from the out-of-process tracer"""
+    print("Testing debugger...")
+    debugger.SESSION_DIR = tempfile.mkdtemp(prefix='debugger_test_')
+
+    print("1. Snapshots are taken only at breakpoint lines...")
+    info = debugger.debug_python(CODE, [4, "7", "x"])
+    print(f"   hits={info['hits']} output={info['output']!r}")
+    assert info["output"] == "6\n" and not info["errors"]
+    assert info["hits"] == {"4": 4, "7": 1}
+    assert [s["line"] for s in info["snapshots"]] == [4, 4, 4, 4, 7]
+    first = info["snapshots"][0]
+    assert first["callStack"] == ["total (line 4)", "<module> (line 6)"]
+    assert {"name": "i", "value": "0", "type": "int"} in first["variables"]
+
+    print("2. Snapshot and step caps...")
+    debugger.MAX_SNAPSHOTS, debugger.MAX_STEPS = 1, 2
+    try:
+        info = debugger.debug_python(CODE, [4])
+    finally:
+        debugger.MAX_SNAPSHOTS, debugger.MAX_STEPS = 100, 10000
+    print(f"   steps={info['steps']} snapshots={len(info['snapshots'])}")
+    assert info["steps"] == 2 and len(info["snapshots"]) == 1 and info["truncated"]
+    assert info["output"] == "6\n"
+
+    print("3. Runtime errors and final variables without breakpoints...")
+    info = debugger.debug_python("x = 1\nraise ValueError('boom')\n", [])
+    print(f"   {info['errors'][0]}")
+    assert info["errors"][0] == "Runtime error: boom"
+    assert info["variables"] == [{"name": "x", "value": "1", "type": "int"}]
+
+    print("4. Large values are previews that expand on demand...")
+    info = debugger.debug_python("big = list(range(1000000))\nnested = {'a': {'b': {'c': {}}}}\n",
+                                 [], owner="tester")
+    big, nested = info["variables"]
+    print(f"   {big['value']} ({big['length']} items, {len(big['children'])} inlined)")
+    assert big["value"] == "[0, 1, 2, 3, 4, 5, ...]" and big["length"] == 1000000
+    assert len(big["children"]) == debugger.MAX_ITEMS
+    assert nested["value"] == "{'a': {'b': {...}}}"
+    session = debugger.get(info["sessionId"], "tester")
+    assert session and debugger.get(info["sessionId"], "someone else") is None
+    page = debugger.expand(info["sessionId"], session, big["handle"], 500000, 2)
+    assert [child["value"] for child in page["children"]] == ["500000", "500001"]
+    assert debugger.discard(info["sessionId"], "tester")
+
+    print("5. Recorded runs page through every executed line...")
+    info = debugger.debug_python(CODE, [], owner="tester", record=True)
+    trace = info["trace"]
+    print(f"   {trace['total']} steps, truncated={trace['truncated']}")
+    assert info["output"] == "6\n" and not trace["truncated"]
+    assert [step["line"] for step in trace["steps"][:4]] == [1, 6, 2, 3]
+    session = debugger.get(info["sessionId"], "tester")
+    page = debugger.trace_page(info["sessionId"], session, 7, 2)
+    assert page["total"] == trace["total"]
+    assert page["steps"][0]["function"] == "total"
+    assert {"name": "i", "value": "1"} in page["state"]
+    assert debugger.discard(info["sessionId"], "tester")
+    info = debugger.debug_python("while True:\n    pass\n", [], limits=sandbox.limits_for(1), record=True)
+    print(f"   Time limit: {info['trace']['total']} steps, {info['errors']}")
+    assert info["trace"]["truncated"] and info["trace"]["total"] > 0
+    info = debugger.debug_python("import time\ntime.sleep(30)\n", [], limits=sandbox.limits_for(1), record=True)
+    assert "trace" not in info and "no trace could be reported" in info["errors"][-1]
+
+    print("6. Sessions are shared by every worker process...")
+    info = debugger.debug_python("big = list(range(1000))\n", [], owner="tester")
+    other_worker = f"""
+import json, debugger
+debugger.SESSION_DIR = {debugger.SESSION_DIR!r}
+session = debugger.get({info['sessionId']!r}, 'tester')
+page = debugger.expand(session.id, session, {info['variables'][0]['handle']}, 998, 5)
+print(json.dumps([child['value'] for child in page['children']]))
+print(json.dumps(debugger.discard(session.id, 'tester')))
+"""
+    output = subprocess.run([sys.executable, "-c", other_worker], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=30)
+    print(f"   Other worker: {output.stdout.split()} {output.stderr}")
+    assert [json.loads(line) for line in output.stdout.splitlines()] == [["998", "999"], True]
+    # The worker that started the child reaps it once the session is gone
+    assert debugger.get(info["sessionId"], "tester") is None and not debugger._children
+    assert not any(name.endswith(".sock") for name in os.listdir(debugger.SESSION_DIR))
+
+    print("Debugger test completed!")
+
+if __name__ == "__main__":
+    test_debugger()
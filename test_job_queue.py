@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+import job_queue
+
+def test_job_queue():
+    """Test async job submission, polling, failures and expiry"""
+    print("Testing job queue...")
+    database.DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='job_queue_test_'), 'test.db')
+    database.init_db()
+
+    print("1. A submitted job's result can be polled...")
+    job_id = job_queue.submit(1, "run", lambda a, b: {"sum": a + b}, 2, 3)
+    job = job_queue.get(job_id, 1, wait=5)
+    print(f"   status={job['status']} result={job['result']}")
+    assert job["status"] == "done" and job["result"] == {"sum": 5}
+    assert job_queue.get(job_id, 2) is None  # Other users can't see it
+
+    print("2. A job that raises is failed with its error...")
+    def broken():
+        raise ValueError("boom")
+    job = job_queue.get(job_queue.submit(1, "run", broken), 1, wait=5)
+    assert job["status"] == "failed" and job["error"] == "boom"
+
+    print("3. Submissions beyond the pending limit are rejected...")
+    release = threading.Event()
+    job_queue.JOB_MAX_PENDING = 1
+    try:
+        blocked = job_queue.submit(1, "run", release.wait)
+        try:
+            job_queue.submit(1, "run", lambda: None)
+            assert False, "expected QueueFull"
+        except job_queue.QueueFull:
+            pass
+    finally:
+        release.set()
+        job_queue.JOB_MAX_PENDING = 64
+    assert job_queue.get(blocked, 1, wait=5)["status"] == "done"
+
+    print("4. Jobs of a dead worker fail; old jobs expire...")
+    conn = database.get_db_connection()
+    database.create_job("lost", 1, "run")
+    database.update_job("lost", "running")
+    conn.execute("UPDATE jobs SET created_at = datetime('now', '-30 minutes') WHERE id = 'lost'")
+    conn.execute("UPDATE jobs SET created_at = datetime('now', '-2 days') WHERE id = ?", (job_id,))
+    conn.commit()
+    job_queue._last_cleanup = 0.0
+    lost = job_queue.get("lost", 1)
+    print(f"   {lost['status']}: {lost['error']}")
+    assert lost["status"] == "failed" and "worker" in lost["error"]
+    assert job_queue.get(job_id, 1) is None
+
+    print(f"   Stats: {job_queue.get_stats()}")
+    print("Job queue test completed!")
+
+if __name__ == "__main__":
+    test_job_queue()
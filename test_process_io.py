@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import subprocess
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import process_io
+
+def start(code):
+    return subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def test_process_io():
+    """Test bounded output collection"""
+    print("Testing process I/O...")
+
+    print("1. Small output is kept whole...")
+    collector = process_io.OutputCollector(limit=16)
+    assert collector.write(b"hello ") == b"hello "
+    assert collector.write(b"world") == b"wo"  # The head window holds 8 bytes
+    assert collector.text() == "hello world" and not collector.truncated
+    assert collector.complete and b"".join(collector.iter_full()) == b"hello world"
+
+    print("2. Large output keeps the head and tail windows...")
+    collector = process_io.OutputCollector(limit=16)
+    live = b"".join(collector.write(bytes([48 + i % 10])) for i in range(100))
+    print(f"   {collector.text()!r}")
+    assert live == b"01234567" and collector.total == 100
+    assert bytes(collector.head) == b"01234567" and bytes(collector.tail) == b"23456789"
+    assert collector.truncated and collector.omitted == 84 and not collector.complete
+    assert collector.text() == "01234567\n... [84 bytes omitted] ...\n23456789"
+
+    print("3. Spilled output stays readable in full...")
+    collector = process_io.OutputCollector(limit=16, spill=True)
+    data = b"".join(str(i).encode() + b"\n" for i in range(1000))
+    for start_at in range(0, len(data), 7):
+        collector.write(data[start_at:start_at + 7])
+    assert collector.truncated and collector.complete
+    assert b"".join(collector.iter_full(chunk_size=100)) == data
+    collector.close()
+
+    print("4. Spilling stops at SPILL_LIMIT...")
+    saved = process_io.SPILL_LIMIT
+    process_io.SPILL_LIMIT = 64
+    try:
+        collector = process_io.OutputCollector(limit=16, spill=True)
+        collector.write(b"x" * 100)
+        assert collector.spilled == 64 and not collector.complete
+        assert b"".join(collector.iter_full()) == b"x" * 64
+        collector.close()
+    finally:
+        process_io.SPILL_LIMIT = saved
+
+    print("5. collect() reads both streams of a process...")
+    proc = start("import sys; sys.stdout.write(sys.stdin.read().upper()); sys.stderr.write('err')")
+    stdout, stderr = process_io.collect(proc, b"input", timeout=10)
+    proc.wait()
+    assert stdout.text() == "INPUT" and stderr.text() == "err"
+
+    print("6. On timeout the output so far comes with the exception...")
+    proc = start("import time; print('before', flush=True); time.sleep(30)")
+    try:
+        process_io.collect(proc, timeout=1)
+        assert False, "collect did not time out"
+    except subprocess.TimeoutExpired as e:
+        print(f"   stdout={e.output.text()!r}")
+        assert e.output.text() == "before\n" and e.stderr.total == 0
+    finally:
+        proc.kill()
+        proc.wait()
+
+    print("Process I/O test completed!")
+
+if __name__ == "__main__":
+    test_process_io()
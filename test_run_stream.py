@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+import scheduler
+# app initializes the database on import; keep it and the scheduler off the shared files
+test_dir = tempfile.mkdtemp(prefix='run_stream_test_')
+database.DATABASE_PATH = os.path.join(test_dir, 'test.db')
+scheduler.SCHEDULER_DB = os.path.join(test_dir, 'scheduler.db')
+import app
+
+def read_events(response):
+    """Split a text/event-stream body into (event, data) pairs"""
+    events = []
+    body = response.get_data(as_text=True)
+    response.close()  # Releases the scheduler slot, as the WSGI server would
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        name, data = "message", ""
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                name = line[7:]
+            elif line.startswith("data: "):
+                data += line[6:]
+        events.append((name, json.loads(data)))
+    return events
+
+def test_run_stream():
+    """Test streaming program output over /run/stream"""
+    print("Testing /run/stream...")
+    client = app.app.test_client()
+
+    print("1. Output is streamed as stdout events followed by exit...")
+    response = client.post("/run/stream", json={"code": "print('one')\nprint('two')", "language": "python"})
+    assert response.mimetype == "text/event-stream"
+    events = read_events(response)
+    print(f"   Events: {[name for name, _ in events]}")
+    stdout = "".join(data["text"] for name, data in events if name == "stdout")
+    assert stdout == "one\ntwo\n"
+    name, done = events[-1]
+    assert name == "exit" and done["returncode"] == 0 and not done["timed_out"]
+    assert done["output_bytes"]["stdout"] == len("one\ntwo\n")
+    assert "usage" in done
+
+    print("2. stderr and the exit code are reported...")
+    events = read_events(client.post("/run/stream", json={
+        "code": "import sys\nsys.stderr.write('bad')\nsys.exit(3)", "language": "python"}))
+    assert ("stderr", {"text": "bad"}) in events
+    assert events[-1][0] == "exit" and events[-1][1]["returncode"] == 3
+
+    print("3. Large output sends the head live and the tail at the end...")
+    events = read_events(client.post("/run/stream", json={
+        "code": "for i in range(200000): print(i)", "language": "python"}))
+    stdout = "".join(data["text"] for name, data in events if name == "stdout")
+    assert stdout.startswith("0\n1\n") and stdout.endswith("199999\n")
+    assert events[-1][1]["output_bytes"]["stdout"] > len(stdout)
+
+    print("4. Bad requests yield a single error event...")
+    assert read_events(client.post("/run/stream", json={"code": "", "language": "python"})) == \
+        [("error", {"message": "No code to run."})]
+    assert read_events(client.post("/run/stream", json={"code": "x", "language": "cobol"})) == \
+        [("error", {"message": "Unsupported language."})]
+
+    print("Run stream test completed!")
+
+if __name__ == "__main__":
+    test_run_stream()
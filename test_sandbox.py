@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import resource
+import subprocess
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sandbox
+import suite_runner
+
+def test_sandbox():
+    """Test resource limits and usage accounting"""
+    print("Testing sandbox...")
+
+    print("1. Limits follow the timeout setting within bounds...")
+    assert sandbox.limits_for(5)["wall"] == 5 and sandbox.limits_for(5)["cpu"] == 5
+    assert sandbox.limits_for(None)["wall"] == sandbox.DEFAULT_TIMEOUT
+    assert sandbox.limits_for("junk")["wall"] == sandbox.DEFAULT_TIMEOUT
+    assert sandbox.limits_for(0)["wall"] == 1
+    assert sandbox.limits_for(10 ** 6)["wall"] == sandbox.MAX_TIMEOUT
+
+    limits = sandbox.limits_for(2)
+    limits["file_size"] = 1024 * 1024
+
+    print("2. Limits are in place before the program starts...")
+    proc = subprocess.Popen(
+        [sys.executable, "-c",
+         "import resource; print(resource.getrlimit(resource.RLIMIT_CPU)[0],"
+         " resource.getrlimit(resource.RLIMIT_FSIZE)[0])"],
+        stdout=subprocess.PIPE, preexec_fn=lambda: sandbox.apply_limits(limits))
+    output = proc.communicate()[0].decode().split()
+    print(f"   Child limits: cpu={output[0]} fsize={output[1]}")
+    assert output == ["2", str(1024 * 1024)]
+    assert resource.getrlimit(resource.RLIMIT_CPU)[0] == resource.RLIM_INFINITY
+
+    print("3. Programs started for suites run under the limits...")
+    program = {"cmd": [sys.executable, "-c", "while True: pass"], "lang": "cpp", "code": ""}
+    proc = suite_runner.start(program, limits)
+    sandbox.wait(proc, 10)
+    print(f"   Return code: {proc.returncode}")
+    assert sandbox.describe_exit(proc.returncode, limits) == "CPU time limit exceeded (2s)."
+
+    print("4. Writing past the file size limit is reported...")
+    path = os.path.join(tempfile.mkdtemp(prefix='sandbox_test_'), 'out')
+    program = {"cmd": ["sh", "-c", f"exec head -c {2 * 1024 * 1024} /dev/zero > {path}"],
+               "lang": "cpp", "code": ""}
+    proc = suite_runner.start(program, limits)
+    sandbox.wait(proc, 10)
+    os.remove(path)
+    assert sandbox.describe_exit(proc.returncode, limits) == "File size limit exceeded (1 MB)."
+    assert sandbox.describe_exit(0, limits) is None and sandbox.describe_exit(None, limits) is None
+
+    print("5. Usage comes from the reaped child...")
+    program = {"cmd": [sys.executable, "-c", "sum(range(3 * 10 ** 6))"], "lang": "cpp", "code": ""}
+    started = time.monotonic()
+    proc = suite_runner.start(program, limits)
+    sandbox.wait(proc, 10)
+    stats = sandbox.usage(proc, time.monotonic() - started, 0.25)
+    print(f"   Usage: {stats}")
+    assert proc.returncode == 0
+    assert 0 < stats["cpu_time"] <= stats["wall_time"] + 0.05
+    assert stats["peak_rss_kb"] > 0 and stats["compile_time"] == 0.25
+
+    print("6. kill() stops and reaps a running program...")
+    program = {"cmd": [sys.executable, "-c", "import time; time.sleep(30)"], "lang": "cpp", "code": ""}
+    proc = suite_runner.start(program, limits)
+    try:
+        sandbox.wait(proc, 0.1)
+        assert False, "sleeping program exited"
+    except subprocess.TimeoutExpired:
+        pass
+    sandbox.kill(proc)
+    assert proc.returncode == -9 and proc.rusage is not None
+
+    print("Sandbox test completed!")
+
+if __name__ == "__main__":
+    test_sandbox()
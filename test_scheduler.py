@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import tempfile
+import threading
+import time
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import scheduler
+
+def test_scheduler(monkeypatch):
+    """Test fair-share ordering and load shedding"""
+    print("Testing scheduler...")
+    monkeypatch.setattr(scheduler, "SCHEDULER_DB", os.path.join(tempfile.mkdtemp(), 'scheduler.db'))
+    monkeypatch.setitem(scheduler.LANE_SLOTS, scheduler.NORMAL, 1)
+    monkeypatch.setattr(scheduler, "MAX_QUEUED_PER_USER", 2)
+    monkeypatch.setattr(scheduler, "MAX_QUEUE", 3)
+
+    print("1. Queued users are served round robin...")
+    order = []
+
+    def job(user):
+        with scheduler.slot(user):
+            order.append(user)
+            time.sleep(0.05)
+
+    blocker = scheduler.acquire("blocker")
+    threads = []
+    for user in ("alice", "alice", "bob"):
+        thread = threading.Thread(target=job, args=(user,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    scheduler.release(blocker)
+    for thread in threads:
+        thread.join()
+    print(f"   Order: {order}")
+    assert order == ["alice", "bob", "alice"]
+
+    print("2. Users can't queue more than their share...")
+    blocker = scheduler.acquire("blocker")
+    waiters = [threading.Thread(target=job, args=("carol",)) for _ in range(2)]
+    for thread in waiters:
+        thread.start()
+    time.sleep(0.1)
+    try:
+        scheduler.acquire("carol")
+        assert False, "expected Overloaded"
+    except scheduler.Overloaded as e:
+        print(f"   Rejected: {e} (retry after {e.retry_after}s)")
+
+    print("3. Short jobs don't wait behind long ones...")
+    with scheduler.slot("dave", scheduler.SHORT):
+        print("   Short lane slot acquired while the normal lane is full")
+    scheduler.release(blocker)
+    for thread in waiters:
+        thread.join()
+
+    print(f"   Stats: {scheduler.get_stats()}")
+    print("Scheduler test completed!")
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_scheduler(monkeypatch)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import shutil
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sandbox
+import suite_runner
+import worker_pool
+
+def test_suite_runner():
+    """Test parallel test case execution"""
+    print("Testing suite runner...")
+    code = "n = int(input())\nif n < 0:\n    raise ValueError('negative')\nprint(n * 2)"
+    cases = [{"name": f"double {n}", "input": f"{n}\n", "expected": str(n * 2)} for n in range(10)]
+    cases.append({"name": "wrong", "input": "1\n", "expected": "3"})
+    cases.append({"name": "crash", "input": "-1\n", "expected": "-2"})
+
+    print("1. Each case gets its own input and results keep their order...")
+    response = suite_runner.run_suite("python", code, cases)
+    results = response["results"]
+    print(f"   {sum(r['passed'] for r in results)}/{len(results)} passed in {response['wall_time']}s")
+    assert [r["name"] for r in results] == [c["name"] for c in cases]
+    assert all(r["passed"] for r in results[:10])
+
+    print(f"   Summary: {response['passed']} passed, {response['failed']} failed")
+    assert (response["passed"], response["failed"]) == (10, 2)
+
+    print("2. Wrong output and crashes fail...")
+    assert results[10]["actual"] == "2" and not results[10]["passed"]
+    print(f"   Error: {results[11]['error']}")
+    assert not results[11]["passed"] and "negative" in results[11]["error"]
+
+    print("3. Crash messages come from the error line, not the last line...")
+    stderr = ("/tmp/main.js:1\nthrow new RangeError('too big');\n^\n\n"
+              "RangeError: too big\n    at Object.<anonymous> (/tmp/main.js:1:7)\n\nNode.js v20.19.5\n")
+    assert suite_runner._error_message(1, stderr, limits=None) == "RangeError: too big"
+    stderr = ('Exception in thread "main" java.lang.IllegalStateException: bad\n'
+              '\tat Main.main(Main.java:3)\n')
+    assert suite_runner._error_message(1, stderr, limits=None).endswith("IllegalStateException: bad")
+    assert suite_runner._error_message(3, "usage: prog\nNode.js v20.19.5\n", limits=None) == "usage: prog"
+    assert suite_runner._error_message(3, "", limits=None) == "Exited with code 3"
+
+    print("4. Timeouts are reported per case...")
+    limits = sandbox.limits_for(1)
+    response = suite_runner.run_suite("python", "while True: pass", [{"expected": ""}], limits)
+    assert "Timed out" in response["results"][0]["error"]
+
+    print("5. JavaScript cases share one Node process but not globals...")
+    code = ("globalThis.runs = (globalThis.runs || 0) + 1;\n"
+            "const n = parseInt(require('fs').readFileSync(0, 'utf8'));\n"
+            "setTimeout(() => console.log(n * 2 * globalThis.runs), 5);")
+    if shutil.which("node"):
+        program = suite_runner.prepare("javascript", code)
+        batch = list(suite_runner.iter_harness_batch(program, list(enumerate(cases[:10])), sandbox.limits_for(5)))
+        print(f"   {sum(r['passed'] for r in batch)}/{len(batch)} passed")
+        assert all(r["passed"] for r in batch)
+
+        code = ("const n = parseInt(require('fs').readFileSync(0, 'utf8'));\n"
+                "process.on('exit', (code) => console.log(n * 2));\n"
+                "if (n < 0) process.exitCode = 2;")
+        program = suite_runner.prepare("javascript", code)
+        batch = list(suite_runner.iter_harness_batch(program, list(enumerate(cases[:3] + cases[11:])),
+                                                     sandbox.limits_for(5)))
+        print(f"   exit listeners: {[r['actual'] for r in batch]}, exitCode: {batch[-1]['error']}")
+        assert [r["actual"] for r in batch] == ["0", "2", "4", "-2"]
+        assert all(r["passed"] for r in batch[:3])
+        assert not batch[3]["passed"] and batch[3]["error"] == "Exited with code 2"
+    else:
+        print("   Node.js not installed - skipped")
+
+    print("6. Fail-fast skips the remaining cases...")
+    response = suite_runner.run_suite("python", "print(input())", [{"input": "1", "expected": "2"}] * 20,
+                                      max_failures=1)
+    print(f"   {response['failed']} failed, {response['skipped']} skipped")
+    assert response["failed"] >= 1 and response["failed"] + response["skipped"] == 20
+    assert all(r["error"].startswith("Skipped") for r in response["results"] if r.get("skipped"))
+
+    worker_pool.shutdown()
+    print("Suite runner test completed!")
+
+if __name__ == "__main__":
+    test_suite_runner()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+import suite_runner
+import suite_store
+
+def test_suite_store():
+    """Test stored suites, version-checked caching and on-disk inputs"""
+    print("Testing suite store...")
+    workdir = tempfile.mkdtemp(prefix='suite_store_test_')
+    database.DATABASE_PATH = os.path.join(workdir, 'test.db')
+    suite_store.SUITE_DATA_DIR = os.path.join(workdir, 'suite_data')
+    suite_store.INLINE_INPUT_LIMIT = 100
+    database.init_db()
+
+    big_input = "\n".join(str(i) for i in range(1000)) + "\n"
+    cases = [
+        {"name": "small", "input": "3\n", "expected": "3"},
+        {"name": "big", "input": big_input, "expected": "999"},
+    ]
+
+    print("1. Large inputs are stored on disk...")
+    saved = suite_store.save(1, "Last line", "python", cases)
+    suite = suite_store.get(saved["id"], 1)
+    print(f"   id={saved['id']} cases={[sorted(case) for case in suite['cases']]}")
+    assert suite["cases"][0]["input"] == "3\n"
+    with open(suite["cases"][1]["input_file"]) as f:
+        assert f.read() == big_input
+
+    print("2. Unchanged suites come from the cache...")
+    assert suite_store.get(saved["id"], 1) is suite
+    assert suite_store.get_stats()["hits"] == 1
+
+    print("3. Cases are fed to the program from the stored suite...")
+    code = "import sys\nprint(sys.stdin.read().split()[-1])"
+    summary = suite_runner.run_suite("python", code, suite["cases"])
+    print(f"   passed={summary['passed']}/{summary['total']}")
+    assert summary["passed"] == 2
+
+    print("4. Updating bumps the version and invalidates the cache...")
+    updated = suite_store.save(1, "Last line", "python", cases[:1], suite_id=saved["id"])
+    reloaded = suite_store.get(saved["id"], 1)
+    print(f"   version={updated['version']} cases={len(reloaded['cases'])}")
+    assert updated["version"] == 2 and reloaded is not suite and len(reloaded["cases"]) == 1
+    assert not os.path.exists(suite["cases"][1]["input_file"])
+
+    print("5. Suites belong to their owner...")
+    assert suite_store.get(saved["id"], 2) is None
+    assert suite_store.save(2, "Stolen", "python", [], suite_id=saved["id"]) is None
+    assert not suite_store.delete(saved["id"], 2)
+    assert suite_store.delete(saved["id"], 1)
+    assert suite_store.get(saved["id"], 1) is None
+
+    print(f"   Stats: {suite_store.get_stats()}")
+    print("Suite store test completed!")
+
+if __name__ == "__main__":
+    test_suite_store()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import trace_recorder
+
+def test_trace_recorder():
+    """Test compact trace storage and paged replay"""
+    print("Testing trace recorder...")
+    trace = trace_recorder.Trace()
+    main = trace.scope("<module>", ["n", "i"])
+    assert trace.scope("<module>", ["n", "i"]) == main
+    inner = trace.scope("f", ["x"])
+
+    print("1. Steps store only changed values...")
+    trace.append(1, main, 0, [("n", "1000")])
+    for i in range(1000):
+        trace.append(2, main, i, [("i", str(i))])
+        trace.append(5, inner, i, [("x", str(i * 2))])
+    assert len(trace) == 2001
+    assert len(trace.change_names) == 2001
+    print(f"   {len(trace)} steps in {trace.nbytes} bytes, {len(trace.keyframes)} keyframes")
+    assert len(trace.keyframes) == 2001 // trace_recorder.KEYFRAME_INTERVAL + 1
+
+    print("2. A page carries the full state at its first step...")
+    page = trace.page(1499, 3)
+    print(f"   state={page['state']}")
+    assert page["start"] == 1499 and page["total"] == 2001
+    assert page["state"] == [{"name": "n", "value": "1000"}, {"name": "i", "value": "749"}]
+    assert [step["line"] for step in page["steps"]] == [2, 5, 2]
+    assert page["steps"][1]["function"] == "f"
+    assert page["steps"][1]["changes"] == [{"name": "x", "value": "1498"}]
+
+    print("3. Pages are clamped to the trace...")
+    assert trace.page(-5, 1)["start"] == 0
+    end = trace.page(5000, 10)
+    assert end["start"] == 2001 and end["steps"] == [] and end["state"] == []
+    assert trace_recorder.Trace().page(0, 10) == {"start": 0, "total": 0, "state": [], "steps": []}
+
+    print("Trace recorder test completed!")
+
+if __name__ == "__main__":
+    test_trace_recorder()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import subprocess
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import worker_pool
+
+def test_worker_pool():
+    """Test pre-warmed Python and Node workers"""
+    print("Testing worker pool...")
+
+    print("1. Running Python through the zygote...")
+    result = worker_pool.run("python", "print(input().upper())", input="hello\n", timeout=10)
+    print(f"   Output: {result.stdout!r} (exit {result.returncode})")
+    assert result.stdout == "HELLO\n" and result.returncode == 0
+
+    print("2. Jobs don't share state...")
+    worker_pool.run("python", "import math\nmath.answer = 42", timeout=10)
+    result = worker_pool.run("python", "import math\nprint(hasattr(math, 'answer'))", timeout=10)
+    print(f"   Output: {result.stdout!r}")
+    assert result.stdout == "False\n"
+
+    print("3. Exit codes and tracebacks are preserved...")
+    result = worker_pool.run("python", "raise SystemExit(3)", timeout=10)
+    assert result.returncode == 3
+    result = worker_pool.run("python", "1/0", timeout=10)
+    print(f"   Stderr: {result.stderr.splitlines()[-1]}")
+    assert "ZeroDivisionError" in result.stderr and result.returncode == 1
+
+    print("4. Timeouts kill the job...")
+    try:
+        worker_pool.run("python", "while True: pass", timeout=1)
+        assert False, "expected a timeout"
+    except subprocess.TimeoutExpired:
+        print("   Timed out as expected")
+
+    print("5. Running JavaScript through a spare Node process...")
+    try:
+        result = worker_pool.run("javascript", "console.log(6 * 7)", timeout=10)
+        print(f"   Output: {result.stdout!r}")
+        assert result.stdout == "42\n"
+    except FileNotFoundError:
+        print("   Node.js not installed - skipped")
+
+    print("6. A dead zygote is replaced once, and its directory removed...")
+    zygote = worker_pool._get_pool("python")
+    directory = os.path.dirname(zygote.path)
+    zygote.proc.kill()
+    zygote.proc.wait()
+    starts = worker_pool.get_stats()["zygote_starts"]
+    threads = [threading.Thread(target=worker_pool.run, args=("python", "pass"), kwargs={"timeout": 10})
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    zygote._restart(None)  # A failure on a zygote that was already replaced
+    assert worker_pool.get_stats()["zygote_starts"] == starts + 1
+    assert not os.path.exists(directory)
+
+    print(f"   Stats: {worker_pool.get_stats()}")
+    worker_pool.shutdown()
+    print("Worker pool test completed!")
+
+if __name__ == "__main__":
+    test_worker_pool()
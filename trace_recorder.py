@@ -0,0 +1,116 @@
+"""
+Compact storage for recorded execution traces.
+
+A trace of a million steps can't be a list of dicts, so a Trace keeps flat
+arrays instead. For each step it stores the line, the scope (function name
+plus the variable names visible there), the stdout offset and where its
+variable changes start. A step stores only the variables whose preview
+differs from that name's previous recorded value, as (name ID, value) pairs.
+The value text is appended to one bytearray.
+
+To rebuild a step's variables without replaying the whole trace, every
+KEYFRAME_INTERVAL steps the trace keeps a copy of the latest change of
+every name. A page of steps then costs at most one interval of replay plus
+the page itself, whether it is stepped through forwards or backwards.
+"""
+from array import array
+
+KEYFRAME_INTERVAL = 256
+
+
+class Trace:
+    """An append-only execution trace"""
+
+    def __init__(self):
+        self.lines = array('I')
+        self.scope_ids = array('I')
+        self.stdout = array('Q')
+        self.change_starts = array('Q', [0])  # Step i's changes are [starts[i], starts[i + 1])
+        self.change_names = array('I')
+        self.value_starts = array('Q', [0])  # Change j's text is blob[starts[j]:starts[j + 1]]
+        self.blob = bytearray()
+        self.names = []  # name ID -> name
+        self.name_ids = {}
+        self.scopes = []  # scope ID -> (function, name IDs)
+        self.scope_index = {}
+        self.keyframes = []  # Latest change per name ID after every KEYFRAME_INTERVAL-th step
+        self._latest = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the trace's arrays"""
+        arrays = (self.lines, self.scope_ids, self.stdout, self.change_starts, self.change_names,
+                  self.value_starts)
+        return sum(a.itemsize * len(a) for a in arrays) + len(self.blob)
+
+    def name_id(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def scope(self, function, names):
+        """The ID of a scope: a function and the variable names visible in it"""
+        key = (function, tuple(names))
+        scope_id = self.scope_index.get(key)
+        if scope_id is None:
+            scope_id = self.scope_index[key] = len(self.scopes)
+            self.scopes.append((function, tuple(self.name_id(name) for name in names)))
+        return scope_id
+
+    def append(self, line, scope_id, stdout, changes):
+        """Record a step; changes are (name, value text) pairs"""
+        for name, value in changes:
+            name_id = self.name_id(name)
+            self._latest[name_id] = len(self.change_names)
+            self.change_names.append(name_id)
+            self.blob += value.encode('utf-8', errors='replace')
+            self.value_starts.append(len(self.blob))
+        self.lines.append(line)
+        self.scope_ids.append(scope_id)
+        self.stdout.append(stdout)
+        self.change_starts.append(len(self.change_names))
+        if (len(self.lines) - 1) % KEYFRAME_INTERVAL == 0:
+            self.keyframes.append(dict(self._latest))
+
+    def _value(self, change):
+        return self.blob[self.value_starts[change]:self.value_starts[change + 1]].decode('utf-8')
+
+    def _changes(self, step):
+        return range(self.change_starts[step], self.change_starts[step + 1])
+
+    def state(self, step):
+        """The variables visible at a step, as {"name", "value"} entries"""
+        latest = dict(self.keyframes[step // KEYFRAME_INTERVAL])
+        for index in range(step // KEYFRAME_INTERVAL * KEYFRAME_INTERVAL + 1, step + 1):
+            for change in self._changes(index):
+                latest[self.change_names[change]] = change
+        _, name_ids = self.scopes[self.scope_ids[step]]
+        return [{"name": self.names[name_id], "value": self._value(latest[name_id])}
+                for name_id in name_ids if name_id in latest]
+
+    def page(self, start, count):
+        """Steps [start, start + count) with their changes, plus the full state at start"""
+        start = min(max(start, 0), len(self))
+        end = min(start + max(count, 0), len(self))
+        steps = []
+        for index in range(start, end):
+            function, _ = self.scopes[self.scope_ids[index]]
+            steps.append({
+                "step": index,
+                "line": self.lines[index],
+                "function": function,
+                "stdout": self.stdout[index],
+                "changes": [{"name": self.names[self.change_names[change]], "value": self._value(change)}
+                            for change in self._changes(index)],
+            })
+        return {
+            "start": start,
+            "total": len(self),
+            "state": self.state(start) if start < len(self) else [],
+            "steps": steps,
+        }
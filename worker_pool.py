@@ -0,0 +1,587 @@
+"""
+Pre-warmed interpreter workers for Python and JavaScript execution.
+
+Python programs are forked from a long-lived zygote process that has already
+started the interpreter and imported common modules. Every job runs in its own
+forked child, so user code never shares state with other jobs; the zygote is
+recycled after ZYGOTE_MAX_JOBS forks or when it crashes.
+
+Node cannot fork, so a few idle Node processes are started ahead of time and
+each one waits for a single program on stdin. Either way the caller gets a
+Popen-like handle with binary stdin/stdout/stderr pipes.
+"""
+import atexit
+import collections
+import json
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import process_io
+import sandbox
+
+POOL_ENABLED = os.environ.get('WORKER_POOL', '1') != '0'
+PYTHON_EXECUTABLE = os.environ.get('PYTHON_EXECUTABLE', sys.executable)
+NODE_EXECUTABLE = os.environ.get('NODE_EXECUTABLE', 'node')
+ZYGOTE_MAX_JOBS = int(os.environ.get('ZYGOTE_MAX_JOBS', 500))
+NODE_SPARES = int(os.environ.get('NODE_SPARES', 2))
+
+POOLED_LANGUAGES = {"python", "javascript"}
+
+DEFAULT_FILENAMES = {
+    "python": "main.py",
+    "javascript": "main.js",
+}
+
+# Imported once in the zygote so forked jobs start with them already loaded
+PRELOAD_MODULES = (
+    'collections', 'itertools', 'functools', 'math', 'heapq', 'bisect', 're',
+    'json', 'string', 'random', 'typing', 'dataclasses', 'datetime', 'decimal',
+    'fractions', 'statistics', 'traceback', 'linecache', 'atexit',
+)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Reads one "<json header>\n<source>" job from stdin, then runs it as the main module.
+# Whatever follows the source on stdin is left for the program itself.
+NODE_BOOTSTRAP = r"""
+const fs = require('fs');
+const path = require('path');
+const Module = require('module');
+function readExactly(n) {
+    const buf = Buffer.alloc(n);
+    let off = 0;
+    while (off < n) {
+        let r;
+        try {
+            r = fs.readSync(0, buf, off, n - off, null);
+        } catch (e) {
+            if (e.code === 'EAGAIN') continue;
+            throw e;
+        }
+        if (r === 0) process.exit(0);
+        off += r;
+    }
+    return buf;
+}
+let header = '';
+for (;;) {
+    const c = readExactly(1).toString();
+    if (c === '\n') break;
+    header += c;
+}
+const job = JSON.parse(header);
+const code = readExactly(job.size).toString('utf8');
+const filename = path.resolve(job.filename);
+const m = new Module(filename, null);
+m.id = '.';
+m.filename = filename;
+m.paths = Module._nodeModulePaths(path.dirname(filename));
+process.argv[1] = filename;
+process.mainModule = m;
+m._compile(code, filename);
+"""
+
+PYTHON_BOOTSTRAP = (
+    "import sys; sys.path.insert(0, {!r}); import worker_pool; worker_pool.bootstrap_main()"
+).format(_APP_DIR)
+
+_stats = {"zygote_starts": 0, "zygote_jobs": 0, "spare_hits": 0, "cold_starts": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _encode_job(code, filename, **options):
+    payload = code.encode('utf-8')
+    header = dict(options, filename=filename, size=len(payload))
+    return json.dumps(header).encode('utf-8') + b'\n', payload
+
+
+# ===== CODE RUNNER (executes inside the forked or bootstrapped child) =====
+
+def _exit_status(exc):
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _exec_main(code, filename, line_buffered=False, limits=None):
+    """Run code as the __main__ module of this process and exit"""
+    sandbox.apply_limits(limits)
+
+    import atexit
+    import builtins
+    import linecache
+    import traceback
+    import types
+
+    sys.stdin = sys.__stdin__ = open(0, 'r', encoding='utf-8', closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, 'w', encoding='utf-8', closefd=False,
+                                       buffering=1 if line_buffered else -1)
+    sys.stderr = sys.__stderr__ = open(2, 'w', encoding='utf-8', errors='backslashreplace',
+                                       closefd=False, buffering=1)
+    sys.argv = [filename]
+    # Don't let user code import the web application's modules
+    sys.path[:] = [entry for entry in sys.path if entry not in ('', _APP_DIR)]
+
+    main = types.ModuleType('__main__')
+    main.__file__ = filename
+    main.__builtins__ = builtins
+    sys.modules['__main__'] = main
+    # Lets tracebacks show source lines for code that never touched disk
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+
+    status = 0
+    try:
+        exec(compile(code, filename, 'exec'), main.__dict__)
+    except SystemExit as e:
+        status = _exit_status(e)
+    except BaseException:
+        etype, value, tb = sys.exc_info()
+        traceback.print_exception(etype, value, tb.tb_next)
+        status = 1
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except Exception:
+        pass
+    os._exit(status)
+
+
+def _read_exactly(fd, size):
+    chunks = []
+    while size > 0:
+        chunk = os.read(fd, min(size, 65536))
+        if not chunk:
+            os._exit(0)
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def bootstrap_main():
+    """Entry point of a cold Python worker: read one job from stdin and run it"""
+    header = b''
+    while not header.endswith(b'\n'):
+        header += _read_exactly(0, 1)
+    job = json.loads(header)
+    code = _read_exactly(0, job["size"]).decode('utf-8')
+    _exec_main(code, job["filename"], job.get("line_buffered", False), job.get("limits"))
+
+
+# ===== PYTHON ZYGOTE =====
+
+def _recv_job(conn):
+    """Receive a job header, its source and the stdio descriptors"""
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    buffer = data
+    while b'\n' not in buffer:
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise EOFError("connection closed before job header")
+        buffer += chunk
+    header_line, buffer = buffer.split(b'\n', 1)
+    job = json.loads(header_line)
+    while len(buffer) < job["size"]:
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise EOFError("connection closed before job source")
+        buffer += chunk
+    return job, buffer[:job["size"]].decode('utf-8'), fds
+
+
+def _supervise(conn):
+    """Forked per job: start the program, report its pid and exit status"""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    try:
+        job, code, fds = _recv_job(conn)
+    except Exception:
+        os._exit(1)
+
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+        _exec_main(code, job["filename"], job.get("line_buffered", False), job.get("limits"))
+
+    for fd in fds:
+        os.close(fd)
+    conn.sendall(json.dumps({"pid": pid}).encode('utf-8') + b'\n')
+
+    exited = threading.Event()
+
+    def reap():
+        try:
+            _, status, rusage = os.wait4(pid, 0)
+            exited.set()
+            result = {
+                "returncode": os.waitstatus_to_exitcode(status),
+                "rusage": {
+                    "utime": rusage.ru_utime,
+                    "stime": rusage.ru_stime,
+                    "maxrss": rusage.ru_maxrss,
+                },
+            }
+            conn.sendall(json.dumps(result).encode('utf-8') + b'\n')
+        finally:
+            os._exit(0)
+
+    threading.Thread(target=reap, daemon=True).start()
+    # Any message or a closed connection from the web worker means "kill it"
+    try:
+        conn.recv(1)
+    except OSError:
+        pass
+    if not exited.is_set():
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    threading.Event().wait()
+
+
+def zygote_main(listen_fd, max_jobs):
+    """Accept jobs on an inherited listening socket and fork one child per job"""
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+    server = socket.socket(fileno=listen_fd)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Supervisors are reaped automatically
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    jobs = 0
+    while jobs < max_jobs:
+        readable, _, _ = select.select([server, sys.stdin], [], [])
+        if sys.stdin in readable:
+            # The web worker that owns us has gone away
+            return
+        conn, _ = server.accept()
+        jobs += 1
+        if os.fork() == 0:
+            server.close()
+            _supervise(conn)
+        conn.close()
+
+
+class ZygoteProcess:
+    """Popen-like handle for a program forked from the Python zygote"""
+
+    def __init__(self, conn):
+        self.args = [PYTHON_EXECUTABLE, '<zygote>']
+        self.stdin = None
+        self.stdout = None
+        self.stderr = None
+        self.returncode = None
+        self.rusage = None
+        self._conn = conn
+        self._buffer = b''
+        self.pid = self._read_message(None)["pid"]
+
+    def _read_message(self, timeout):
+        self._conn.settimeout(timeout)
+        while b'\n' not in self._buffer:
+            try:
+                chunk = self._conn.recv(4096)
+            except (socket.timeout, BlockingIOError):
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            if not chunk:
+                raise EOFError("zygote connection closed")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            try:
+                result = self._read_message(timeout)
+            except EOFError:
+                result = {"returncode": -signal.SIGKILL, "rusage": None}
+            self.returncode = result["returncode"]
+            self.rusage = result["rusage"]
+            self._conn.close()
+        return self.returncode
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                return self.wait(0)
+            except subprocess.TimeoutExpired:
+                return None
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                self._conn.sendall(b'k')
+            except OSError:
+                pass
+
+    terminate = kill
+
+
+class Zygote:
+    """Owns one zygote process and restarts it when it exits"""
+
+    def __init__(self):
+        self.proc = None
+        self.path = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        atexit.register(self._exit)
+
+    def _start(self):
+        if self.proc is not None:
+            self.stop()
+        directory = tempfile.mkdtemp(prefix='ai_tester_zygote_')
+        self.path = os.path.join(directory, 'zygote.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(64)
+        # The zygote keeps the only listening descriptor; once it exits, connects are refused
+        code = (
+            "import sys; sys.path.insert(0, {!r}); import worker_pool; "
+            "worker_pool.zygote_main({}, {})"
+        ).format(_APP_DIR, server.fileno(), ZYGOTE_MAX_JOBS)
+        self.proc = subprocess.Popen([PYTHON_EXECUTABLE, '-c', code],
+                                     stdin=subprocess.PIPE, pass_fds=[server.fileno()])
+        server.close()
+        _count("zygote_starts")
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        if self.path:
+            try:
+                os.remove(self.path)
+                os.rmdir(os.path.dirname(self.path))
+            except OSError:
+                pass
+        self.proc = None
+        self.path = None
+
+    def _exit(self):
+        # A forked child inherits this object but not the zygote
+        if os.getpid() == self._pid:
+            with self._lock:
+                self.stop()
+
+    def _current(self):
+        """The running zygote process and its socket path, starting one if needed"""
+        with self._lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+            return self.proc, self.path
+
+    def _restart(self, failed):
+        """Replace the zygote a spawn failed on, unless another thread already has"""
+        with self._lock:
+            if self.proc is failed:
+                self._start()
+
+    def spawn(self, code, filename, **options):
+        header, payload = _encode_job(code, filename, **options)
+        for attempt in range(2):
+            sock = None
+            zygote, path = self._current()
+            pipes = [os.pipe(), os.pipe(), os.pipe()]
+            child_fds = [pipes[0][0], pipes[1][1], pipes[2][1]]
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(path)
+                socket.send_fds(sock, [header], child_fds)
+                sock.sendall(payload)
+                for fd in child_fds:
+                    os.close(fd)
+                child_fds = []
+                proc = ZygoteProcess(sock)
+            except (OSError, EOFError):
+                # Zygote was recycled between our check and the connect; retry once
+                for fd in child_fds + [pipes[0][1], pipes[1][0], pipes[2][0]]:
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+                if sock is not None:
+                    sock.close()
+                self._restart(zygote)
+                if attempt:
+                    raise
+                continue
+            proc.stdin = os.fdopen(pipes[0][1], 'wb')
+            proc.stdout = os.fdopen(pipes[1][0], 'rb')
+            proc.stderr = os.fdopen(pipes[2][0], 'rb')
+            _count("zygote_jobs")
+            return proc
+
+
+# ===== NODE SPARES =====
+
+class SparePool:
+    """Idle interpreter processes that each wait for a single job on stdin"""
+
+    def __init__(self, cmd, size):
+        self.cmd = cmd
+        self.size = size
+        self._spares = collections.deque()
+        self._lock = threading.Lock()
+
+    def _start(self):
+        return subprocess.Popen(self.cmd, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def take(self):
+        proc = None
+        with self._lock:
+            while self._spares:
+                candidate = self._spares.popleft()
+                if candidate.poll() is None:
+                    proc = candidate
+                    break
+        if proc is None:
+            proc = self._start()
+            _count("cold_starts")
+        else:
+            _count("spare_hits")
+        self.refill()
+        return proc
+
+    def refill(self):
+        with self._lock:
+            while len(self._spares) < self.size:
+                self._spares.append(self._start())
+
+    def stop(self):
+        with self._lock:
+            while self._spares:
+                proc = self._spares.popleft()
+                proc.kill()
+                proc.wait()
+
+    def __len__(self):
+        return len(self._spares)
+
+
+# ===== PUBLIC API =====
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def _get_pool(lang):
+    """Return this process's pool for lang (pools are never shared across forks)"""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        if lang not in _pools:
+            if lang == "python":
+                _pools[lang] = Zygote()
+            else:
+                _pools[lang] = SparePool([NODE_EXECUTABLE, '-e', NODE_BOOTSTRAP], NODE_SPARES)
+        return _pools[lang]
+
+
+def zygote_supported():
+    return POOL_ENABLED and hasattr(os, 'fork') and hasattr(socket, 'send_fds')
+
+
+def spawn(lang, code, filename=None, line_buffered=False, limits=None):
+    """
+    Start code in a pre-warmed worker and return a Popen-like handle.
+
+    line_buffered makes Python flush stdout at every newline, for callers
+    that stream output while the program runs. limits (see sandbox.py) are
+    applied to the process that runs the code.
+    """
+    filename = filename or DEFAULT_FILENAMES[lang]
+    options = {"line_buffered": True} if line_buffered else {}
+    if limits:
+        options["limits"] = limits
+
+    if lang == "python" and zygote_supported():
+        return _get_pool(lang).spawn(code, filename, **options)
+
+    if lang == "javascript" and POOL_ENABLED:
+        proc = _get_pool(lang).take()
+        # A warm worker is already running: Node can't limit itself, so do it from here
+        sandbox.limit_process(proc.pid, limits)
+    else:
+        cmd = [PYTHON_EXECUTABLE, '-c', PYTHON_BOOTSTRAP] if lang == "python" \
+            else [NODE_EXECUTABLE, '-e', NODE_BOOTSTRAP]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                preexec_fn=lambda: sandbox.apply_limits(limits))
+        _count("cold_starts")
+    header, payload = _encode_job(code, filename, **options)
+    try:
+        proc.stdin.write(header + payload)
+        proc.stdin.flush()
+    except BrokenPipeError:
+        pass
+    return proc
+
+
+def run(lang, code, input=None, timeout=None, filename=None, limits=None):
+    """
+    Run code to completion, like subprocess.run(capture_output=True, text=True).
+
+    Output goes through process_io's bounded collectors, so stdout and
+    stderr are previews if the program printed more than the output limit.
+    """
+    proc = spawn(lang, code, filename, limits=limits)
+    started = time.monotonic()
+    try:
+        stdout, stderr = process_io.collect(proc, input.encode('utf-8') if input else None,
+                                            timeout=timeout)
+        proc.wait(None if timeout is None else max(timeout - (time.monotonic() - started), 0))
+    except subprocess.TimeoutExpired as e:
+        proc.kill()
+        proc.wait()
+        # Like subprocess.run, the exception carries the output read so far
+        if e.output is not None:
+            e.output, e.stderr = e.output.text(), e.stderr.text()
+        raise
+    return subprocess.CompletedProcess(proc.args, proc.returncode, stdout.text(), stderr.text())
+
+
+def get_stats():
+    """Return pool counters for this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    zygote = _pools.get("python")
+    stats["zygote_pid"] = zygote.proc.pid if zygote and zygote.proc else None
+    stats["node_spares"] = len(_pools["javascript"]) if "javascript" in _pools else 0
+    return stats
+
+
+def shutdown():
+    """Stop every worker owned by this process"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.stop()
+        _pools.clear()